@@ -16,6 +16,8 @@ CREATE TABLE repl_AV_ATF (
 CREATE INDEX IX_repl_AV_ATF_dt ON repl_AV_ATF(dt);
 CREATE INDEX IX_repl_AV_ATF_ismooved ON repl_AV_ATF(ismooved);
 CREATE INDEX IX_repl_AV_ATF_dtmoove ON repl_AV_ATF(dtmoove);
+-- Покрывающий индекс для выборки батчей (ismooved = 0 ORDER BY dt, IDFL)
+CREATE INDEX IX_repl_AV_ATF_ismooved_dt_IDFL ON repl_AV_ATF(ismooved, dt, IDFL);
 
 -- Вставка тестовых данных
 INSERT INTO repl_AV_ATF (IDFL, dt, filename) VALUES
@@ -7,11 +7,20 @@
 
 import configparser
 import os
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from dataclasses import dataclass
 
 
+# Допустимые уровни логирования
+VALID_LOG_LEVELS = frozenset({'DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'})
+
+# Уже разобранные конфигурации: путь -> ((st_mtime_ns, st_size), Config)
+_CONFIG_CACHE: Dict[str, Tuple[Tuple[int, int], 'Config']] = {}
+_CONFIG_CACHE_LOCK = threading.Lock()
+
+
 @dataclass
 class DatabaseConfig:
     """Конфигурация подключения к базе данных."""
@@ -22,6 +31,7 @@ class DatabaseConfig:
     username: str
     password: str
     trusted_connection: bool = False
+    pool_size: int = 5
 
 
 @dataclass
@@ -37,6 +47,8 @@ class MigratorConfig:
     batch_size: int
     max_retries: int
     retry_delay: float
+    max_workers: Optional[int] = None
+    drop_page_cache: bool = False
 
 
 @dataclass
@@ -74,6 +86,9 @@ class ConfigLoader:
         """
         Загружает конфигурацию из файла.
         
+        Повторный вызов для неизмененного файла (те же mtime и размер)
+        возвращает ранее разобранную конфигурацию без чтения файла.
+        
         Returns:
             Config: Объект конфигурации
             
@@ -81,8 +96,18 @@ class ConfigLoader:
             FileNotFoundError: Если файл конфигурации не найден
             ValueError: Если конфигурация некорректна
         """
-        if not self.config_path.exists():
+        try:
+            stat = self.config_path.stat()
+        except FileNotFoundError:
             raise FileNotFoundError(f"Файл конфигурации не найден: {self.config_path}")
+            
+        cache_key = str(self.config_path.resolve())
+        file_version = (stat.st_mtime_ns, stat.st_size)
+        with _CONFIG_CACHE_LOCK:
+            cached = _CONFIG_CACHE.get(cache_key)
+        if cached is not None and cached[0] == file_version:
+            self._config = cached[1]
+            return self._config
         
         config_parser = configparser.ConfigParser()
         config_parser.read(self.config_path, encoding='utf-8')
@@ -110,38 +135,75 @@ class ConfigLoader:
             # Валидация конфигурации
             self._validate_config()
             
+            with _CONFIG_CACHE_LOCK:
+                _CONFIG_CACHE[cache_key] = (file_version, self._config)
+            
             return self._config
             
         except Exception as e:
             raise ValueError(f"Ошибка загрузки конфигурации: {e}")
     
-    def _load_database_config(self, parser: configparser.ConfigParser) -> DatabaseConfig:
-        """Загружает конфигурацию базы данных."""
-        section = 'database'
+    @staticmethod
+    def _section_dict(parser: configparser.ConfigParser, section: str) -> Dict[str, str]:
+        """
+        Возвращает все параметры секции одним словарем.
         
+        Args:
+            parser: Разобранный файл конфигурации
+            section: Имя секции
+            
+        Returns:
+            Dict[str, str]: Параметры секции
+            
+        Raises:
+            ValueError: Если секция отсутствует
+        """
         if not parser.has_section(section):
             raise ValueError(f"Секция '{section}' не найдена в конфигурации")
+        return dict(parser.items(section))
+    
+    @staticmethod
+    def _require(values: Dict[str, str], section: str, key: str) -> str:
+        """Возвращает обязательный параметр секции."""
+        try:
+            return values[key]
+        except KeyError:
+            raise ValueError(f"Параметр '{key}' не найден в секции '{section}'")
+    
+    @staticmethod
+    def _to_bool(value: str) -> bool:
+        """Преобразует строковое значение в bool по правилам configparser."""
+        try:
+            return configparser.ConfigParser.BOOLEAN_STATES[value.lower()]
+        except KeyError:
+            raise ValueError(f"Некорректное логическое значение: {value}")
+    
+    def _load_database_config(self, parser: configparser.ConfigParser) -> DatabaseConfig:
+        """Загружает конфигурацию базы данных."""
+        section = 'database'
+        values = self._section_dict(parser, section)
         
-        driver = parser.get(section, 'driver', fallback='mysql')
+        driver = values.get('driver', 'mysql')
         
         if driver == 'mysql':
             return DatabaseConfig(
                 driver=driver,
-                host=parser.get(section, 'host'),
-                port=parser.getint(section, 'port', fallback=3306),
-                database=parser.get(section, 'database'),
-                username=parser.get(section, 'username'),
-                password=parser.get(section, 'password')
+                host=self._require(values, section, 'host'),
+                port=int(values.get('port', 3306)),
+                database=self._require(values, section, 'database'),
+                username=self._require(values, section, 'username'),
+                password=self._require(values, section, 'password'),
+                pool_size=int(values.get('pool_size', 5))
             )
         elif driver == 'pyodbc':
             return DatabaseConfig(
                 driver=driver,
-                host=parser.get(section, 'server'),
-                port=parser.getint(section, 'port', fallback=1433),
-                database=parser.get(section, 'database'),
-                username=parser.get(section, 'username'),
-                password=parser.get(section, 'password'),
-                trusted_connection=parser.getboolean(section, 'trusted_connection', fallback=False)
+                host=self._require(values, section, 'server'),
+                port=int(values.get('port', 1433)),
+                database=self._require(values, section, 'database'),
+                username=self._require(values, section, 'username'),
+                password=self._require(values, section, 'password'),
+                trusted_connection=self._to_bool(values.get('trusted_connection', 'false'))
             )
         else:
             raise ValueError(f"Неподдерживаемый драйвер БД: {driver}")
@@ -149,45 +211,34 @@ class ConfigLoader:
     def _load_paths_config(self, parser: configparser.ConfigParser) -> PathsConfig:
         """Загружает конфигурацию путей."""
         section = 'paths'
-        
-        if not parser.has_section(section):
-            raise ValueError(f"Секция '{section}' не найдена в конфигурации")
-        
-        file_path = Path(parser.get(section, 'file_path'))
-        new_file_path = Path(parser.get(section, 'new_file_path'))
+        values = self._section_dict(parser, section)
         
         return PathsConfig(
-            file_path=file_path,
-            new_file_path=new_file_path
+            file_path=Path(self._require(values, section, 'file_path')),
+            new_file_path=Path(self._require(values, section, 'new_file_path'))
         )
     
     def _load_migrator_config(self, parser: configparser.ConfigParser) -> MigratorConfig:
         """Загружает конфигурацию мигратора."""
-        section = 'migrator'
-        
-        if not parser.has_section(section):
-            raise ValueError(f"Секция '{section}' не найдена в конфигурации")
+        values = self._section_dict(parser, 'migrator')
         
         return MigratorConfig(
-            batch_size=parser.getint(section, 'batch_size', fallback=1000),
-            max_retries=parser.getint(section, 'max_retries', fallback=3),
-            retry_delay=parser.getfloat(section, 'retry_delay', fallback=1.0)
+            batch_size=int(values.get('batch_size', 1000)),
+            max_retries=int(values.get('max_retries', 3)),
+            retry_delay=float(values.get('retry_delay', 1.0)),
+            max_workers=int(values['max_workers']) if values.get('max_workers') else None,
+            drop_page_cache=self._to_bool(values.get('drop_page_cache', 'false'))
         )
     
     def _load_logging_config(self, parser: configparser.ConfigParser) -> LoggingConfig:
         """Загружает конфигурацию логирования."""
-        section = 'logging'
-        
-        if not parser.has_section(section):
-            raise ValueError(f"Секция '{section}' не найдена в конфигурации")
-        
-        log_file = Path(parser.get(section, 'log_file', fallback='logs/migrator.log'))
+        values = self._section_dict(parser, 'logging')
         
         return LoggingConfig(
-            level=parser.get(section, 'level', fallback='INFO'),
-            log_file=log_file,
-            max_log_size=parser.getint(section, 'max_log_size', fallback=10),
-            backup_count=parser.getint(section, 'backup_count', fallback=5)
+            level=values.get('level', 'INFO'),
+            log_file=Path(values.get('log_file', 'logs/migrator.log')),
+            max_log_size=int(values.get('max_log_size', 10)),
+            backup_count=int(values.get('backup_count', 5))
         )
     
     def _validate_config(self) -> None:
@@ -198,6 +249,12 @@ class ConfigLoader:
         # Проверка путей
         if not self._config.paths.file_path.exists():
             raise ValueError(f"Путь к файлам не существует: {self._config.paths.file_path}")
+            
+        # Проверка пула соединений (mysql.connector допускает до 32 соединений).
+        # Пока батч держит соединение сессии, предвыборка следующего батча и
+        # поштучная отметка берут второе - пул не ждет свободного соединения
+        if not 2 <= self._config.database.pool_size <= 32:
+            raise ValueError("Размер пула соединений должен быть от 2 до 32")
         
         # Проверка параметров мигратора
         if self._config.migrator.batch_size <= 0:
@@ -208,10 +265,12 @@ class ConfigLoader:
         
         if self._config.migrator.retry_delay < 0:
             raise ValueError("Задержка между попытками не может быть отрицательной")
-        
+            
+        if self._config.migrator.max_workers is not None and self._config.migrator.max_workers <= 0:
+            raise ValueError("Количество потоков должно быть больше 0")
+            
         # Проверка уровня логирования
-        valid_levels = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
-        if self._config.logging.level.upper() not in valid_levels:
+        if self._config.logging.level.upper() not in VALID_LOG_LEVELS:
             raise ValueError(f"Некорректный уровень логирования: {self._config.logging.level}")
     
     def get_config(self) -> Config:
@@ -236,6 +295,8 @@ class ConfigLoader:
             Config: Обновленный объект конфигурации
         """
         self._config = None
+        with _CONFIG_CACHE_LOCK:
+            _CONFIG_CACHE.pop(str(self.config_path.resolve()), None)
         return self.load_config()
 
 
@@ -7,7 +7,8 @@
 
 import mysql.connector
 from mysql.connector import Error, pooling
-from typing import List, Dict, Optional, Tuple
+from contextlib import contextmanager
+from typing import Any, Callable, List, Dict, Optional, Tuple, Iterator
 from datetime import datetime
 import time
 from pathlib import Path
@@ -30,19 +31,159 @@ class DatabaseQueryError(Exception):
     pass
 
 
+# Временные ошибки MySQL, после которых запрос имеет смысл повторить:
+# 1205 - lock wait timeout, 1213 - deadlock, 2006 - server has gone away,
+# 2013 - lost connection during query
+TRANSIENT_ERROR_CODES = {1205, 1213, 2006, 2013}
+
+
+def _is_transient(error: Error) -> bool:
+    """Проверяет, является ли ошибка MySQL временной."""
+    return error.errno in TRANSIENT_ERROR_CODES
+
+
+class DatabaseSession:
+    """
+    Сессия работы с БД на одном соединении из пула.
+    
+    Позволяет выполнить серию запросов (например, весь батч миграции)
+    без повторного получения соединения из пула на каждый запрос.
+    """
+    
+    def __init__(self, connection: mysql.connector.connection.MySQLConnection, logger: FileMigratorLogger):
+        """
+        Инициализация сессии.
+        
+        Args:
+            connection: Соединение из пула, закрепленное за сессией
+            logger: Логгер для записи операций
+        """
+        self.connection = connection
+        self.logger = logger
+        self.cursor = connection.cursor(dictionary=True)
+        # Курсор для строк-кортежей создается при первом запросе
+        self._tuple_cursor = None
+        # Подготовленные выражения живут до возврата соединения в пул
+        # (pool_reset_session сбрасывает их на сервере), поэтому кеш - на сессии
+        self._prepared: Dict[Tuple[str, bool], Any] = {}
+    
+    def execute(self, query: str, params: Tuple = None, fetch: bool = False,
+                dictionary: bool = True) -> Optional[List]:
+        """
+        Выполняет SQL запрос на соединении сессии.
+        
+        Args:
+            query: SQL запрос
+            params: Параметры запроса
+            fetch: Возвращать ли результат
+            dictionary: Возвращать строки словарями (иначе кортежами)
+            
+        Returns:
+            List[Dict] / List[Tuple] или None: Результат запроса
+            
+        Raises:
+            DatabaseQueryError: Если произошла ошибка выполнения запроса
+        """
+        try:
+            if dictionary:
+                cursor = self.cursor
+            else:
+                if self._tuple_cursor is None:
+                    self._tuple_cursor = self.connection.cursor()
+                cursor = self._tuple_cursor
+                
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+                
+            if fetch:
+                return cursor.fetchall()
+            else:
+                self.connection.commit()
+                return None
+                
+        except Error as e:
+            try:
+                self.connection.rollback()
+            except Error:
+                # Соединение потеряно (2006/2013) - сохраняем исходную ошибку
+                pass
+            self.logger.log_database_error("session_execute", e)
+            raise DatabaseQueryError(f"Ошибка выполнения запроса: {e}")
+    
+    def execute_prepared(self, query: str, params: Tuple = None, fetch: bool = False,
+                         dictionary: bool = True) -> Optional[List]:
+        """
+        Выполняет SQL запрос как подготовленное выражение.
+        
+        Для каждого текста запроса создается один курсор prepared=True:
+        COM_STMT_PREPARE отправляется один раз, далее только COM_STMT_EXECUTE.
+        
+        Args:
+            query: SQL запрос
+            params: Параметры запроса
+            fetch: Возвращать ли результат
+            dictionary: Возвращать строки словарями (иначе кортежами)
+            
+        Returns:
+            List[Dict] / List[Tuple] или None: Результат запроса
+            
+        Raises:
+            DatabaseQueryError: Если произошла ошибка выполнения запроса
+        """
+        try:
+            key = (query, dictionary)
+            cursor = self._prepared.get(key)
+            if cursor is None:
+                cursor = self.connection.cursor(prepared=True, dictionary=dictionary)
+                self._prepared[key] = cursor
+                
+            cursor.execute(query, params)
+            
+            if fetch:
+                return cursor.fetchall()
+            else:
+                self.connection.commit()
+                return None
+                
+        except Error as e:
+            try:
+                self.connection.rollback()
+            except Error:
+                # Соединение потеряно (2006/2013) - сохраняем исходную ошибку
+                pass
+            self.logger.log_database_error("session_execute_prepared", e)
+            raise DatabaseQueryError(f"Ошибка выполнения запроса: {e}")
+    
+    def close(self) -> None:
+        """Закрывает курсоры сессии."""
+        for cursor in self._prepared.values():
+            cursor.close()
+        self._prepared.clear()
+        if self._tuple_cursor is not None:
+            self._tuple_cursor.close()
+        self.cursor.close()
+
+
 class Database:
     """Класс для работы с базой данных MySQL."""
     
-    def __init__(self, config: DatabaseConfig, logger: FileMigratorLogger):
+    def __init__(self, config: DatabaseConfig, logger: FileMigratorLogger,
+                 max_retries: int = 0, retry_delay: float = 0.0):
         """
         Инициализация подключения к базе данных.
         
         Args:
             config: Конфигурация подключения к БД
             logger: Логгер для записи операций
+            max_retries: Количество повторов запроса при временной ошибке
+            retry_delay: Начальная задержка перед повтором (секунды), удваивается
         """
         self.config = config
         self.logger = logger
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
         self.connection_pool: Optional[pooling.MySQLConnectionPool] = None
         self._connection: Optional[mysql.connector.connection.MySQLConnection] = None
         self._setup_connection_pool()
@@ -52,7 +193,7 @@ class Database:
         try:
             pool_config = {
                 'pool_name': 'file_migrator_pool',
-                'pool_size': 5,
+                'pool_size': self.config.pool_size,
                 'pool_reset_session': True,
                 'host': self.config.host,
                 'port': self.config.port,
@@ -98,7 +239,60 @@ class Database:
             self.logger.log_database_error("get_connection", e)
             raise DatabaseConnectionError(f"Ошибка получения соединения: {e}")
     
-    def _execute_query(self, query: str, params: Tuple = None, fetch: bool = False) -> Optional[List[Dict]]:
+    def _call_with_retry(self, operation: str, func: Callable, *args) -> Any:
+        """
+        Вызывает функцию, повторяя ее при временных ошибках MySQL.
+        
+        Задержка между попытками растет экспоненциально: retry_delay * 2^попытка.
+        
+        Args:
+            operation: Название операции для логов
+            func: Вызываемая функция
+            *args: Аргументы функции
+            
+        Returns:
+            Any: Результат функции
+            
+        Raises:
+            Error: Если ошибка не временная или попытки исчерпаны
+        """
+        attempt = 0
+        while True:
+            try:
+                return func(*args)
+            except Error as e:
+                if attempt >= self.max_retries or not _is_transient(e):
+                    raise
+                delay = self.retry_delay * (2 ** attempt)
+                attempt += 1
+                self.logger.log_warning(
+                    f"Временная ошибка БД при {operation} ({e.errno}), "
+                    f"повтор {attempt}/{self.max_retries} через {delay:.1f} с"
+                )
+                time.sleep(delay)
+    
+    @contextmanager
+    def session(self) -> Iterator[DatabaseSession]:
+        """
+        Закрепляет одно соединение из пула на время блока with.
+        
+        Yields:
+            DatabaseSession: Сессия для передачи в методы Database
+            
+        Raises:
+            DatabaseConnectionError: Если не удалось получить соединение
+        """
+        connection = self._get_connection()
+        db_session = DatabaseSession(connection, self.logger)
+        try:
+            yield db_session
+        finally:
+            db_session.close()
+            connection.close()
+    
+    def _execute_query(self, query: str, params: Tuple = None, fetch: bool = False,
+                       session: Optional[DatabaseSession] = None,
+                       dictionary: bool = True) -> Optional[List]:
         """
         Выполняет SQL запрос.
         
@@ -106,19 +300,48 @@ class Database:
             query: SQL запрос
             params: Параметры запроса
             fetch: Возвращать ли результат
+            session: Сессия БД (если не указана, соединение берется из пула)
+            dictionary: Возвращать строки словарями (иначе кортежами)
             
         Returns:
-            List[Dict] или None: Результат запроса
+            List[Dict] / List[Tuple] или None: Результат запроса
             
         Raises:
             DatabaseQueryError: Если произошла ошибка выполнения запроса
         """
+        if session is not None:
+            return session.execute(query, params, fetch, dictionary)
+            
+        try:
+            return self._call_with_retry("execute_query", self._run_query, query, params, fetch, dictionary)
+            
+        except Error as e:
+            self.logger.log_database_error("execute_query", e)
+            raise DatabaseQueryError(f"Ошибка выполнения запроса: {e}")
+    
+    def _run_query(self, query: str, params: Optional[Tuple], fetch: bool,
+                   dictionary: bool) -> Optional[List]:
+        """
+        Выполняет одну попытку SQL запроса на соединении из пула.
+        
+        Args:
+            query: SQL запрос
+            params: Параметры запроса
+            fetch: Возвращать ли результат
+            dictionary: Возвращать строки словарями (иначе кортежами)
+            
+        Returns:
+            List[Dict] / List[Tuple] или None: Результат запроса
+            
+        Raises:
+            Error: Ошибка MySQL (транзакция откатывается)
+        """
         connection = None
         cursor = None
         
         try:
             connection = self._get_connection()
-            cursor = connection.cursor(dictionary=True)
+            cursor = connection.cursor(dictionary=dictionary)
             
             if params:
                 cursor.execute(query, params)
@@ -132,11 +355,14 @@ class Database:
                 connection.commit()
                 return None
                 
-        except Error as e:
+        except Error:
             if connection:
-                connection.rollback()
-            self.logger.log_database_error("execute_query", e)
-            raise DatabaseQueryError(f"Ошибка выполнения запроса: {e}")
+                try:
+                    connection.rollback()
+                except Error:
+                    # Соединение потеряно (2006/2013) - сохраняем исходную ошибку
+                    pass
+            raise
             
         finally:
             if cursor:
@@ -144,6 +370,32 @@ class Database:
             if connection:
                 connection.close()
     
+    def _execute_prepared(self, query: str, params: Tuple = None, fetch: bool = False,
+                          session: Optional[DatabaseSession] = None,
+                          dictionary: bool = True) -> Optional[List]:
+        """
+        Выполняет SQL запрос как подготовленное выражение.
+        
+        Подготовленные выражения переиспользуются только в рамках сессии;
+        без сессии запрос выполняется обычным путем.
+        
+        Args:
+            query: SQL запрос
+            params: Параметры запроса
+            fetch: Возвращать ли результат
+            session: Сессия БД (опционально)
+            dictionary: Возвращать строки словарями (иначе кортежами)
+            
+        Returns:
+            List[Dict] / List[Tuple] или None: Результат запроса
+            
+        Raises:
+            DatabaseQueryError: Если произошла ошибка выполнения запроса
+        """
+        if session is not None:
+            return session.execute_prepared(query, params, fetch, dictionary)
+        return self._execute_query(query, params, fetch, dictionary=dictionary)
+    
     def test_connection(self) -> bool:
         """
         Тестирует подключение к базе данных.
@@ -166,18 +418,23 @@ class Database:
             self.logger.log_database_error("test_connection", e)
             return False
     
-    def get_files_to_move(self, batch_size: int) -> List[Dict]:
+    def get_files_to_move(self, batch_size: int,
+                          session: Optional[DatabaseSession] = None) -> List[Tuple[str, datetime]]:
         """
         Получает список файлов для миграции.
         
+        Выбираются только поля IDFL и dt, нужные для перемещения; строки
+        возвращаются кортежами, без построения словаря на каждую строку.
+        
         Args:
             batch_size: Размер батча
+            session: Сессия БД (опционально)
             
         Returns:
-            List[Dict]: Список файлов для миграции
+            List[Tuple[str, datetime]]: Список файлов для миграции (IDFL, dt)
         """
         query = """
-        SELECT IDFL, dt, filename, ismooved, dtmoove, created_at, updated_at
+        SELECT IDFL, dt
         FROM repl_AV_ATF 
         WHERE ismooved = 0 
         ORDER BY dt ASC, IDFL ASC
@@ -185,7 +442,8 @@ class Database:
         """
         
         try:
-            result = self._execute_query(query, (batch_size,), fetch=True)
+            result = self._execute_prepared(query, (batch_size,), fetch=True, session=session,
+                                            dictionary=False)
             self.logger.log_system_info(f"Получено {len(result)} файлов для миграции")
             return result
             
@@ -193,17 +451,84 @@ class Database:
             self.logger.log_database_error("get_files_to_move", e)
             raise
     
-    def get_total_files_count(self) -> int:
+    def get_files_to_move_after(self, last_dt: datetime, last_idfl: str, batch_size: int,
+                                session: Optional[DatabaseSession] = None) -> List[Tuple[str, datetime]]:
+        """
+        Получает следующий батч файлов для миграции после ключа (dt, IDFL).
+        
+        Keyset-пагинация: выборка начинается сразу за последней строкой
+        предыдущего батча, поэтому стоимость запроса не растет по мере
+        миграции, а файлы с ошибками не выбираются повторно. Рассчитано на
+        покрывающий индекс (ismooved, dt, IDFL).
+        
+        Args:
+            last_dt: Дата последнего файла предыдущего батча
+            last_idfl: Идентификатор последнего файла предыдущего батча
+            batch_size: Размер батча
+            session: Сессия БД (опционально)
+            
+        Returns:
+            List[Tuple[str, datetime]]: Список файлов для миграции (IDFL, dt)
+        """
+        query = """
+        SELECT IDFL, dt
+        FROM repl_AV_ATF 
+        WHERE ismooved = 0 
+          AND (dt > %s OR (dt = %s AND IDFL > %s))
+        ORDER BY dt ASC, IDFL ASC
+        LIMIT %s
+        """
+        
+        try:
+            params = (last_dt, last_dt, last_idfl, batch_size)
+            result = self._execute_prepared(query, params, fetch=True, session=session,
+                                            dictionary=False)
+            self.logger.log_system_info(f"Получено {len(result)} файлов для миграции")
+            return result
+            
+        except DatabaseQueryError as e:
+            self.logger.log_database_error("get_files_to_move_after", e)
+            raise
+    
+    def get_moved_files(self, limit: int) -> List[Dict]:
+        """
+        Получает список перемещенных файлов.
+        
+        Args:
+            limit: Максимальное количество файлов
+            
+        Returns:
+            List[Dict]: Список перемещенных файлов
+        """
+        query = """
+        SELECT IDFL, dt, filename, ismooved, dtmoove, created_at, updated_at
+        FROM repl_AV_ATF 
+        WHERE ismooved = 1 
+        ORDER BY dt ASC, IDFL ASC
+        LIMIT %s
+        """
+        
+        try:
+            return self._execute_query(query, (limit,), fetch=True)
+            
+        except DatabaseQueryError as e:
+            self.logger.log_database_error("get_moved_files", e)
+            raise
+    
+    def get_total_files_count(self, session: Optional[DatabaseSession] = None) -> int:
         """
         Получает общее количество файлов в таблице.
         
+        Args:
+            session: Сессия БД (опционально)
+            
         Returns:
             int: Общее количество файлов
         """
         query = "SELECT COUNT(*) as total FROM repl_AV_ATF"
         
         try:
-            result = self._execute_query(query, fetch=True)
+            result = self._execute_query(query, fetch=True, session=session)
             total = result[0]['total'] if result else 0
             self.logger.log_system_info(f"Общее количество файлов в БД: {total}")
             return total
@@ -212,17 +537,20 @@ class Database:
             self.logger.log_database_error("get_total_files_count", e)
             raise
     
-    def get_unmoved_files_count(self) -> int:
+    def get_unmoved_files_count(self, session: Optional[DatabaseSession] = None) -> int:
         """
         Получает количество файлов, которые еще не перемещены.
         
+        Args:
+            session: Сессия БД (опционально)
+            
         Returns:
             int: Количество не перемещенных файлов
         """
         query = "SELECT COUNT(*) as total FROM repl_AV_ATF WHERE ismooved = 0"
         
         try:
-            result = self._execute_query(query, fetch=True)
+            result = self._execute_query(query, fetch=True, session=session)
             total = result[0]['total'] if result else 0
             self.logger.log_system_info(f"Количество не перемещенных файлов: {total}")
             return total
@@ -231,13 +559,15 @@ class Database:
             self.logger.log_database_error("get_unmoved_files_count", e)
             raise
     
-    def mark_file_moved(self, idfl: str, dtmoove: datetime = None) -> bool:
+    def mark_file_moved(self, idfl: str, dtmoove: datetime = None,
+                        session: Optional[DatabaseSession] = None) -> bool:
         """
         Отмечает файл как перемещенный.
         
         Args:
             idfl: Идентификатор файла
             dtmoove: Дата и время перемещения (по умолчанию текущее время)
+            session: Сессия БД (опционально)
             
         Returns:
             bool: True если операция успешна
@@ -252,14 +582,127 @@ class Database:
         """
         
         try:
-            self._execute_query(query, (dtmoove, idfl))
-            self.logger.log_system_info(f"Файл {idfl} отмечен как перемещенный")
+            self._execute_prepared(query, (dtmoove, idfl), session=session)
+            self.logger.log_debug("Файл %s отмечен как перемещенный", idfl)
             return True
             
         except DatabaseQueryError as e:
             self.logger.log_database_error("mark_file_moved", e)
             return False
     
+    def mark_files_moved(self, rows: List[Tuple[datetime, str]],
+                         session: Optional[DatabaseSession] = None) -> int:
+        """
+        Отмечает пачку файлов как перемещенные одной транзакцией.
+        
+        Все UPDATE выполняются через executemany на одном соединении
+        с единственным commit в конце.
+        
+        Args:
+            rows: Список кортежей (dtmoove, idfl)
+            session: Сессия БД (если не указана, соединение берется из пула)
+            
+        Returns:
+            int: Количество обновленных записей
+            
+        Raises:
+            DatabaseQueryError: Если произошла ошибка выполнения запроса
+        """
+        if not rows:
+            return 0
+            
+        query = """
+        UPDATE repl_AV_ATF
+        SET ismooved = 1, dtmoove = %s, updated_at = NOW()
+        WHERE IDFL = %s AND ismooved = 0
+        """
+        
+        try:
+            updated = self._execute_many("mark_files_moved", query, rows, session)
+            
+        except Error as e:
+            self.logger.log_database_error("mark_files_moved", e)
+            raise DatabaseQueryError(f"Ошибка пакетного обновления: {e}")
+            
+        self.logger.log_system_info(f"Отмечено как перемещенные: {updated} из {len(rows)} файлов")
+        return updated
+    
+    def _execute_many(self, operation: str, query: str, rows: List[Tuple],
+                      session: Optional[DatabaseSession] = None) -> int:
+        """
+        Выполняет executemany одной транзакцией.
+        
+        На соединении из пула временные ошибки повторяются на новом
+        соединении; на сессии запрос выполняется один раз - ее соединение
+        после обрыва повторно не используется.
+        
+        Args:
+            operation: Название операции для логов
+            query: SQL запрос
+            rows: Параметры для каждой строки
+            session: Сессия БД (если не указана, соединение берется из пула)
+            
+        Returns:
+            int: Количество обновленных записей
+            
+        Raises:
+            Error: Ошибка MySQL
+        """
+        if session is not None:
+            return self._update_many(query, rows, session)
+        return self._call_with_retry(operation, self._update_many, query, rows)
+    
+    def _update_many(self, query: str, rows: List[Tuple],
+                     session: Optional[DatabaseSession] = None) -> int:
+        """
+        Выполняет executemany одной транзакцией (одна попытка).
+        
+        Args:
+            query: SQL запрос
+            rows: Параметры для каждой строки
+            session: Сессия БД (если не указана, соединение берется из пула)
+            
+        Returns:
+            int: Количество обновленных записей
+            
+        Raises:
+            Error: Ошибка MySQL (транзакция откатывается)
+        """
+        connection = None
+        cursor = None
+        
+        try:
+            connection = session.connection if session is not None else self._get_connection()
+            connection.autocommit = False
+            cursor = connection.cursor()
+            cursor.executemany(query, rows)
+            connection.commit()
+            return cursor.rowcount
+            
+        except Error:
+            if connection:
+                try:
+                    connection.rollback()
+                except Error:
+                    # Соединение потеряно (2006/2013) - сохраняем исходную ошибку
+                    pass
+            raise
+            
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                try:
+                    connection.autocommit = True
+                except Error:
+                    pass
+                if session is None:
+                    try:
+                        # Пул возвращает соединение к себе, даже если сброс сессии не удался
+                        connection.close()
+                    except Error:
+                        pass
+    
     def insert_new_file(self, idfl: str, filename: str, dt: datetime = None) -> bool:
         """
         Добавляет новый файл в таблицу.
@@ -286,13 +729,53 @@ class Database:
         
         try:
             self._execute_query(query, (idfl, dt, filename))
-            self.logger.log_system_info(f"Добавлен новый файл: {idfl} ({filename})")
+            self.logger.log_debug("Добавлен новый файл: %s (%s)", idfl, filename)
             return True
             
         except DatabaseQueryError as e:
             self.logger.log_database_error("insert_new_file", e)
             return False
     
+    def insert_new_files(self, rows: List[Tuple[str, datetime, str]],
+                         session: Optional[DatabaseSession] = None) -> int:
+        """
+        Добавляет пачку новых файлов одной транзакцией.
+        
+        executemany превращает INSERT ... VALUES в один многострочный
+        INSERT, поэтому пачка уходит на сервер одним запросом.
+        
+        Args:
+            rows: Список кортежей (idfl, dt, filename)
+            session: Сессия БД (если не указана, соединение берется из пула)
+            
+        Returns:
+            int: Количество затронутых строк (обновленная запись считается дважды)
+            
+        Raises:
+            DatabaseQueryError: Если произошла ошибка выполнения запроса
+        """
+        if not rows:
+            return 0
+            
+        query = """
+        INSERT INTO repl_AV_ATF (IDFL, dt, filename, ismooved, created_at, updated_at)
+        VALUES (%s, %s, %s, 0, NOW(), NOW())
+        ON DUPLICATE KEY UPDATE
+        filename = VALUES(filename),
+        dt = VALUES(dt),
+        updated_at = NOW()
+        """
+        
+        try:
+            affected = self._execute_many("insert_new_files", query, rows, session)
+            
+        except Error as e:
+            self.logger.log_database_error("insert_new_files", e)
+            raise DatabaseQueryError(f"Ошибка пакетной вставки: {e}")
+            
+        self.logger.log_system_info(f"Добавлено новых файлов: {len(rows)}")
+        return affected
+    
     def get_file_metadata(self, idfl: str) -> Optional[Dict]:
         """
         Получает метаданные файла по идентификатору.
@@ -312,7 +795,7 @@ class Database:
         try:
             result = self._execute_query(query, (idfl,), fetch=True)
             if result:
-                self.logger.log_system_info(f"Получены метаданные для файла {idfl}")
+                self.logger.log_debug("Получены метаданные для файла %s", idfl)
                 return result[0]
             else:
                 self.logger.log_warning(f"Файл {idfl} не найден в БД")
@@ -349,18 +832,108 @@ class Database:
             self.logger.log_database_error("get_files_by_date_range", e)
             raise
     
-    def get_migration_statistics(self) -> Dict:
+    def get_unmoved_files_by_date_range(self, start_date: datetime,
+                                        end_date: datetime) -> List[Tuple[str, datetime]]:
+        """
+        Получает не перемещенные файлы в указанном диапазоне дат.
+        
+        Args:
+            start_date: Начальная дата
+            end_date: Конечная дата
+            
+        Returns:
+            List[Tuple[str, datetime]]: Список файлов для миграции (IDFL, dt)
+        """
+        query = """
+        SELECT IDFL, dt
+        FROM repl_AV_ATF 
+        WHERE ismooved = 0 
+          AND dt BETWEEN %s AND %s
+        ORDER BY dt ASC, IDFL ASC
+        """
+        
+        try:
+            result = self._execute_query(query, (start_date, end_date), fetch=True, dictionary=False)
+            self.logger.log_system_info(
+                f"Найдено {len(result)} не перемещенных файлов в диапазоне {start_date} - {end_date}"
+            )
+            return result
+            
+        except DatabaseQueryError as e:
+            self.logger.log_database_error("get_unmoved_files_by_date_range", e)
+            raise
+    
+    def iter_unmoved_files_by_date_range(self, start_date: datetime, end_date: datetime,
+                                         batch_size: int) -> Iterator[List[Tuple[str, datetime]]]:
+        """
+        Выдает не перемещенные файлы диапазона дат батчами.
+        
+        Каждый батч - отдельный короткий запрос с keyset-пагинацией по
+        (dt, IDFL), поэтому в памяти держится только текущий батч, а
+        соединение не удерживается, пока вызывающий код обрабатывает файлы.
+        
+        Args:
+            start_date: Начальная дата
+            end_date: Конечная дата
+            batch_size: Размер батча
+            
+        Yields:
+            List[Tuple[str, datetime]]: Очередной батч файлов (IDFL, dt)
+        """
+        first_query = """
+        SELECT IDFL, dt
+        FROM repl_AV_ATF 
+        WHERE ismooved = 0 
+          AND dt BETWEEN %s AND %s
+        ORDER BY dt ASC, IDFL ASC
+        LIMIT %s
+        """
+        next_query = """
+        SELECT IDFL, dt
+        FROM repl_AV_ATF 
+        WHERE ismooved = 0 
+          AND (dt > %s OR (dt = %s AND IDFL > %s))
+          AND dt <= %s
+        ORDER BY dt ASC, IDFL ASC
+        LIMIT %s
+        """
+        
+        query, params = first_query, (start_date, end_date, batch_size)
+        while True:
+            try:
+                files = self._execute_prepared(query, params, fetch=True, dictionary=False)
+                
+            except DatabaseQueryError as e:
+                self.logger.log_database_error("iter_unmoved_files_by_date_range", e)
+                raise
+                
+            if files:
+                yield files
+            if len(files) < batch_size:
+                return
+                
+            last_idfl, last_dt = files[-1]
+            query, params = next_query, (last_dt, last_dt, last_idfl, end_date, batch_size)
+    
+    def get_migration_statistics(self, session: Optional[DatabaseSession] = None) -> Dict:
         """
         Получает статистику миграции.
         
+        Все счетчики считаются за один проход по таблице, поэтому, если
+        нужны и общее, и оставшееся количество файлов, лучше взять их
+        отсюда, а не вызывать get_total_files_count/get_unmoved_files_count.
+        
+        Args:
+            session: Сессия БД (опционально)
+            
         Returns:
             Dict: Статистика миграции
         """
         query = """
         SELECT 
             COUNT(*) as total_files,
-            SUM(CASE WHEN ismooved = 1 THEN 1 ELSE 0 END) as moved_files,
-            SUM(CASE WHEN ismooved = 0 THEN 1 ELSE 0 END) as unmoved_files,
+            SUM(ismooved = 1) as moved_files,
+            SUM(ismooved = 0) as unmoved_files,
             MIN(dt) as earliest_file_date,
             MAX(dt) as latest_file_date,
             MIN(CASE WHEN ismooved = 1 THEN dtmoove END) as first_migration_date,
@@ -369,7 +942,7 @@ class Database:
         """
         
         try:
-            result = self._execute_query(query, fetch=True)
+            result = self._execute_query(query, fetch=True, session=session)
             if result:
                 stats = result[0]
                 self.logger.log_system_info("Получена статистика миграции")
@@ -381,28 +954,27 @@ class Database:
             self.logger.log_database_error("get_migration_statistics", e)
             raise
     
-    def cleanup_old_connections(self) -> None:
-        """Очищает старые соединения из пула."""
-        try:
-            if self.connection_pool:
-                # Принудительно закрываем все соединения
-                for _ in range(self.connection_pool.pool_size):
-                    try:
-                        conn = self.connection_pool.get_connection()
-                        conn.close()
-                    except:
-                        pass
-                
-                self.logger.log_system_info("Очистка старых соединений выполнена")
-                
-        except Exception as e:
-            self.logger.log_database_error("cleanup_old_connections", e)
+    def _close_pool_connections(self) -> None:
+        """
+        Закрывает простаивающие соединения пула при закрытии базы данных.
+        
+        После вызова очередь пула пуста и пул непригоден, поэтому метод
+        вызывается только из close(). Соединения, выданные сессиям, не
+        закрываются - сессии нужно закрыть до close().
+        """
+        remove_connections = getattr(self.connection_pool, '_remove_connections', None)
+        if remove_connections is not None:
+            # Закрываем сокеты простаивающих соединений прямо в очереди пула
+            remove_connections()
+        # У пула без _remove_connections нет способа закрыть соединения:
+        # get_connection + close лишь вернет соединение в очередь, а сокеты
+        # закроются при сборке мусора пула
     
     def close(self) -> None:
         """Закрывает все соединения и очищает ресурсы."""
         try:
             if self.connection_pool:
-                self.cleanup_old_connections()
+                self._close_pool_connections()
                 self.connection_pool = None
             
             self.logger.log_database_disconnected()
@@ -456,16 +1028,16 @@ if __name__ == "__main__":
             stats = db.get_migration_statistics()
             print(f"📊 Статистика: {stats}")
             
-            # Получаем количество файлов
-            total = db.get_total_files_count()
-            unmoved = db.get_unmoved_files_count()
+            # Количество файлов берем из той же статистики
+            total = stats.get('total_files', 0)
+            unmoved = stats.get('unmoved_files', 0)
             print(f"📁 Всего файлов: {total}, не перемещено: {unmoved}")
             
             # Получаем файлы для миграции
             files = db.get_files_to_move(5)
             print(f"📦 Файлы для миграции: {len(files)}")
-            for file_info in files[:3]:  # Показываем первые 3
-                print(f"   • {file_info['IDFL']} - {file_info['filename']}")
+            for idfl, dt in files[:3]:  # Показываем первые 3
+                print(f"   • {idfl} - {dt}")
             
         else:
             print("❌ Ошибка подключения к БД")
@@ -5,10 +5,14 @@
 новой структуры каталогов по датам (YYYYMMDD).
 """
 
+import ctypes
+import errno
+import mmap
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Union, List
+from typing import BinaryIO, Callable, Optional, Union, List, Set, Tuple, Dict, Iterable
 from datetime import datetime
 import hashlib
 
@@ -19,6 +23,250 @@ except ImportError:
     from config_loader import PathsConfig
     from logger import FileMigratorLogger
 
+# Быстрые некриптографические хеши для проверки целостности (опционально)
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+
+# Размер блока чтения при хешировании, если файл нельзя отобразить в память
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Начиная с этого размера blake3 хеширует файл в несколько потоков
+PARALLEL_HASH_MIN_SIZE = 64 * 1024 * 1024
+
+# Объем одного вызова copy_file_range/sendfile при копировании между ФС
+KERNEL_COPY_CHUNK = 1024 * 1024 * 1024
+
+# Ошибки, означающие, что копирование в ядре для этой пары файлов недоступно
+_KERNEL_COPY_UNSUPPORTED = frozenset({errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP})
+
+# Алгоритм проверки целостности при перемещении: самый быстрый из доступных
+if xxhash is not None:
+    INTEGRITY_HASH_ALGORITHM = 'xxh3'
+elif blake3 is not None:
+    INTEGRITY_HASH_ALGORITHM = 'blake3'
+else:
+    INTEGRITY_HASH_ALGORITHM = 'md5'
+
+# Конструкторы хешей по имени алгоритма (только доступные в окружении)
+_HASH_FACTORIES = {
+    'md5': hashlib.md5,
+    'sha1': hashlib.sha1,
+    'sha256': hashlib.sha256,
+}
+if xxhash is not None:
+    _HASH_FACTORIES['xxh3'] = xxhash.xxh3_128
+if blake3 is not None:
+    _HASH_FACTORIES['blake3'] = blake3.blake3
+
+# Константы renameat2(2) из <fcntl.h> и <linux/fs.h>
+AT_FDCWD = -100
+RENAME_NOREPLACE = 1
+
+
+def _load_renameat2():
+    """Возвращает renameat2 из libc или None, если он недоступен (не Linux, старая glibc)."""
+    try:
+        func = ctypes.CDLL(None, use_errno=True).renameat2
+    except (OSError, AttributeError):
+        return None
+    func.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    func.restype = ctypes.c_int
+    return func
+
+
+_renameat2 = _load_renameat2()
+
+
+def _load_syncfs():
+    """Возвращает syncfs из libc или None, если он недоступен."""
+    try:
+        func = ctypes.CDLL(None, use_errno=True).syncfs
+    except (OSError, AttributeError):
+        return None
+    func.argtypes = [ctypes.c_int]
+    func.restype = ctypes.c_int
+    return func
+
+
+_syncfs = _load_syncfs()
+
+
+def _fadvise(fd: int, advice_name: str) -> None:
+    """
+    Передает ядру совет об использовании страничного кеша для файла.
+    
+    На платформах без posix_fadvise или без нужной константы ничего не делает.
+    
+    Args:
+        fd: Дескриптор файла
+        advice_name: Имя константы os.POSIX_FADV_*
+    """
+    advice = getattr(os, advice_name, None)
+    if advice is None or not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, advice)
+    except OSError:
+        pass
+
+
+def _sync_filesystem(path: str) -> None:
+    """
+    Сбрасывает на диск данные файловой системы, на которой находится path.
+    
+    Один syncfs заменяет fsync каждого записанного файла; без syncfs
+    используется общий os.sync.
+    
+    Args:
+        path: Любой путь на нужной файловой системе
+        
+    Raises:
+        OSError: Если сброс не удался
+    """
+    if _syncfs is None:
+        os.sync()
+        return
+        
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        if _syncfs(fd) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+    finally:
+        os.close(fd)
+
+
+def _copy_file_data(src: BinaryIO, dst: BinaryIO) -> None:
+    """
+    Копирует содержимое файла, не поднимая данные в пространство пользователя.
+    
+    Сначала используется copy_file_range, затем sendfile; если ядро или
+    файловые системы не поддерживают ни один из них, данные копируются
+    обычным циклом чтения-записи.
+    
+    Args:
+        src: Исходный файл, открытый на чтение (позиция - начало файла)
+        dst: Новый файл, открытый на запись
+        
+    Raises:
+        OSError: Если копирование не удалось
+    """
+    src_fd, dst_fd = src.fileno(), dst.fileno()
+    
+    if hasattr(os, 'copy_file_range'):
+        copied = 0
+        try:
+            while True:
+                size = os.copy_file_range(src_fd, dst_fd, KERNEL_COPY_CHUNK)
+                if not size:
+                    return
+                copied += size
+        except OSError as e:
+            # После частичного копирования переключаться на другой способ нельзя
+            if copied or e.errno not in _KERNEL_COPY_UNSUPPORTED:
+                raise
+                
+    if hasattr(os, 'sendfile'):
+        copied = 0
+        try:
+            while True:
+                size = os.sendfile(dst_fd, src_fd, None, KERNEL_COPY_CHUNK)
+                if not size:
+                    return
+                copied += size
+        except OSError as e:
+            if copied or e.errno not in _KERNEL_COPY_UNSUPPORTED:
+                raise
+                
+    shutil.copyfileobj(src, dst, HASH_CHUNK_SIZE)
+
+
+def _read_whole_file(path: Union[str, Path]) -> bytes:
+    """
+    Читает файл целиком без буферизованного объекта файла.
+    
+    Размер берется из fstat, и обычно весь файл читается одним os.read:
+    запрос на байт больше размера сразу показывает конец файла.
+    
+    Args:
+        path: Путь к файлу
+        
+    Returns:
+        bytes: Содержимое файла
+        
+    Raises:
+        OSError: Если файл не удалось открыть или прочитать
+    """
+    fd = os.open(path, os.O_RDONLY | getattr(os, 'O_CLOEXEC', 0))
+    try:
+        size = os.fstat(fd).st_size
+        content = os.read(fd, size + 1)
+        if len(content) == size:
+            return content
+            
+        # Файл изменился после fstat или не прочитан за один вызов
+        parts = [content]
+        while content:
+            content = os.read(fd, max(size, HASH_CHUNK_SIZE))
+            parts.append(content)
+        return b''.join(parts)
+    finally:
+        os.close(fd)
+
+
+def _rename_noreplace(source: Union[str, Path], target: Union[str, Path]) -> None:
+    """
+    Переименовывает файл, не перезаписывая существующий.
+    
+    Args:
+        source: Исходный путь
+        target: Целевой путь
+        
+    Raises:
+        FileExistsError: Если целевой файл уже существует
+        OSError: Прочие ошибки переименования (в т.ч. ENOENT)
+    """
+    if _renameat2 is not None:
+        if _renameat2(AT_FDCWD, os.fsencode(source), AT_FDCWD, os.fsencode(target), RENAME_NOREPLACE) == 0:
+            return
+        err = ctypes.get_errno()
+        # EINVAL/ENOSYS - ФС или ядро не поддерживают флаг, используем link + unlink
+        if err not in (errno.EINVAL, errno.ENOSYS):
+            raise OSError(err, os.strerror(err), str(source), None, str(target))
+            
+    # link не перезаписывает существующий файл, поэтому коллизия также дает EEXIST
+    try:
+        os.link(source, target)
+    except OSError as e:
+        if e.errno not in (errno.EPERM, errno.EOPNOTSUPP):
+            raise
+        # ФС без жестких ссылок: rename с предварительной проверкой имени
+        if os.path.lexists(target):
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), str(target))
+        os.rename(source, target)
+        return
+        
+    try:
+        os.unlink(source)
+    except OSError as e:
+        # Исходное имя уже удалено - файл остался только под новым именем
+        if e.errno == errno.ENOENT:
+            return
+        # Не оставляем файл под двумя именами
+        try:
+            os.unlink(target)
+        except OSError:
+            pass
+        raise
+
 
 class FileOperationError(Exception):
     """Исключение для ошибок операций с файлами."""
@@ -33,27 +281,49 @@ class FileNotFoundError(FileOperationError):
 class FileOps:
     """Класс для операций с файловой системой."""
     
-    def __init__(self, paths_config: PathsConfig, logger: FileMigratorLogger):
+    def __init__(self, paths_config: PathsConfig, logger: FileMigratorLogger,
+                 drop_page_cache: bool = False):
         """
         Инициализация операций с файлами.
         
         Args:
             paths_config: Конфигурация путей
             logger: Логгер для записи операций
+            drop_page_cache: Вытеснять из страничного кеша файлы, скопированные
+                между файловыми системами
         """
         self.paths_config = paths_config
         self.logger = logger
+        self.drop_page_cache = drop_page_cache
         self.base_path = Path(paths_config.file_path)
         self.new_base_path = Path(paths_config.new_file_path)
         
+        # Пути к файлам собираются строками через os.path.join, без Path на каждый файл;
+        # Path создается только для результата публичных методов
+        self._base_str = os.fspath(self.base_path)
+        self._new_base_str = os.fspath(self.new_base_path)
+        
+        # Каталоги по датам, уже созданные за время работы (без повторных mkdir)
+        self._created_dirs: Set[Path] = set()
+        
+        # Пути каталогов по датам: (год, месяц, день) -> Path, без strftime на каждый файл
+        self._date_dirs: Dict[Tuple[int, int, int], Path] = {}
+        
+        # Копии без fsync, ожидающие finish_deferred_moves:
+        # (idfl, исходный путь, путь копии, конструктор хеша, хеш при копировании)
+        self._pending_unlinks: List[Tuple[str, str, str, Callable, str]] = []
+        
         # Создаем базовые каталоги если они не существуют
         self._ensure_directories_exist()
+        
+        # На одной файловой системе файл перемещается одним системным вызовом rename
+        self._same_fs = self.base_path.stat().st_dev == self.new_base_path.stat().st_dev
     
     def _ensure_directories_exist(self) -> None:
         """Создает необходимые каталоги если они не существуют."""
         try:
-            self.base_path.mkdir(parents=True, exist_ok=True)
-            self.new_base_path.mkdir(parents=True, exist_ok=True)
+            os.makedirs(self._base_str, exist_ok=True)
+            os.makedirs(self._new_base_str, exist_ok=True)
             self.logger.log_system_info(f"Каталоги созданы: {self.base_path}, {self.new_base_path}")
         except Exception as e:
             self.logger.log_database_error("create_directories", e)
@@ -69,8 +339,28 @@ class FileOps:
         Returns:
             Path: Путь к каталогу по дате
         """
-        date_str = dt.strftime("%Y%m%d")
-        return self.new_base_path / date_str
+        key = (dt.year, dt.month, dt.day)
+        date_dir = self._date_dirs.get(key)
+        if date_dir is None:
+            date_dir = self.new_base_path / dt.strftime("%Y%m%d")
+            self._date_dirs[key] = date_dir
+        return date_dir
+    
+    def _file_path(self, idfl: str, ismooved: bool, dt: datetime) -> str:
+        """
+        Получает путь к файлу по старой или новой схеме.
+        
+        Args:
+            idfl: Идентификатор файла
+            ismooved: Признак перемещения файла
+            dt: Дата файла (для новой схемы)
+            
+        Returns:
+            str: Путь к файлу
+        """
+        if ismooved:
+            return os.path.join(os.fspath(self._get_date_directory(dt)), idfl)
+        return os.path.join(self._base_str, idfl)
     
     def _ensure_date_directory_exists(self, dt: datetime) -> Path:
         """
@@ -83,13 +373,33 @@ class FileOps:
             Path: Путь к созданному каталогу
         """
         date_dir = self._get_date_directory(dt)
+        if date_dir in self._created_dirs:
+            return date_dir
+            
         try:
-            date_dir.mkdir(parents=True, exist_ok=True)
+            os.makedirs(date_dir, exist_ok=True)
+            self._created_dirs.add(date_dir)
             return date_dir
         except Exception as e:
             self.logger.log_database_error("create_date_directory", e)
             raise FileOperationError(f"Ошибка создания каталога по дате: {e}")
     
+    def ensure_date_directories(self, dates: Iterable[datetime]) -> None:
+        """
+        Создает каталоги для набора дат заранее, по одному mkdir на каталог.
+        
+        Ошибки только логируются: файл, каталог которого не удалось создать,
+        получит ошибку при перемещении.
+        
+        Args:
+            dates: Даты файлов (повторы допускаются)
+        """
+        for dt in dates:
+            try:
+                self._ensure_date_directory_exists(dt)
+            except FileOperationError:
+                pass
+    
     def move_file(self, idfl: str, dt: datetime) -> Path:
         """
         Перемещает файл в новую структуру каталогов по дате.
@@ -105,35 +415,118 @@ class FileOps:
             FileNotFoundError: Если исходный файл не найден
             FileOperationError: Если произошла ошибка при перемещении
         """
-        source_path = self.base_path / idfl
-        
-        if not source_path.exists():
-            error_msg = f"Исходный файл не найден: {source_path}"
-            self.logger.log_file_error(idfl, FileNotFoundError(error_msg))
-            raise FileNotFoundError(error_msg)
+        source_path = os.path.join(self._base_str, idfl)
         
         try:
             # Создаем каталог по дате
             target_dir = self._ensure_date_directory_exists(dt)
-            target_path = target_dir / idfl
-            
-            # Проверяем, не существует ли уже файл в целевом каталоге
-            if target_path.exists():
-                # Создаем уникальное имя файла
-                target_path = self._get_unique_filename(target_dir, idfl)
             
-            # Перемещаем файл
-            shutil.move(str(source_path), str(target_path))
+            # EAFP: отсутствие источника приходит как ENOENT от rename/copy2
+            if self._same_fs:
+                # Коллизия имен приходит как ошибка rename
+                target_path = self._rename_to_free_name(source_path, target_dir, idfl)
+            else:
+                # Другая ФС: rename заведомо вернет EXDEV, поэтому сразу копируем
+                # в ядре и сбрасываем копию на диск до удаления исходного файла
+                with open(source_path, 'rb', buffering=0) as src:
+                    target_path, dst = self._create_target_file(target_dir, idfl)
+                    try:
+                        with dst:
+                            _copy_file_data(src, dst)
+                            dst.flush()
+                            # fdatasync есть не на всех платформах (например, macOS)
+                            getattr(os, 'fdatasync', os.fsync)(dst.fileno())
+                            if self.drop_page_cache:
+                                # Перемещенные файлы больше не читаются - не вытесняем ими
+                                # из кеша данные других процессов
+                                _fadvise(dst.fileno(), 'POSIX_FADV_DONTNEED')
+                                _fadvise(src.fileno(), 'POSIX_FADV_DONTNEED')
+                        shutil.copystat(source_path, target_path)
+                    except BaseException:
+                        # Не оставляем частично скопированный файл
+                        try:
+                            os.unlink(target_path)
+                        except OSError:
+                            pass
+                        raise
+                self._remove_source(source_path, target_path)
             
             self.logger.log_file_moved(idfl, source_path, target_path)
             self.logger.log_file_operation("move", target_path, True)
             
-            return target_path
+            return Path(target_path)
             
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                if not os.path.exists(source_path):
+                    raise self._source_not_found(idfl, source_path)
+                # Каталог по дате удален извне - создадим его заново при следующем вызове
+                self._created_dirs.discard(self._get_date_directory(dt))
+            self.logger.log_file_error(idfl, e)
+            raise FileOperationError(f"Ошибка перемещения файла {idfl}: {e}")
         except Exception as e:
             self.logger.log_file_error(idfl, e)
             raise FileOperationError(f"Ошибка перемещения файла {idfl}: {e}")
     
+    def _source_not_found(self, idfl: str, source_path: str) -> "FileNotFoundError":
+        """
+        Логирует и возвращает ошибку отсутствия исходного файла.
+        
+        Args:
+            idfl: Идентификатор файла
+            source_path: Путь к исходному файлу
+            
+        Returns:
+            FileNotFoundError: Исключение для выброса
+        """
+        error_msg = f"Исходный файл не найден: {source_path}"
+        error = FileNotFoundError(error_msg)
+        self.logger.log_file_error(idfl, error)
+        return error
+    
+    def _rename_to_free_name(self, source_path: str, target_dir: Path, filename: str) -> str:
+        """
+        Переименовывает файл в каталог без перезаписи существующих файлов.
+        
+        Args:
+            source_path: Путь к исходному файлу
+            target_dir: Целевой каталог
+            filename: Желаемое имя файла
+            
+        Returns:
+            str: Итоговый путь к файлу
+        """
+        target_path = os.path.join(os.fspath(target_dir), filename)
+        try:
+            _rename_noreplace(source_path, target_path)
+            return target_path
+        except FileExistsError:
+            # Имя занято - подбираем уникальное
+            target_path = os.fspath(self._get_unique_filename(target_dir, filename))
+            _rename_noreplace(source_path, target_path)
+            return target_path
+    
+    def _create_target_file(self, directory: Path, filename: str) -> Tuple[str, BinaryIO]:
+        """
+        Создает новый файл в каталоге, не перезаписывая существующий.
+        
+        Сначала файл открывается под исходным именем в режиме 'xb'; только
+        при коллизии подбирается уникальное имя.
+        
+        Args:
+            directory: Целевой каталог
+            filename: Исходное имя файла
+            
+        Returns:
+            Tuple[str, BinaryIO]: (путь к созданному файлу, файл, открытый на запись)
+        """
+        target_path = os.path.join(os.fspath(directory), filename)
+        try:
+            return target_path, open(target_path, 'xb')
+        except FileExistsError:
+            target_path = os.fspath(self._get_unique_filename(directory, filename))
+            return target_path, open(target_path, 'xb')
+    
     def _get_unique_filename(self, directory: Path, filename: str) -> Path:
         """
         Получает уникальное имя файла в каталоге.
@@ -145,9 +538,14 @@ class FileOps:
         Returns:
             Path: Уникальное имя файла
         """
-        base_path = directory / filename
-        if not base_path.exists():
-            return base_path
+        # Одно чтение каталога вместо проверки exists() для каждого кандидата
+        try:
+            existing = set(os.listdir(directory))
+        except OSError:
+            existing = set()
+            
+        if filename not in existing:
+            return directory / filename
         
         # Добавляем суффикс с номером
         name_parts = filename.rsplit('.', 1)
@@ -161,9 +559,8 @@ class FileOps:
         counter = 1
         while True:
             new_name = f"{base_name}_{counter}{extension}"
-            new_path = directory / new_name
-            if not new_path.exists():
-                return new_path
+            if new_name not in existing:
+                return directory / new_name
             counter += 1
     
     def read_file(self, idfl: str, ismooved: bool, dt: datetime) -> bytes:
@@ -183,22 +580,17 @@ class FileOps:
             FileOperationError: Если произошла ошибка при чтении
         """
         try:
-            if ismooved:
-                # Читаем по новой схеме (из каталога по дате)
-                date_dir = self._get_date_directory(dt)
-                file_path = date_dir / idfl
-            else:
-                # Читаем по старой схеме (из базового каталога)
-                file_path = self.base_path / idfl
+            file_path = self._file_path(idfl, ismooved, dt)
             
-            if not file_path.exists():
+            try:
+                content = _read_whole_file(file_path)
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    raise
                 error_msg = f"Файл не найден: {file_path}"
                 self.logger.log_file_error(idfl, FileNotFoundError(error_msg))
                 raise FileNotFoundError(error_msg)
             
-            with open(file_path, 'rb') as f:
-                content = f.read()
-            
             self.logger.log_file_operation("read", file_path, True)
             return content
             
@@ -230,15 +622,12 @@ class FileOps:
         try:
             # Создаем каталог по дате
             target_dir = self._ensure_date_directory_exists(dt)
-            target_path = target_dir / idfl
             
-            # Проверяем, не существует ли уже файл
-            if target_path.exists():
-                target_path = self._get_unique_filename(target_dir, idfl)
-            
-            # Записываем файл
-            with open(target_path, 'wb') as f:
+            # Записываем файл; при коллизии имен берется уникальное имя
+            target_path, f = self._create_target_file(target_dir, idfl)
+            with f:
                 f.write(data)
+            target_path = Path(target_path)
             
             self.logger.log_file_operation("write", target_path, True)
             self.logger.log_system_info(f"Новый файл записан: {idfl} -> {target_path}")
@@ -249,6 +638,41 @@ class FileOps:
             self.logger.log_file_error(idfl, e)
             raise FileOperationError(f"Ошибка записи файла {idfl}: {e}")
     
+    def write_files(self, items: Iterable[Tuple[str, str, bytes, Optional[datetime]]],
+                    max_workers: Optional[int] = None) -> Dict[str, Optional[Path]]:
+        """
+        Записывает набор новых файлов, выполняя несколько записей одновременно.
+        
+        Создание файлов и запись отпускают GIL, поэтому задержки файловой
+        системы для одних файлов перекрываются записью других. Каталоги по
+        датам создаются заранее, по одному разу.
+        
+        Args:
+            items: Кортежи (idfl, filename, data, dt), как аргументы write_file
+            max_workers: Количество потоков (по умолчанию как у ThreadPoolExecutor)
+            
+        Returns:
+            Dict[str, Optional[Path]]: Путь к записанному файлу по IDFL
+            (None, если файл записать не удалось)
+        """
+        now = datetime.now()
+        items = [
+            (idfl, filename, data, dt if dt is not None else now)
+            for idfl, filename, data, dt in items
+        ]
+        self.ensure_date_directories(item[3] for item in items)
+        
+        def write(item):
+            try:
+                return self.write_file(*item)
+            except FileOperationError:
+                # Ошибка уже записана в лог write_file
+                return None
+                
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            paths = executor.map(write, items)
+            return {item[0]: path for item, path in zip(items, paths)}
+    
     def file_exists(self, idfl: str, ismooved: bool, dt: datetime) -> bool:
         """
         Проверяет существование файла по старой или новой схеме.
@@ -262,16 +686,10 @@ class FileOps:
             bool: True если файл существует
         """
         try:
-            if ismooved:
-                # Проверяем по новой схеме
-                date_dir = self._get_date_directory(dt)
-                file_path = date_dir / idfl
-            else:
-                # Проверяем по старой схеме
-                file_path = self.base_path / idfl
+            file_path = self._file_path(idfl, ismooved, dt)
             
-            exists = file_path.exists()
-            self.logger.log_system_info(f"Проверка файла {idfl}: {'существует' if exists else 'не найден'}")
+            exists = os.path.exists(file_path)
+            self.logger.log_debug("Проверка файла %s: %s", idfl, 'существует' if exists else 'не найден')
             return exists
             
         except Exception as e:
@@ -291,18 +709,17 @@ class FileOps:
             int или None: Размер файла в байтах или None если файл не найден
         """
         try:
-            if ismooved:
-                date_dir = self._get_date_directory(dt)
-                file_path = date_dir / idfl
-            else:
-                file_path = self.base_path / idfl
+            file_path = self._file_path(idfl, ismooved, dt)
             
-            if file_path.exists():
-                size = file_path.stat().st_size
-                self.logger.log_system_info(f"Размер файла {idfl}: {size} байт")
-                return size
-            else:
-                return None
+            try:
+                size = os.stat(file_path).st_size
+            except OSError as e:
+                if e.errno == errno.ENOENT:
+                    return None
+                raise
+                
+            self.logger.log_debug("Размер файла %s: %d байт", idfl, size)
+            return size
                 
         except Exception as e:
             self.logger.log_file_error(idfl, e)
@@ -316,44 +733,515 @@ class FileOps:
             idfl: Идентификатор файла
             ismooved: Признак перемещения файла
             dt: Дата файла (для новой схемы)
-            algorithm: Алгоритм хеширования (md5, sha1, sha256)
+            algorithm: Алгоритм хеширования (md5, sha1, sha256, а также
+                xxh3 и blake3 при установленных пакетах xxhash и blake3)
             
         Returns:
             str или None: Хеш файла или None если файл не найден
         """
         try:
-            if ismooved:
-                date_dir = self._get_date_directory(dt)
-                file_path = date_dir / idfl
-            else:
-                file_path = self.base_path / idfl
-            
-            if not file_path.exists():
-                return None
+            file_path = self._file_path(idfl, ismooved, dt)
+            hash_factory = self._hash_factory(algorithm)
             
-            # Выбираем алгоритм хеширования
-            if algorithm == 'md5':
-                hasher = hashlib.md5()
-            elif algorithm == 'sha1':
-                hasher = hashlib.sha1()
-            elif algorithm == 'sha256':
-                hasher = hashlib.sha256()
-            else:
-                raise ValueError(f"Неподдерживаемый алгоритм: {algorithm}")
-            
-            # Читаем файл и вычисляем хеш
-            with open(file_path, 'rb') as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hasher.update(chunk)
+            try:
+                f = open(file_path, 'rb', buffering=0)
+            except OSError as e:
+                if e.errno == errno.ENOENT:
+                    return None
+                raise
+                
+            with f:
+                file_hash = self._digest_file(f, hash_factory)
             
-            file_hash = hasher.hexdigest()
-            self.logger.log_system_info(f"Хеш файла {idfl} ({algorithm}): {file_hash}")
+            self.logger.log_debug("Хеш файла %s (%s): %s", idfl, algorithm, file_hash)
             return file_hash
             
         except Exception as e:
             self.logger.log_file_error(idfl, e)
             return None
     
+    def get_file_hashes(self, files: Iterable[Tuple[str, bool, datetime]],
+                        algorithm: str = 'md5',
+                        max_workers: Optional[int] = None) -> Dict[str, Optional[str]]:
+        """
+        Получает хеши набора файлов, читая несколько файлов одновременно.
+        
+        Чтение и хеширование отпускают GIL, поэтому ожидание диска для
+        одних файлов перекрывается хешированием других.
+        
+        Args:
+            files: Кортежи (idfl, ismooved, dt)
+            algorithm: Алгоритм хеширования (как в get_file_hash)
+            max_workers: Количество потоков (по умолчанию как у ThreadPoolExecutor)
+            
+        Returns:
+            Dict[str, Optional[str]]: Хеш по IDFL (None, если файл не найден)
+        """
+        files = list(files)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            hashes = executor.map(
+                lambda file: self.get_file_hash(file[0], file[1], file[2], algorithm), files
+            )
+            return {file[0]: file_hash for file, file_hash in zip(files, hashes)}
+    
+    @staticmethod
+    def _hash_factory(algorithm: str):
+        """
+        Возвращает конструктор объекта хеша для алгоритма.
+        
+        Args:
+            algorithm: Алгоритм хеширования
+            
+        Returns:
+            Конструктор объекта хеша
+            
+        Raises:
+            ValueError: Если алгоритм не поддерживается
+        """
+        try:
+            return _HASH_FACTORIES[algorithm]
+        except KeyError:
+            raise ValueError(f"Неподдерживаемый алгоритм: {algorithm}") from None
+    
+    @staticmethod
+    def _digest_file(f, hash_factory) -> str:
+        """
+        Вычисляет хеш открытого файла.
+        
+        Args:
+            f: Файл, открытый в двоичном режиме
+            hash_factory: Конструктор объекта хеша
+            
+        Returns:
+            str: Хеш в шестнадцатеричном виде
+        """
+        # mmap используется только там, где без него нельзя: если файл усекут,
+        # пока он отображен, обращение к странице убьет процесс сигналом SIGBUS
+        size = os.fstat(f.fileno()).st_size
+        
+        # blake3 сам распараллеливает хеширование большого буфера по ядрам,
+        # хеш совпадает с однопоточным; для этого нужен весь файл одним буфером
+        if (blake3 is not None and hash_factory is blake3.blake3
+                and size >= PARALLEL_HASH_MIN_SIZE):
+            hasher = blake3.blake3(max_threads=blake3.blake3.AUTO)
+            if FileOps._update_from_mmap(f, hasher):
+                return hasher.hexdigest()
+                
+        # file_digest крутит цикл чтения в C
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, hash_factory).hexdigest()
+            
+        # Без file_digest большой файл передается в C одним update через mmap
+        hasher = hash_factory()
+        if size > HASH_CHUNK_SIZE and FileOps._update_from_mmap(f, hasher):
+            return hasher.hexdigest()
+            
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+        return hasher.hexdigest()
+    
+    @staticmethod
+    def _update_from_mmap(f, hasher) -> bool:
+        """
+        Хеширует открытый файл одним update через отображение в память.
+        
+        Args:
+            f: Файл, открытый в двоичном режиме
+            hasher: Объект хеша
+            
+        Returns:
+            bool: False, если файл нельзя отобразить (хеш не изменен)
+        """
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    data.madvise(mmap.MADV_SEQUENTIAL)
+                hasher.update(data)
+            return True
+        except (ValueError, OverflowError, OSError):
+            # Пустой файл, файл больше адресного пространства или не отображаемый файл
+            return False
+    
+    def move_file_with_hash(self, idfl: str, dt: datetime,
+                            algorithm: str = INTEGRITY_HASH_ALGORITHM,
+                            defer_sync: bool = False,
+                            hash_renamed: bool = True) -> Tuple[Path, Optional[str]]:
+        """
+        Перемещает файл в новую структуру, вычисляя хеш за одно чтение.
+        
+        На одной файловой системе файл хешируется и переименовывается
+        (rename не меняет данные). Между файловыми системами хеш считается
+        в том же цикле, что и копирование; после сброса на диск копия читается
+        заново и сверяется с ним, и только затем исходный файл удаляется.
+        При несовпадении копия удаляется, исходный файл остается на месте.
+        
+        С hash_renamed=False файл на той же файловой системе только
+        переименовывается, без чтения данных, и хеш не возвращается.
+        
+        С defer_sync=True копия между файловыми системами не синхронизируется
+        по отдельности, а сверка копии и удаление исходного файла выполняются
+        в finish_deferred_moves - после одного сброса файловой системы на весь батч.
+        
+        Args:
+            idfl: Идентификатор файла
+            dt: Дата для создания структуры каталогов
+            algorithm: Алгоритм хеширования
+            defer_sync: Отложить fsync и удаление исходного файла
+            hash_renamed: Хешировать файл, перемещаемый переименованием
+            
+        Returns:
+            Tuple[Path, Optional[str]]: (путь к перемещенному файлу, хеш содержимого
+                или None, если файл переименован без хеширования)
+            
+        Raises:
+            FileNotFoundError: Если исходный файл не найден
+            FileOperationError: Если произошла ошибка при перемещении
+        """
+        source_path = os.path.join(self._base_str, idfl)
+        
+        if self._same_fs and not hash_renamed:
+            return self.move_file(idfl, dt), None
+        
+        try:
+            hash_factory = self._hash_factory(algorithm)
+            
+            if self._same_fs:
+                with open(source_path, 'rb', buffering=0) as f:
+                    file_hash = self._digest_file(f, hash_factory)
+                target_path = self.move_file(idfl, dt)
+            else:
+                target_path, file_hash = self._copy_with_hash(idfl, source_path, dt, hash_factory, defer_sync)
+                
+            self.logger.log_debug("Хеш файла %s (%s): %s", idfl, algorithm, file_hash)
+            return target_path, file_hash
+            
+        except FileOperationError:
+            raise
+        except OSError as e:
+            if e.errno == errno.ENOENT and not os.path.exists(source_path):
+                raise self._source_not_found(idfl, source_path)
+            self.logger.log_file_error(idfl, e)
+            raise FileOperationError(f"Ошибка перемещения файла {idfl}: {e}")
+        except Exception as e:
+            self.logger.log_file_error(idfl, e)
+            raise FileOperationError(f"Ошибка перемещения файла {idfl}: {e}")
+    
+    def _copy_with_hash(self, idfl: str, source_path: str, dt: datetime,
+                        hash_factory, defer_sync: bool = False) -> Tuple[Path, str]:
+        """
+        Копирует файл на другую файловую систему, хешируя данные в том же цикле.
+        
+        Args:
+            idfl: Идентификатор файла
+            source_path: Путь к исходному файлу
+            dt: Дата для создания структуры каталогов
+            hash_factory: Конструктор объекта хеша
+            defer_sync: Отложить fsync и удаление исходного файла
+            
+        Returns:
+            Tuple[Path, str]: (путь к перемещенному файлу, хеш содержимого)
+        """
+        target_dir = self._ensure_date_directory_exists(dt)
+        
+        hasher = hash_factory()
+        buffer = bytearray(HASH_CHUNK_SIZE)
+        view = memoryview(buffer)
+        
+        with open(source_path, 'rb', buffering=0) as src:
+            if self.drop_page_cache:
+                _fadvise(src.fileno(), 'POSIX_FADV_SEQUENTIAL')
+                
+            # Файл создается в режиме 'xb' без предварительной проверки имени
+            target_path, dst = self._create_target_file(target_dir, idfl)
+            try:
+                with dst:
+                    while True:
+                        size = src.readinto(buffer)
+                        if not size:
+                            break
+                        hasher.update(view[:size])
+                        dst.write(view[:size])
+                    if not defer_sync:
+                        dst.flush()
+                        os.fsync(dst.fileno())
+                    if self.drop_page_cache:
+                        # Перемещенные файлы больше не читаются - не вытесняем ими
+                        # из кеша данные других процессов. Страницы копии до сброса
+                        # на диск грязные, их вытесняет _verify_copy после сброса
+                        _fadvise(src.fileno(), 'POSIX_FADV_DONTNEED')
+                shutil.copystat(source_path, target_path)
+                if not defer_sync:
+                    self._verify_copy(idfl, target_path, hash_factory, hasher.hexdigest())
+            except BaseException:
+                # Не оставляем частично скопированный или поврежденный файл
+                try:
+                    os.unlink(target_path)
+                except OSError:
+                    pass
+                raise
+                
+        if defer_sync:
+            self._pending_unlinks.append((idfl, source_path, target_path, hash_factory, hasher.hexdigest()))
+        else:
+            self._remove_source(source_path, target_path)
+        
+        self.logger.log_file_moved(idfl, source_path, target_path)
+        self.logger.log_file_operation("move", target_path, True)
+        
+        return Path(target_path), hasher.hexdigest()
+    
+    def _verify_copy(self, idfl: str, target_path: str, hash_factory, expected_hash: str) -> None:
+        """
+        Сверяет хеш записанной копии с хешем, посчитанным при копировании.
+        
+        Вызывается после сброса копии на диск. С drop_page_cache ее чистые
+        страницы вытесняются до чтения (сверка читает данные с диска) и после.
+        
+        Args:
+            idfl: Идентификатор файла
+            target_path: Путь к копии в новой структуре
+            hash_factory: Конструктор объекта хеша
+            expected_hash: Хеш данных, прочитанных из исходного файла
+            
+        Raises:
+            FileOperationError: Если хеши не совпадают
+        """
+        with open(target_path, 'rb', buffering=0) as f:
+            if self.drop_page_cache:
+                _fadvise(f.fileno(), 'POSIX_FADV_DONTNEED')
+            actual_hash = self._digest_file(f, hash_factory)
+            if self.drop_page_cache:
+                _fadvise(f.fileno(), 'POSIX_FADV_DONTNEED')
+        if actual_hash != expected_hash:
+            raise FileOperationError(
+                f"Копия файла {idfl} не совпадает с исходным: хеш {actual_hash}, ожидался {expected_hash}"
+            )
+    
+    def finish_deferred_moves(self) -> Dict[str, Exception]:
+        """
+        Завершает отложенные перемещения: один сброс новой файловой системы
+        на диск, затем сверка хеша каждой копии и удаление исходных файлов.
+        
+        Перемещение, которое не удалось завершить, откатывается: копия
+        удаляется, исходный файл остается на месте. Так файл не оказывается
+        в обоих деревьях, и следующий запуск не создаст копию с другим именем.
+        
+        Returns:
+            Dict[str, Exception]: Ошибка по IDFL для незавершенных перемещений
+                (пустой словарь, если все перемещения завершены)
+        """
+        if not self._pending_unlinks:
+            return {}
+            
+        pending, self._pending_unlinks = self._pending_unlinks, []
+        
+        try:
+            _sync_filesystem(self._new_base_str)
+        except OSError as e:
+            # Копии еще не гарантированно на диске - удаляем их, исходные файлы остаются
+            self.logger.log_warning(f"Не удалось сбросить данные на диск, перемещения отменены: {e}")
+            for _, _, target_path, _, _ in pending:
+                self._discard_copy(target_path)
+            return {idfl: e for idfl, _, _, _, _ in pending}
+            
+        failed: Dict[str, Exception] = {}
+        for idfl, source_path, target_path, hash_factory, file_hash in pending:
+            try:
+                self._verify_copy(idfl, target_path, hash_factory, file_hash)
+            except (FileOperationError, OSError) as e:
+                self.logger.log_file_error(idfl, e)
+                self._discard_copy(target_path)
+                failed[idfl] = e
+                continue
+            try:
+                self._remove_source(source_path, target_path)
+            except OSError as e:
+                self.logger.log_file_error(idfl, e)
+                failed[idfl] = e
+                
+        self.logger.log_debug("Завершено отложенных перемещений: %s", len(pending) - len(failed))
+        return failed
+    
+    def _remove_source(self, source_path: str, target_path: str) -> None:
+        """
+        Удаляет исходный файл после копирования.
+        
+        Если исходный файл уже удален, копия остается единственной и
+        перемещение считается завершенным. При другой ошибке копия удаляется,
+        чтобы файл не оказался в обоих деревьях.
+        
+        Args:
+            source_path: Путь к исходному файлу
+            target_path: Путь к копии в новой структуре
+            
+        Raises:
+            OSError: Если исходный файл не удалось удалить
+        """
+        try:
+            os.unlink(source_path)
+        except OSError as e:
+            # Встроенный FileNotFoundError здесь перекрыт классом модуля
+            if e.errno == errno.ENOENT:
+                return
+            self._discard_copy(target_path)
+            raise
+    
+    def _discard_copy(self, target_path: str) -> None:
+        """
+        Удаляет копию файла незавершенного перемещения.
+        
+        Args:
+            target_path: Путь к копии в новой структуре
+        """
+        try:
+            os.unlink(target_path)
+        except OSError as e:
+            self.logger.log_warning(f"Не удалось удалить копию {target_path}: {e}")
+    
+    def _list_files(self, directory: Path) -> List[Path]:
+        """
+        Получает список файлов каталога через os.scandir.
+        
+        Тип записи берется из d_type, поэтому stat на каждый файл не нужен.
+        
+        Args:
+            directory: Каталог для просмотра
+            
+        Returns:
+            List[Path]: Список путей к файлам
+        """
+        with os.scandir(directory) as entries:
+            return [Path(entry.path) for entry in entries if entry.is_file()]
+    
+    def _scan_files(self, directory: Path) -> Tuple[int, int]:
+        """
+        Считает количество и суммарный размер файлов каталога за один проход.
+        
+        Args:
+            directory: Каталог для просмотра
+            
+        Returns:
+            Tuple[int, int]: (количество файлов, суммарный размер в байтах)
+        """
+        count = 0
+        size = 0
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    count += 1
+                    size += entry.stat().st_size
+        return count, size
+    
+    def _walk_sizes(self, root: Path) -> Tuple[int, int, int]:
+        """
+        Обходит дерево каталогов по датам за один проход os.scandir.
+        
+        Учитываются только файлы в подкаталогах: в корне могут лежать
+        не перемещенные файлы, если старый и новый пути совпадают.
+        Каталоги по датам просматриваются в нескольких потоках: stat
+        отпускает GIL, и на сетевых ФС задержки запросов перекрываются.
+        
+        Args:
+            root: Корень новой структуры каталогов
+            
+        Returns:
+            Tuple[int, int, int]: (количество каталогов по датам, количество файлов,
+                суммарный размер в байтах)
+        """
+        with os.scandir(root) as entries:
+            date_dirs = [entry.path for entry in entries if entry.is_dir(follow_symlinks=False)]
+            
+        if len(date_dirs) > 1:
+            max_workers = min(32, (os.cpu_count() or 1) * 4, len(date_dirs))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(self._scan_tree, date_dirs))
+        else:
+            results = [self._scan_tree(path) for path in date_dirs]
+            
+        return (len(date_dirs),
+                sum(count for count, _ in results),
+                sum(size for _, size in results))
+    
+    @staticmethod
+    def _scan_tree(directory: str) -> Tuple[int, int]:
+        """
+        Считает количество и суммарный размер файлов каталога и его подкаталогов.
+        
+        Args:
+            directory: Каталог для просмотра
+            
+        Returns:
+            Tuple[int, int]: (количество файлов, суммарный размер в байтах)
+        """
+        stack = [directory]
+        count = 0
+        size = 0
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        count += 1
+                        size += entry.stat(follow_symlinks=False).st_size
+        return count, size
+    
+    def get_moved_file_sizes(self, files: Iterable[Tuple[str, datetime]]) -> Dict[str, Optional[int]]:
+        """
+        Получает размеры перемещенных файлов, читая каждый каталог по дате один раз.
+        
+        Вместо stat на каждый файл каталоги просматриваются через os.scandir,
+        размер берется из DirEntry только для запрошенных файлов. Каталоги по
+        датам просматриваются в нескольких потоках, как в _walk_sizes.
+        
+        Args:
+            files: Пары (idfl, dt) перемещенных файлов
+            
+        Returns:
+            Dict[str, Optional[int]]: Размер каждого файла или None, если файла нет
+        """
+        by_dir: Dict[Path, List[str]] = {}
+        for idfl, dt in files:
+            by_dir.setdefault(self._get_date_directory(dt), []).append(idfl)
+            
+        if len(by_dir) > 1:
+            max_workers = min(32, (os.cpu_count() or 1) * 4, len(by_dir))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                present_by_dir = list(executor.map(self._scan_file_sizes, by_dir.keys(), by_dir.values()))
+        else:
+            present_by_dir = [self._scan_file_sizes(date_dir, idfls) for date_dir, idfls in by_dir.items()]
+            
+        sizes: Dict[str, Optional[int]] = {}
+        for idfls, present in zip(by_dir.values(), present_by_dir):
+            for idfl in idfls:
+                sizes[idfl] = present.get(idfl)
+                
+        return sizes
+    
+    def _scan_file_sizes(self, date_dir: Path, idfls: List[str]) -> Dict[str, int]:
+        """
+        Получает размеры указанных файлов каталога за один проход os.scandir.
+        
+        Args:
+            date_dir: Каталог по дате
+            idfls: Имена файлов, размеры которых нужны
+            
+        Returns:
+            Dict[str, int]: Размер по имени для найденных файлов
+        """
+        wanted = set(idfls)
+        present: Dict[str, int] = {}
+        try:
+            with os.scandir(date_dir) as entries:
+                for entry in entries:
+                    if entry.name in wanted and entry.is_file(follow_symlinks=False):
+                        present[entry.name] = entry.stat(follow_symlinks=False).st_size
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                self.logger.log_database_error("get_moved_file_sizes", e)
+                
+        return present
+    
     def list_files_in_date_directory(self, dt: datetime) -> List[Path]:
         """
         Получает список файлов в каталоге по дате.
@@ -366,10 +1254,13 @@ class FileOps:
         """
         try:
             date_dir = self._get_date_directory(dt)
-            if not date_dir.exists():
-                return []
+            try:
+                files = self._list_files(date_dir)
+            except OSError as e:
+                if e.errno == errno.ENOENT:
+                    return []
+                raise
             
-            files = [f for f in date_dir.iterdir() if f.is_file()]
             self.logger.log_system_info(f"Файлов в каталоге {date_dir}: {len(files)}")
             return files
             
@@ -385,10 +1276,7 @@ class FileOps:
             List[Path]: Список путей к не перемещенным файлам
         """
         try:
-            if not self.base_path.exists():
-                return []
-            
-            files = [f for f in self.base_path.iterdir() if f.is_file()]
+            files = self._list_files(self.base_path)
             self.logger.log_system_info(f"Не перемещенных файлов: {len(files)}")
             return files
             
@@ -406,21 +1294,22 @@ class FileOps:
         try:
             removed_count = 0
             
-            if not self.new_base_path.exists():
-                return 0
-            
-            # Проходим по всем подкаталогам (каталоги по датам)
-            for date_dir in self.new_base_path.iterdir():
-                if date_dir.is_dir():
+            # Проходим по всем подкаталогам (каталоги по датам): тип берется из d_type
+            # без stat, а rmdir сам отказывает для непустого каталога (ENOTEMPTY)
+            with os.scandir(self.new_base_path) as entries:
+                for entry in entries:
+                    if not entry.is_dir(follow_symlinks=False):
+                        continue
                     try:
-                        # Проверяем, пуст ли каталог
-                        if not any(date_dir.iterdir()):
-                            date_dir.rmdir()
-                            removed_count += 1
-                            self.logger.log_system_info(f"Удален пустой каталог: {date_dir}")
+                        os.rmdir(entry.path)
                     except OSError:
                         # Каталог не пуст или есть ошибка доступа
-                        pass
+                        continue
+                        
+                    date_dir = Path(entry.path)
+                    self._created_dirs.discard(date_dir)
+                    removed_count += 1
+                    self.logger.log_system_info(f"Удален пустой каталог: {date_dir}")
             
             if removed_count > 0:
                 self.logger.log_system_info(f"Удалено пустых каталогов: {removed_count}")
@@ -449,27 +1338,16 @@ class FileOps:
                 'moved_files_size': 0
             }
             
-            # Статистика не перемещенных файлов
-            if self.base_path.exists():
-                unmoved_files = self.list_unmoved_files()
-                stats['unmoved_files_count'] = len(unmoved_files)
-                stats['unmoved_files_size'] = sum(f.stat().st_size for f in unmoved_files)
+            # Статистика не перемещенных файлов (каталоги созданы в __init__)
+            unmoved_count, unmoved_size = self._scan_files(self.base_path)
+            stats['unmoved_files_count'] = unmoved_count
+            stats['unmoved_files_size'] = unmoved_size
             
-            # Статистика перемещенных файлов
-            if self.new_base_path.exists():
-                date_dirs = [d for d in self.new_base_path.iterdir() if d.is_dir()]
-                stats['date_directories_count'] = len(date_dirs)
-                
-                total_moved_files = 0
-                total_moved_size = 0
-                
-                for date_dir in date_dirs:
-                    files = [f for f in date_dir.iterdir() if f.is_file()]
-                    total_moved_files += len(files)
-                    total_moved_size += sum(f.stat().st_size for f in files)
-                
-                stats['moved_files_count'] = total_moved_files
-                stats['moved_files_size'] = total_moved_size
+            # Статистика перемещенных файлов - один обход дерева
+            dirs_count, moved_count, moved_size = self._walk_sizes(self.new_base_path)
+            stats['date_directories_count'] = dirs_count
+            stats['moved_files_count'] = moved_count
+            stats['moved_files_size'] = moved_size
             
             self.logger.log_system_info(f"Статистика хранилища: {stats}")
             return stats
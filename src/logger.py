@@ -5,8 +5,11 @@
 цветным выводом в консоль и различными уровнями детализации.
 """
 
+import atexit
 import logging
 import logging.handlers
+import os
+import queue
 import sys
 from pathlib import Path
 from typing import Optional
@@ -18,7 +21,56 @@ except ImportError:
     from config_loader import LoggingConfig
 
 
-class ColoredFormatter(logging.Formatter):
+# Фоновый поток, который пишет записи логгера file_migrator в файл и консоль
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _stop_listener() -> None:
+    """Дописывает накопленные записи и останавливает фоновый поток логирования."""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+# Записи, оставшиеся в очереди, должны попасть в лог и при обычном завершении
+atexit.register(_stop_listener)
+
+
+class CachedTimeFormatter(logging.Formatter):
+    """
+    Форматтер, который строит asctime один раз в секунду.
+    
+    При datefmt с точностью до секунды все записи одной секунды получают
+    одинаковое время, поэтому localtime + strftime повторять не нужно.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        """Инициализация форматтера (аргументы как у logging.Formatter)."""
+        super().__init__(*args, **kwargs)
+        # (секунда, отформатированное время) последней записи
+        self._cached_time = (None, '')
+    
+    def formatTime(self, record, datefmt=None):
+        """Форматирует время записи, повторно используя строку текущей секунды."""
+        if not datefmt:
+            # Формат по умолчанию содержит миллисекунды
+            return super().formatTime(record, datefmt)
+            
+        second = int(record.created)
+        cached_second, cached_text = self._cached_time
+        if second == cached_second:
+            return cached_text
+            
+        text = super().formatTime(record, datefmt)
+        self._cached_time = (second, text)
+        return text
+
+
+class ColoredFormatter(CachedTimeFormatter):
     """Форматтер с цветным выводом для консоли."""
     
     # Цветовые коды ANSI
@@ -31,15 +83,108 @@ class ColoredFormatter(logging.Formatter):
         'RESET': '\033[0m'        # Reset
     }
     
+    # Окрашенные имена уровней, собранные один раз (\033[0m - RESET; из
+    # генератора в теле класса сам словарь COLORS по ключу недоступен)
+    COLORED_LEVELS = {
+        name: f"{color}{name}\033[0m"
+        for name, color in COLORS.items() if name != 'RESET'
+    }
+    
     def format(self, record):
         """Форматирует запись лога с цветом."""
         # Добавляем цвет к уровню логирования
-        if record.levelname in self.COLORS:
-            record.levelname = f"{self.COLORS[record.levelname]}{record.levelname}{self.COLORS['RESET']}"
+        record.levelname = self.COLORED_LEVELS.get(record.levelname, record.levelname)
         
         return super().format(record)
 
 
+class AppendRotatingFileHandler(logging.Handler):
+    """
+    Обработчик с ротацией, пишущий в постоянно открытый дескриптор файла.
+    
+    Каждая запись уходит одним os.write в файл, открытый с O_APPEND, без
+    буферизации и flush. Размер файла ведется счетчиком записанных байт,
+    поэтому проверка ротации не требует stat на каждую запись. Ротация
+    совпадает с logging.handlers.RotatingFileHandler: log -> log.1 -> ... ->
+    log.N; при max_bytes = 0 или backup_count = 0 файл не ротируется.
+    """
+    
+    def __init__(self, filename, max_bytes: int = 0, backup_count: int = 0):
+        """
+        Инициализация обработчика.
+        
+        Args:
+            filename: Путь к файлу лога
+            max_bytes: Размер файла, после которого выполняется ротация
+            backup_count: Количество сохраняемых старых файлов
+        """
+        super().__init__()
+        self.baseFilename = os.path.abspath(filename)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.fd: Optional[int] = None
+        self.bytes_written = 0
+        self._open()
+    
+    def _open(self) -> None:
+        """Открывает файл лога на дозапись и запоминает его текущий размер."""
+        self.fd = os.open(self.baseFilename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self.bytes_written = os.fstat(self.fd).st_size
+    
+    def emit(self, record):
+        """Записывает запись лога в файл, при необходимости выполняя ротацию."""
+        try:
+            if self.fd is None:
+                # Предыдущая ротация не смогла открыть файл заново
+                self._open()
+                
+            data = (self.format(record) + '\n').encode('utf-8')
+            if (self.max_bytes > 0 and self.backup_count > 0 and self.bytes_written > 0
+                    and self.bytes_written + len(data) > self.max_bytes):
+                try:
+                    self.doRollover()
+                except OSError:
+                    # Ротация не удалась: сообщаем об ошибке, но запись не теряем,
+                    # если файл удалось открыть заново
+                    self.handleError(record)
+                    if self.fd is None:
+                        return
+                        
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self.fd, view):]
+            self.bytes_written += len(data)
+        except Exception:
+            self.handleError(record)
+    
+    def doRollover(self) -> None:
+        """Сдвигает старые файлы лога и начинает новый файл."""
+        os.close(self.fd)
+        self.fd = None
+        
+        try:
+            for i in range(self.backup_count - 1, 0, -1):
+                source = f"{self.baseFilename}.{i}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.baseFilename}.{i + 1}")
+            if os.path.exists(self.baseFilename):
+                os.replace(self.baseFilename, f"{self.baseFilename}.1")
+        finally:
+            # Даже если сдвиг файлов не удался, запись продолжается в текущий файл
+            self._open()
+    
+    def close(self):
+        """Закрывает файл лога."""
+        self.acquire()
+        try:
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+        finally:
+            self.release()
+        super().close()
+
+
 class FileMigratorLogger:
     """Класс для управления логированием приложения File Migrator."""
     
@@ -52,19 +197,29 @@ class FileMigratorLogger:
         """
         self.config = config
         self.logger: Optional[logging.Logger] = None
+        self._level = getattr(logging, config.level.upper())
         self._setup_logger()
     
     def _setup_logger(self) -> None:
-        """Настраивает логгер с файловым и консольным выводом."""
+        """
+        Настраивает логгер с файловым и консольным выводом.
+        
+        Вызывающий поток только кладет запись в очередь; форматирование,
+        запись в файл с ротацией и вывод в консоль выполняет фоновый
+        QueueListener.
+        """
+        global _listener
+        
         # Создаем логгер
         self.logger = logging.getLogger('file_migrator')
-        self.logger.setLevel(getattr(logging, self.config.level.upper()))
+        self.logger.setLevel(self._level)
         
-        # Очищаем существующие обработчики
+        # Очищаем существующие обработчики и останавливаем прежний фоновый поток
         self.logger.handlers.clear()
+        _stop_listener()
         
         # Настраиваем форматтер
-        formatter = logging.Formatter(
+        formatter = CachedTimeFormatter(
             fmt='%(asctime)s [%(levelname)s] %(name)s: %(message)s',
             datefmt='%Y-%m-%d %H:%M:%S'
         )
@@ -80,27 +235,34 @@ class FileMigratorLogger:
         log_file_path.parent.mkdir(parents=True, exist_ok=True)
         
         # Настраиваем файловый обработчик с ротацией
-        file_handler = logging.handlers.RotatingFileHandler(
+        file_handler = AppendRotatingFileHandler(
             filename=log_file_path,
-            maxBytes=self.config.max_log_size * 1024 * 1024,  # Конвертируем MB в байты
-            backupCount=self.config.backup_count,
-            encoding='utf-8'
+            max_bytes=self.config.max_log_size * 1024 * 1024,  # Конвертируем MB в байты
+            backup_count=self.config.backup_count
         )
         file_handler.setFormatter(formatter)
-        file_handler.setLevel(getattr(logging, self.config.level.upper()))
+        file_handler.setLevel(self._level)
         
         # Настраиваем консольный обработчик
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setFormatter(colored_formatter)
-        console_handler.setLevel(getattr(logging, self.config.level.upper()))
+        console_handler.setLevel(self._level)
         
-        # Добавляем обработчики к логгеру
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+        # Логгер пишет в очередь, обработчики работают в фоновом потоке
+        log_queue = queue.SimpleQueue()
+        self.logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        _listener = logging.handlers.QueueListener(
+            log_queue, file_handler, console_handler, respect_handler_level=True
+        )
+        _listener.start()
         
         # Предотвращаем дублирование сообщений
         self.logger.propagate = False
     
+    def stop(self) -> None:
+        """Дописывает накопленные записи и останавливает фоновый поток логирования."""
+        _stop_listener()
+    
     def get_logger(self) -> logging.Logger:
         """
         Возвращает настроенный логгер.
@@ -172,6 +334,8 @@ class FileMigratorLogger:
             source_path: Исходный путь
             target_path: Целевой путь
         """
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
         self.logger.info(f"📁 Файл {idfl} перемещен: {source_path} → {target_path}")
     
     def log_file_error(self, idfl: str, error: Exception) -> None:
@@ -241,6 +405,8 @@ class FileMigratorLogger:
             file_path: Путь к файлу
             success: Успешность операции
         """
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
         status = "✅" if success else "❌"
         self.logger.info(f"{status} {operation.upper()}: {file_path}")
     
@@ -251,8 +417,26 @@ class FileMigratorLogger:
         Args:
             info: Информационное сообщение
         """
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
         self.logger.info(f"ℹ️ {info}")
     
+    def log_debug(self, message: str, *args) -> None:
+        """
+        Логирует отладочное сообщение (подробности по отдельным файлам).
+        
+        Аргументы подставляются в message %-форматированием только если
+        уровень DEBUG включен, поэтому на горячих путях сообщение лучше
+        передавать шаблоном, а не f-строкой.
+        
+        Args:
+            message: Отладочное сообщение (шаблон для args)
+            *args: Аргументы шаблона
+        """
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        self.logger.debug("🔍 " + message, *args)
+    
     def log_warning(self, message: str) -> None:
         """
         Логирует предупреждение.
@@ -12,18 +12,8 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional
 
-try:
-    from .config_loader import load_config
-    from .logger import FileMigratorLogger, setup_logger
-    from .migrator import Migrator, create_migrator, MigrationError
-    from .db import Database
-    from .file_ops import FileOps
-except ImportError:
-    from config_loader import load_config
-    from logger import FileMigratorLogger, setup_logger
-    from migrator import Migrator, create_migrator, MigrationError
-    from db import Database
-    from file_ops import FileOps
+# Модули приложения (драйвер БД, операции с файлами) импортируются в методах,
+# которым они нужны: --help и ошибки разбора аргументов их не загружают
 
 
 class FileMigratorCLI:
@@ -45,6 +35,15 @@ class FileMigratorCLI:
             bool: True если инициализация успешна
         """
         try:
+            try:
+                from .config_loader import load_config
+                from .logger import FileMigratorLogger
+                from .migrator import create_migrator
+            except ImportError:
+                from config_loader import load_config
+                from logger import FileMigratorLogger
+                from migrator import create_migrator
+                
             # Загружаем конфигурацию
             self.config = load_config(config_path)
             
@@ -71,13 +70,18 @@ class FileMigratorCLI:
         Returns:
             int: Код возврата (0 - успех, 1 - ошибка)
         """
+        try:
+            from .migrator import MigrationError
+        except ImportError:
+            from migrator import MigrationError
+            
         try:
             if not self.migrator.initialize():
                 print("❌ Не удалось инициализировать мигратор")
                 return 1
             
-            # Получаем начальную статистику
-            initial_status = self.migrator.get_migration_status()
+            # Получаем начальную статистику, уже собранную при инициализации
+            initial_status = self.migrator.get_migration_status(use_initial=True)
             total_files = initial_status['database']['unmoved_files']
             
             if total_files == 0:
@@ -102,11 +106,14 @@ class FileMigratorCLI:
             print(f"   • Продолжительность: {stats.get_duration():.2f} сек")
             
             if stats.failed_files > 0:
-                print(f"\n⚠️ Обнаружено {stats.failed_files} ошибок:")
-                for error in stats.errors[:10]:  # Показываем первые 10 ошибок
-                    print(f"   • {error['file_id']}: {error['error']}")
+                # Отчет собирается целиком и выводится одной записью в stdout
+                lines = [f"\n⚠️ Обнаружено {stats.failed_files} ошибок:"]
+                lines.extend(  # Показываем первые 10 ошибок
+                    f"   • {error['file_id']}: {error['error']}" for error in stats.errors[:10]
+                )
                 if len(stats.errors) > 10:
-                    print(f"   ... и еще {len(stats.errors) - 10} ошибок")
+                    lines.append(f"   ... и еще {len(stats.errors) - 10} ошибок")
+                print("\n".join(lines))
             
             return 0 if stats.failed_files == 0 else 1
             
@@ -219,7 +226,7 @@ class FileMigratorCLI:
                 print("❌ Не удалось инициализировать мигратор")
                 return 1
             
-            status = self.migrator.get_migration_status()
+            status = self.migrator.get_migration_status(use_initial=True)
             
             print("📊 Статус миграции файлов")
             print("=" * 50)
@@ -292,9 +299,9 @@ class FileMigratorCLI:
             print(f"   • Ошибок: {verification_result['errors']}")
             
             if verification_result['errors'] > 0:
-                print(f"\n⚠️ Обнаружены проблемы:")
-                for detail in verification_result['details']:
-                    print(f"   • {detail}")
+                lines = ["\n⚠️ Обнаружены проблемы:"]
+                lines.extend(f"   • {detail}" for detail in verification_result['details'])
+                print("\n".join(lines))
                 return 1
             else:
                 print("✅ Все проверенные файлы корректны!")
@@ -353,6 +360,11 @@ class FileMigratorCLI:
             int: Код возврата (0 - успех, 1 - ошибка)
         """
         try:
+            try:
+                from .db import Database
+            except ImportError:
+                from db import Database
+                
             # Создаем подключение к БД
             db = Database(self.config.database, self.logger)
             
@@ -398,27 +410,36 @@ class FileMigratorCLI:
             limit = args.limit or 20
             
             if args.type == 'unmoved':
-                print(f"📁 Список не перемещенных файлов (первые {limit}):")
                 files = self.migrator.file_ops.list_unmoved_files()
-                for i, file_path in enumerate(files[:limit]):
-                    size = file_path.stat().st_size
-                    print(f"   {i+1:2d}. {file_path.name} ({size:,} байт)")
                 
+                # Список собирается целиком и выводится одной записью в stdout
+                lines = [f"📁 Список не перемещенных файлов (первые {limit}):"]
+                lines.extend(
+                    f"   {i+1:2d}. {file_path.name} ({file_path.stat().st_size:,} байт)"
+                    for i, file_path in enumerate(files[:limit])
+                )
                 if len(files) > limit:
-                    print(f"   ... и еще {len(files) - limit} файлов")
+                    lines.append(f"   ... и еще {len(files) - limit} файлов")
+                print("\n".join(lines))
                     
             elif args.type == 'moved':
-                print(f"📁 Список перемещенных файлов (первые {limit}):")
+                try:
+                    from .db import Database
+                except ImportError:
+                    from db import Database
+                    
                 # Получаем файлы из БД
                 with Database(self.config.database, self.logger) as db:
-                    moved_files = db.get_files_to_move(limit * 2)  # Получаем больше для фильтрации
-                    moved_files = [f for f in moved_files if f['ismooved']]
-                    
-                    for i, file_info in enumerate(moved_files[:limit]):
-                        print(f"   {i+1:2d}. {file_info['IDFL']} - {file_info['filename']} ({file_info['dt']})")
+                    moved_files = db.get_moved_files(limit * 2)
                     
-                    if len(moved_files) > limit:
-                        print(f"   ... и еще {len(moved_files) - limit} файлов")
+                lines = [f"📁 Список перемещенных файлов (первые {limit}):"]
+                lines.extend(
+                    f"   {i+1:2d}. {file_info['IDFL']} - {file_info['filename']} ({file_info['dt']})"
+                    for i, file_info in enumerate(moved_files[:limit])
+                )
+                if len(moved_files) > limit:
+                    lines.append(f"   ... и еще {len(moved_files) - limit} файлов")
+                print("\n".join(lines))
             
             return 0
             
@@ -5,7 +5,9 @@
 миграции файлов из плоской структуры в структуру по датам (YYYYMMDD).
 """
 
+import os
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
@@ -13,13 +15,13 @@ from pathlib import Path
 try:
     from .config_loader import Config, MigratorConfig
     from .logger import FileMigratorLogger
-    from .db import Database
-    from .file_ops import FileOps
+    from .db import Database, DatabaseSession
+    from .file_ops import FileOps, INTEGRITY_HASH_ALGORITHM
 except ImportError:
     from config_loader import Config, MigratorConfig
     from logger import FileMigratorLogger
-    from db import Database
-    from file_ops import FileOps
+    from db import Database, DatabaseSession
+    from file_ops import FileOps, INTEGRITY_HASH_ALGORITHM
 
 
 class MigrationError(Exception):
@@ -91,9 +93,22 @@ class Migrator:
         """
         self.config = config
         self.logger = logger
-        self.db = Database(config.database, logger)
-        self.file_ops = FileOps(config.paths, logger)
+        self.db = Database(
+            config.database,
+            logger,
+            max_retries=config.migrator.max_retries,
+            retry_delay=config.migrator.retry_delay
+        )
+        self.file_ops = FileOps(config.paths, logger, drop_page_cache=config.migrator.drop_page_cache)
         self.stats = MigrationStats()
+        
+        # Ключ (dt, IDFL) последнего файла предыдущего батча для keyset-пагинации
+        self._last_key: Optional[Tuple[datetime, str]] = None
+        
+        # Статистика БД и ФС, собранная при инициализации: полный агрегат
+        # по таблице и обход хранилища не повторяются сразу после initialize()
+        self._initialized = False
+        self._initial_stats: Optional[Tuple[Dict, Dict]] = None
     
     def initialize(self) -> bool:
         """
@@ -122,18 +137,22 @@ class Migrator:
             self.logger.log_system_info(f"  • Не перемещенных: {self.stats.total_files}")
             self.logger.log_system_info(f"  • Файлов в ФС: {fs_stats.get('unmoved_files_count', 0)}")
             
+            self._initial_stats = (db_stats, fs_stats)
+            self._initialized = True
             return True
             
         except Exception as e:
             self.logger.log_critical_error("Ошибка инициализации мигратора", e)
             return False
     
-    def migrate_batch(self, batch_size: Optional[int] = None) -> Tuple[int, int, int]:
+    def migrate_batch(self, batch_size: Optional[int] = None,
+                      files: Optional[List[Tuple[str, datetime]]] = None) -> Tuple[int, int, int]:
         """
         Мигрирует один батч файлов.
         
         Args:
             batch_size: Размер батча (по умолчанию из конфигурации)
+            files: Файлы батча, выбранные заранее (если не указаны, выбираются из БД)
             
         Returns:
             Tuple[int, int, int]: (обработано, успешно, ошибок)
@@ -147,31 +166,18 @@ class Migrator:
         self.logger.log_batch_start(batch_number, batch_size)
         
         try:
-            # Получаем файлы для миграции
-            files = self.db.get_files_to_move(batch_size)
-            
-            if not files:
-                self.logger.log_system_info("Нет файлов для миграции")
-                return 0, 0, 0
-            
-            processed = 0
-            successful = 0
-            failed = 0
-            
-            for file_info in files:
-                try:
-                    result = self._migrate_single_file(file_info)
-                    if result:
-                        successful += 1
-                    else:
-                        failed += 1
-                    processed += 1
+            # Одно соединение из пула на весь батч
+            with self.db.session() as session:
+                # Получаем файлы для миграции, продолжая с места предыдущего батча
+                if files is None:
+                    files = self._fetch_files(batch_size, session)
+                
+                if not files:
+                    self.logger.log_system_info("Нет файлов для миграции")
+                    return 0, 0, 0
+                    
+                processed, successful, failed = self._migrate_files(files, session)
                     
-                except Exception as e:
-                    failed += 1
-                    self.stats.add_error(file_info['IDFL'], e)
-                    self.logger.log_file_error(file_info['IDFL'], e)
-            
             self.stats.processed_files += processed
             self.stats.successful_files += successful
             self.stats.failed_files += failed
@@ -184,49 +190,173 @@ class Migrator:
             self.logger.log_database_error("migrate_batch", e)
             raise MigrationError(f"Ошибка миграции батча: {e}")
     
-    def _migrate_single_file(self, file_info: Dict) -> bool:
+    def _fetch_files(self, batch_size: int,
+                     session: Optional[DatabaseSession] = None) -> List[Tuple[str, datetime]]:
         """
-        Мигрирует один файл.
+        Выбирает из БД следующий батч файлов после последнего выбранного.
         
         Args:
-            file_info: Информация о файле из БД
+            batch_size: Размер батча
+            session: Сессия БД (опционально)
             
         Returns:
-            bool: True если миграция успешна
+            List[Tuple[str, datetime]]: Список кортежей (IDFL, dt)
         """
-        idfl = file_info['IDFL']
-        dt = file_info['dt']
-        filename = file_info['filename']
+        if self._last_key is None:
+            files = self.db.get_files_to_move(batch_size, session=session)
+        else:
+            last_dt, last_idfl = self._last_key
+            files = self.db.get_files_to_move_after(
+                last_dt, last_idfl, batch_size, session=session
+            )
+            
+        if files:
+            last_idfl, last_dt = files[-1]
+            self._last_key = (last_dt, last_idfl)
+            
+        return files
+    
+    def _migrate_files(self, files: List[Tuple[str, datetime]],
+                       session: Optional[DatabaseSession] = None) -> Tuple[int, int, int]:
+        """
+        Мигрирует набор файлов в пуле потоков и отмечает перемещенные в БД.
         
-        try:
-            # Проверяем существование файла в старой структуре
-            if not self.file_ops.file_exists(idfl, ismooved=False, dt=dt):
-                self.logger.log_file_error(idfl, FileNotFoundError("Файл не найден в старой структуре"))
-                return False
+        Файловые операции ввода-вывода отпускают GIL, поэтому файлы
+        перемещаются параллельно; отметка в БД выполняется одной
+        транзакцией из вызывающего потока.
+        
+        Args:
+            files: Список кортежей (IDFL, dt)
+            session: Сессия БД (опционально)
             
-            # Получаем хеш файла для проверки целостности
-            old_hash = self.file_ops.get_file_hash(idfl, ismooved=False, dt=dt, algorithm="md5")
+        Returns:
+            Tuple[int, int, int]: (обработано, успешно, ошибок)
+        """
+        processed = 0
+        successful = 0
+        failed = 0
+        pending_marks: List[Tuple[datetime, str]] = []
+        
+        # Одна отметка времени перемещения на весь набор вместо datetime.now() на файл
+        moved_at = datetime.now()
+        
+        # Каталоги по датам создаются до запуска потоков, а не конкурентно из каждого
+        self.file_ops.ensure_date_directories(dt for _, dt in files)
+        
+        with ThreadPoolExecutor(max_workers=self.config.migrator.max_workers) as executor:
+            futures = {
+                executor.submit(self._migrate_single_file, idfl, dt, pending_marks, moved_at): idfl
+                for idfl, dt in files
+            }
+            
+            # Ошибки файлов _migrate_single_file записывает сам и возвращает False
+            for future in as_completed(futures):
+                processed += 1
+                if future.result():
+                    successful += 1
+                else:
+                    failed += 1
+                    
+        # Копии между файловыми системами сбрасываются на диск одним вызовом
+        # на весь набор, и только затем удаляются исходные файлы; файлы,
+        # перемещение которых отменено, не отмечаются в БД
+        failed_moves = self.file_ops.finish_deferred_moves()
+        if failed_moves:
+            for idfl, error in failed_moves.items():
+                self.stats.add_error(idfl, error)
+            pending_marks = [mark for mark in pending_marks if mark[1] not in failed_moves]
+            successful -= len(failed_moves)
+            failed += len(failed_moves)
+        
+        # Отмечаем перемещенные файлы одним пакетным UPDATE
+        if pending_marks:
+            unmarked = self._flush_moved_marks(pending_marks, session)
+            successful -= unmarked
+            failed += unmarked
             
-            # Перемещаем файл
-            old_path = self.file_ops.base_path / idfl
-            new_path = self.file_ops.move_file(idfl, dt)
+        return processed, successful, failed
+    
+    def _flush_moved_marks(self, pending_marks: List[Tuple[datetime, str]],
+                           session: Optional[DatabaseSession] = None) -> int:
+        """
+        Отмечает в БД перемещенные файлы батча одной транзакцией.
+        
+        Если пакетный UPDATE не прошел, файлы отмечаются по одному,
+        чтобы неуспешными считались только те, которые отметить не удалось.
+        Поштучная отметка идет через соединения из пула (с повтором временных
+        ошибок): соединение сессии могло оборваться вместе с пакетным UPDATE.
+        
+        Args:
+            pending_marks: Накопленные кортежи (dtmoove, idfl)
+            session: Сессия БД батча (опционально)
             
-            # Проверяем целостность после перемещения
-            new_hash = self.file_ops.get_file_hash(idfl, ismooved=True, dt=dt, algorithm="md5")
+        Returns:
+            int: Количество файлов, которые не удалось отметить
+        """
+        try:
+            self.db.mark_files_moved(pending_marks, session=session)
+            return 0
             
-            if old_hash and new_hash and old_hash != new_hash:
-                self.logger.log_file_error(idfl, ValueError("Ошибка целостности файла после перемещения"))
-                return False
+        except Exception as e:
+            self.logger.log_database_error("mark_files_moved", e)
+            
+        failed = 0
+        for dtmoove, idfl in pending_marks:
+            try:
+                marked = self.db.mark_file_moved(idfl, dtmoove)
+            except Exception as e:
+                marked = False
+                self.stats.add_error(idfl, e)
+            else:
+                if not marked:
+                    self.stats.add_error(idfl, Exception("Не удалось отметить файл в БД"))
+            if not marked:
+                failed += 1
+        return failed
+    
+    def _migrate_single_file(self, idfl: str, dt: datetime,
+                             pending_marks: Optional[List[Tuple[datetime, str]]] = None,
+                             moved_at: Optional[datetime] = None) -> bool:
+        """
+        Мигрирует один файл.
+        
+        Args:
+            idfl: Идентификатор файла
+            dt: Дата файла
+            pending_marks: Список для отложенной пакетной отметки в БД
+                (если не указан, файл отмечается сразу)
+            moved_at: Время перемещения для отметки в БД (по умолчанию текущее)
+            
+        Returns:
+            bool: True если миграция успешна
+        """
+        try:
+            # Перемещаем файл: на одной ФС только rename (данные не меняются
+            # и не читаются), между ФС хеш считается по записанным байтам и
+            # сверяется с копией после сброса на диск.
+            # Отсутствие исходного файла приходит как FileNotFoundError
+            old_path = os.path.join(self.file_ops.base_path, idfl)
+            new_path, _ = self.file_ops.move_file_with_hash(
+                idfl, dt, INTEGRITY_HASH_ALGORITHM,
+                defer_sync=pending_marks is not None, hash_renamed=False
+            )
             
             # Отмечаем файл как перемещенный в БД
-            if not self.db.mark_file_moved(idfl, datetime.now()):
-                self.logger.log_database_error("mark_file_moved", Exception(f"Не удалось отметить файл {idfl} как перемещенный"))
+            if moved_at is None:
+                moved_at = datetime.now()
+            if pending_marks is not None:
+                pending_marks.append((moved_at, idfl))
+            elif not self.db.mark_file_moved(idfl, moved_at):
+                error = Exception(f"Не удалось отметить файл {idfl} как перемещенный")
+                self.stats.add_error(idfl, error)
+                self.logger.log_database_error("mark_file_moved", error)
                 return False
             
             self.logger.log_file_moved(idfl, old_path, new_path)
             return True
             
         except Exception as e:
+            self.stats.add_error(idfl, e)
             self.logger.log_file_error(idfl, e)
             return False
     
@@ -241,45 +371,65 @@ class Migrator:
             MigrationStats: Статистика миграции
         """
         self.stats.start_time = datetime.now()
+        self._last_key = None
         
         try:
-            # Инициализируем мигратор
-            if not self.initialize():
+            # Инициализируем мигратор, если это не сделано заранее
+            if not self._initialized and not self.initialize():
                 raise MigrationError("Не удалось инициализировать мигратор")
             
+            last_logged_progress = -1
+            
             self.logger.log_migration_start(
                 total_files=self.stats.total_files,
                 batch_size=self.config.migrator.batch_size
             )
             
-            # Мигрируем файлы батчами
-            while True:
-                # Проверяем лимит файлов
-                if max_files and self.stats.processed_files >= max_files:
-                    self.logger.log_system_info(f"Достигнут лимит файлов: {max_files}")
-                    break
-                
-                # Получаем размер батча с учетом лимита
-                batch_size = self.config.migrator.batch_size
-                if max_files:
-                    remaining = max_files - self.stats.processed_files
-                    batch_size = min(batch_size, remaining)
-                
-                # Мигрируем батч
-                processed, successful, failed = self.migrate_batch(batch_size)
+            # Мигрируем файлы батчами; следующий батч выбирается из БД в отдельном
+            # потоке, пока перемещаются файлы текущего (keyset-запросу нужен только
+            # ключ последнего файла, а не результат перемещения)
+            with ThreadPoolExecutor(max_workers=1) as prefetcher:
+                next_files: Optional[Future] = None
                 
-                # Если нет файлов для обработки, завершаем
-                if processed == 0:
-                    self.logger.log_system_info("Все файлы обработаны")
-                    break
-                
-                # Логируем прогресс
-                progress = (self.stats.processed_files / self.stats.total_files) * 100 if self.stats.total_files > 0 else 0
-                self.logger.log_progress(self.stats.processed_files, self.stats.total_files, progress)
-                
-                # Небольшая пауза между батчами
-                if self.config.migrator.retry_delay > 0:
-                    time.sleep(self.config.migrator.retry_delay)
+                while True:
+                    # Проверяем лимит файлов
+                    if max_files and self.stats.processed_files >= max_files:
+                        self.logger.log_system_info(f"Достигнут лимит файлов: {max_files}")
+                        break
+                        
+                    # Получаем размер батча с учетом лимита
+                    batch_size = self.config.migrator.batch_size
+                    if max_files:
+                        remaining = max_files - self.stats.processed_files
+                        batch_size = min(batch_size, remaining)
+                        
+                    files = next_files.result() if next_files is not None else self._fetch_files(batch_size)
+                    
+                    # Запрашиваем следующий батч с учетом лимита
+                    next_batch_size = self.config.migrator.batch_size
+                    if max_files:
+                        next_batch_size = min(next_batch_size, max_files - self.stats.processed_files - len(files))
+                    next_files = None
+                    if files and next_batch_size > 0:
+                        next_files = prefetcher.submit(self._fetch_files, next_batch_size)
+                        
+                    # Мигрируем батч
+                    processed, successful, failed = self.migrate_batch(batch_size, files)
+                    
+                    # Если нет файлов для обработки, завершаем
+                    if processed == 0:
+                        self.logger.log_system_info("Все файлы обработаны")
+                        break
+                        
+                    # Логируем прогресс, только когда меняется целый процент
+                    progress = self.stats.processed_files * 100 // self.stats.total_files if self.stats.total_files > 0 else 0
+                    if progress != last_logged_progress:
+                        self.logger.log_progress(self.stats.processed_files, self.stats.total_files, progress)
+                        last_logged_progress = progress
+                        
+                    # Пауза только после батча с ошибками: успешные батчи идут подряд
+                    if failed > 0 and self.config.migrator.retry_delay > 0:
+                        time.sleep(self.config.migrator.retry_delay)
             
             self.stats.end_time = datetime.now()
             
@@ -311,38 +461,34 @@ class Migrator:
         self.stats.start_time = datetime.now()
         
         try:
-            # Инициализируем мигратор
-            if not self.initialize():
+            # Инициализируем мигратор, если это не сделано заранее
+            if not self._initialized and not self.initialize():
                 raise MigrationError("Не удалось инициализировать мигратор")
             
-            # Получаем файлы в диапазоне дат
-            files = self.db.get_files_by_date_range(start_date, end_date)
-            unmoved_files = [f for f in files if not f['ismooved']]
-            
-            self.stats.total_files = len(unmoved_files)
-            
             self.logger.log_system_info(f"Миграция файлов в диапазоне {start_date.date()} - {end_date.date()}")
-            self.logger.log_system_info(f"Найдено файлов: {len(files)}, не перемещенных: {len(unmoved_files)}")
             
-            if not unmoved_files:
+            # Не перемещенные файлы диапазона читаются батчами, а не целиком
+            batches = self.db.iter_unmoved_files_by_date_range(
+                start_date, end_date, self.config.migrator.batch_size
+            )
+            # initialize() записывает в total_files число не перемещенных файлов
+            # всей таблицы; здесь считаются только файлы диапазона
+            self.stats.total_files = 0
+            for files in batches:
+                self.stats.total_files += len(files)
+                
+                # Мигрируем файлы параллельно, как и батчи
+                processed, successful, failed = self._migrate_files(files)
+                self.stats.processed_files += processed
+                self.stats.successful_files += successful
+                self.stats.failed_files += failed
+                
+            if self.stats.total_files == 0:
                 self.logger.log_system_info("Нет файлов для миграции в указанном диапазоне")
                 self.stats.end_time = datetime.now()
                 return self.stats
             
-            # Мигрируем файлы
-            for file_info in unmoved_files:
-                try:
-                    result = self._migrate_single_file(file_info)
-                    if result:
-                        self.stats.successful_files += 1
-                    else:
-                        self.stats.failed_files += 1
-                    self.stats.processed_files += 1
-                    
-                except Exception as e:
-                    self.stats.failed_files += 1
-                    self.stats.add_error(file_info['IDFL'], e)
-                    self.logger.log_file_error(file_info['IDFL'], e)
+            self.logger.log_system_info(f"Не перемещенных файлов в диапазоне: {self.stats.total_files}")
             
             self.stats.end_time = datetime.now()
             
@@ -372,9 +518,8 @@ class Migrator:
         try:
             self.logger.log_system_info(f"Проверка миграции на выборке {sample_size} файлов")
             
-            # Получаем перемещенные файлы
-            moved_files = self.db.get_files_to_move(sample_size)
-            moved_files = [f for f in moved_files if f['ismooved']]
+            # Получаем перемещенные файлы (LIMIT в запросе уже ограничивает выборку)
+            moved_files = self.db.get_moved_files(sample_size)
             
             if not moved_files:
                 self.logger.log_system_info("Нет перемещенных файлов для проверки")
@@ -384,34 +529,33 @@ class Migrator:
             errors = 0
             details = []
             
-            for file_info in moved_files[:sample_size]:
+            # Размеры всех файлов выборки: один проход по каждому каталогу даты
+            sizes = self.file_ops.get_moved_file_sizes(
+                (file_info['IDFL'], file_info['dt']) for file_info in moved_files
+            )
+            
+            for file_info in moved_files:
                 idfl = file_info['IDFL']
-                dt = file_info['dt']
+                size = sizes.get(idfl)
                 
-                try:
-                    # Проверяем существование файла в новой структуре
-                    if not self.file_ops.file_exists(idfl, ismooved=True, dt=dt):
-                        errors += 1
-                        details.append(f"Файл {idfl} не найден в новой структуре")
-                        continue
-                    
-                    # Проверяем размер файла
-                    size = self.file_ops.get_file_size(idfl, ismooved=True, dt=dt)
-                    if size is None or size == 0:
-                        errors += 1
-                        details.append(f"Файл {idfl} имеет нулевой размер")
-                        continue
-                    
-                    verified += 1
+                # Проверяем существование файла в новой структуре
+                if size is None:
+                    errors += 1
+                    details.append(f"Файл {idfl} не найден в новой структуре")
+                    continue
                     
-                except Exception as e:
+                # Проверяем размер файла
+                if size == 0:
                     errors += 1
-                    details.append(f"Ошибка проверки файла {idfl}: {e}")
+                    details.append(f"Файл {idfl} имеет нулевой размер")
+                    continue
+                    
+                verified += 1
             
             result = {
                 'verified': verified,
                 'errors': errors,
-                'total_checked': len(moved_files[:sample_size]),
+                'total_checked': len(moved_files),
                 'details': details
             }
             
@@ -423,19 +567,26 @@ class Migrator:
             self.logger.log_database_error("verify_migration", e)
             raise MigrationError(f"Ошибка проверки миграции: {e}")
     
-    def get_migration_status(self) -> Dict:
+    def get_migration_status(self, use_initial: bool = False) -> Dict:
         """
         Получает текущий статус миграции.
         
+        Args:
+            use_initial: Взять статистику БД и ФС, собранную в initialize(),
+                вместо повторного подсчета (если она есть)
+        
         Returns:
             Dict: Статус миграции
         """
         try:
-            # Статистика БД
-            db_stats = self.db.get_migration_statistics()
-            
-            # Статистика файловой системы
-            fs_stats = self.file_ops.get_storage_statistics()
+            if use_initial and self._initial_stats is not None:
+                db_stats, fs_stats = self._initial_stats
+            else:
+                # Статистика БД
+                db_stats = self.db.get_migration_statistics()
+                
+                # Статистика файловой системы
+                fs_stats = self.file_ops.get_storage_statistics()
             
             # Статистика мигратора
             migrator_stats = self.stats.to_dict()
@@ -87,6 +87,76 @@ backup_count = 5
         finally:
             os.unlink(temp_config)
     
+    def test_invalid_max_workers(self):
+        """Тест валидации некорректного количества потоков."""
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.ini', delete=False) as f:
+            f.write("""[database]
+driver = mysql
+host = localhost
+port = 3306
+database = test
+username = user
+password = pass
+
+[paths]
+file_path = test_files
+new_file_path = test_files
+
+[migrator]
+batch_size = 1000
+max_retries = 3
+retry_delay = 1
+max_workers = 0
+
+[logging]
+level = INFO
+log_file = logs/test.log
+max_log_size = 10
+backup_count = 5
+""")
+            temp_config = f.name
+            
+        try:
+            with pytest.raises(ValueError, match="Количество потоков должно быть больше 0"):
+                load_config(temp_config)
+        finally:
+            os.unlink(temp_config)
+    
+    def test_invalid_pool_size(self):
+        """Тест валидации размера пула: сессии батча нужно второе соединение."""
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.ini', delete=False) as f:
+            f.write("""[database]
+driver = mysql
+host = localhost
+port = 3306
+database = test
+username = user
+password = pass
+pool_size = 1
+
+[paths]
+file_path = test_files
+new_file_path = test_files
+
+[migrator]
+batch_size = 1000
+max_retries = 3
+retry_delay = 1
+
+[logging]
+level = INFO
+log_file = logs/test.log
+max_log_size = 10
+backup_count = 5
+""")
+            temp_config = f.name
+            
+        try:
+            with pytest.raises(ValueError, match="Размер пула соединений должен быть от 2 до 32"):
+                load_config(temp_config)
+        finally:
+            os.unlink(temp_config)
+    
     def test_invalid_log_level(self):
         """Тест валидации некорректного уровня логирования."""
         with tempfile.NamedTemporaryFile(mode='w', suffix='.ini', delete=False) as f:
@@ -159,6 +229,24 @@ backup_count = 5
         finally:
             os.unlink(temp_config)
     
+    def test_missing_required_option(self):
+        """Тест ошибки при отсутствии обязательного параметра."""
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.ini', delete=False) as f:
+            f.write("""[database]
+driver = mysql
+port = 3306
+database = test
+username = user
+password = pass
+""")
+            temp_config = f.name
+            
+        try:
+            with pytest.raises(ValueError, match="Параметр 'host' не найден в секции 'database'"):
+                load_config(temp_config)
+        finally:
+            os.unlink(temp_config)
+    
     def test_reload_config(self):
         """Тест перезагрузки конфигурации."""
         loader = ConfigLoader()
@@ -169,6 +257,52 @@ backup_count = 5
         assert config1.database.database == config2.database.database
         assert config1.migrator.batch_size == config2.migrator.batch_size
     
+    def test_load_config_cached_until_file_changes(self):
+        """Тест повторной загрузки неизмененного файла из кеша."""
+        content = """[database]
+driver = mysql
+host = localhost
+port = 3306
+database = test
+username = user
+password = pass
+
+[paths]
+file_path = test_files
+new_file_path = test_files
+
+[migrator]
+batch_size = 1000
+max_retries = 3
+retry_delay = 1
+
+[logging]
+level = INFO
+log_file = logs/test.log
+max_log_size = 10
+backup_count = 5
+"""
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.ini', delete=False) as f:
+            f.write(content)
+            temp_config = f.name
+            
+        try:
+            config1 = load_config(temp_config)
+            assert load_config(temp_config) is config1
+            
+            with open(temp_config, 'w') as f:
+                f.write(content.replace("batch_size = 1000", "batch_size = 500"))
+            os.utime(temp_config, ns=(0, os.stat(temp_config).st_mtime_ns + 1))
+            
+            config2 = load_config(temp_config)
+            assert config2 is not config1
+            assert config2.migrator.batch_size == 500
+            
+            # reload_config всегда перечитывает файл
+            assert ConfigLoader(temp_config).reload_config() is not config2
+        finally:
+            os.unlink(temp_config)
+    
     def test_get_config_without_load(self):
         """Тест получения конфигурации без предварительной загрузки."""
         loader = ConfigLoader()
@@ -4,7 +4,7 @@
 
 import pytest
 import mysql.connector
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, patch, MagicMock, PropertyMock
 from datetime import datetime
 from typing import List, Dict
 
@@ -57,6 +57,15 @@ class TestDatabase:
         assert db.connection_pool == mock_pool
         mock_logger.log_database_connected.assert_called_once_with('test_db', 'localhost', 3306)
     
+    @patch('src.db.pooling.MySQLConnectionPool')
+    def test_database_pool_size_from_config(self, mock_pool_class, mock_config, mock_logger):
+        """Тест размера пула соединений из конфигурации."""
+        mock_config.pool_size = 12
+        
+        Database(mock_config, mock_logger)
+        
+        assert mock_pool_class.call_args.kwargs['pool_size'] == 12
+    
     @patch('src.db.pooling.MySQLConnectionPool')
     def test_database_initialization_error(self, mock_pool_class, mock_config, mock_logger):
         """Тест ошибки инициализации базы данных."""
@@ -152,6 +161,147 @@ class TestDatabase:
         mock_connection.rollback.assert_called_once()
         mock_logger.log_database_error.assert_called_once()
     
+    @patch('src.db.pooling.MySQLConnectionPool')
+    def test_session_reuses_single_connection(self, mock_pool_class, mock_config, mock_logger):
+        """Тест сессии: все запросы идут через одно соединение из пула."""
+        mock_pool = Mock()
+        mock_connection = Mock()
+        mock_cursor = Mock()
+        
+        mock_cursor.fetchall.return_value = [{'total': 10}]
+        mock_connection.cursor.return_value = mock_cursor
+        mock_pool.get_connection.return_value = mock_connection
+        mock_pool_class.return_value = mock_pool
+        
+        db = Database(mock_config, mock_logger)
+        
+        with db.session() as session:
+            db.get_total_files_count(session=session)
+            db.get_unmoved_files_count(session=session)
+            db.mark_file_moved("file001", session=session)
+            mock_connection.close.assert_not_called()
+            
+        mock_pool.get_connection.assert_called_once()
+        assert mock_cursor.execute.call_count == 3
+        mock_connection.close.assert_called_once()
+    
+    @patch('src.db.pooling.MySQLConnectionPool')
+    def test_session_prepared_cursor_reused(self, mock_pool_class, mock_config, mock_logger):
+        """Тест переиспользования подготовленного выражения в сессии."""
+        mock_pool = Mock()
+        mock_connection = Mock()
+        mock_cursor = Mock()
+        mock_prepared_cursor = Mock()
+        
+        def make_cursor(**kwargs):
+            return mock_prepared_cursor if kwargs.get('prepared') else mock_cursor
+            
+        mock_connection.cursor.side_effect = make_cursor
+        mock_pool.get_connection.return_value = mock_connection
+        mock_pool_class.return_value = mock_pool
+        
+        db = Database(mock_config, mock_logger)
+        
+        with db.session() as session:
+            assert db.mark_file_moved("file001", session=session) is True
+            assert db.mark_file_moved("file002", session=session) is True
+            
+        prepared_calls = [c for c in mock_connection.cursor.call_args_list if c.kwargs.get('prepared')]
+        assert len(prepared_calls) == 1
+        assert mock_prepared_cursor.execute.call_count == 2
+        assert mock_prepared_cursor.execute.call_args[0][1][1] == "file002"
+        mock_prepared_cursor.close.assert_called_once()
+        mock_cursor.close.assert_called_once()
+    
+    @patch('src.db.pooling.MySQLConnectionPool')
+    def test_session_query_error(self, mock_pool_class, mock_config, mock_logger):
+        """Тест ошибки запроса в сессии: откат и освобождение соединения."""
+        mock_pool = Mock()
+        mock_connection = Mock()
+        mock_cursor = Mock()
+        
+        mock_cursor.execute.side_effect = mysql.connector.Error("Query failed")
+        mock_connection.cursor.return_value = mock_cursor
+        mock_pool.get_connection.return_value = mock_connection
+        mock_pool_class.return_value = mock_pool
+        
+        db = Database(mock_config, mock_logger)
+        
+        with pytest.raises(DatabaseQueryError):
+            with db.session() as session:
+                db.get_files_to_move(10, session=session)
+                
+        mock_connection.rollback.assert_called_once()
+        mock_connection.close.assert_called_once()
+    
+    @patch('src.db.pooling.MySQLConnectionPool')
+    def test_session_query_error_connection_lost(self, mock_pool_class, mock_config, mock_logger):
+        """Тест ошибки запроса в сессии на потерянном соединении: сохраняется исходная ошибка."""
+        mock_pool = Mock()
+        mock_connection = Mock()
+        mock_cursor = Mock()
+        
+        mock_cursor.execute.side_effect = mysql.connector.Error("Query failed")
+        mock_connection.cursor.return_value = mock_cursor
+        mock_connection.rollback.side_effect = mysql.connector.Error("Lost connection", errno=2013)
+        mock_pool.get_connection.return_value = mock_connection
+        mock_pool_class.return_value = mock_pool
+        
+        db = Database(mock_config, mock_logger)
+        
+        with db.session() as session:
+            with pytest.raises(DatabaseQueryError, match="Query failed"):
+                session.execute("SELECT 1", fetch=True)
+            with pytest.raises(DatabaseQueryError, match="Query failed"):
+                session.execute_prepared("UPDATE t SET a = %s", (1,))
+                
+        assert mock_connection.rollback.call_count == 2
+        mock_connection.close.assert_called_once()
+    
+    @patch('src.db.time.sleep')
+    @patch('src.db.pooling.MySQLConnectionPool')
+    def test_query_retried_on_transient_error(self, mock_pool_class, mock_sleep, mock_config, mock_logger):
+        """Тест повтора запроса при временной ошибке (deadlock) с экспоненциальной задержкой."""
+        mock_pool = Mock()
+        mock_connection = Mock()
+        mock_cursor = Mock()
+        
+        deadlock = mysql.connector.Error("Deadlock found", errno=1213)
+        mock_cursor.execute.side_effect = [deadlock, deadlock, None]
+        mock_cursor.fetchall.return_value = [{'total': 5}]
+        mock_connection.cursor.return_value = mock_cursor
+        mock_pool.get_connection.return_value = mock_connection
+        mock_pool_class.return_value = mock_pool
+        
+        db = Database(mock_config, mock_logger, max_retries=3, retry_delay=0.5)
+        
+        assert db.get_total_files_count() == 5
+        assert mock_cursor.execute.call_count == 3
+        assert [c.args[0] for c in mock_sleep.call_args_list] == [0.5, 1.0]
+        assert mock_connection.rollback.call_count == 2
+        assert mock_logger.log_warning.call_count == 2
+    
+    @patch('src.db.time.sleep')
+    @patch('src.db.pooling.MySQLConnectionPool')
+    def test_query_not_retried_on_permanent_error(self, mock_pool_class, mock_sleep, mock_config, mock_logger):
+        """Тест отсутствия повторов для невременной ошибки."""
+        mock_pool = Mock()
+        mock_connection = Mock()
+        mock_cursor = Mock()
+        
+        mock_cursor.execute.side_effect = mysql.connector.Error("Syntax error", errno=1064)
+        mock_connection.cursor.return_value = mock_cursor
+        mock_pool.get_connection.return_value = mock_connection
+        mock_pool_class.return_value = mock_pool
+        
+        db = Database(mock_config, mock_logger, max_retries=3, retry_delay=0.5)
+        
+        with pytest.raises(DatabaseQueryError):
+            db.get_total_files_count()
+            
+        mock_cursor.execute.assert_called_once()
+        mock_sleep.assert_not_called()
+    
     @patch('src.db.pooling.MySQLConnectionPool')
     def test_test_connection_success(self, mock_pool_class, mock_config, mock_logger):
         """Тест успешного тестирования подключения."""
@@ -197,8 +347,8 @@ class TestDatabase:
         mock_cursor = Mock()
         
         expected_files = [
-            {'IDFL': 'file001', 'dt': datetime(2024, 1, 15), 'filename': 'test1.txt', 'ismooved': 0},
-            {'IDFL': 'file002', 'dt': datetime(2024, 1, 16), 'filename': 'test2.txt', 'ismooved': 0}
+            ('file001', datetime(2024, 1, 15)),
+            ('file002', datetime(2024, 1, 16))
         ]
         mock_cursor.fetchall.return_value = expected_files
         mock_connection.cursor.return_value = mock_cursor
@@ -210,8 +360,90 @@ class TestDatabase:
         
         assert result == expected_files
         mock_cursor.execute.assert_called_once()
+        assert "SELECT IDFL, dt\n" in mock_cursor.execute.call_args[0][0]
+        mock_connection.cursor.assert_called_once_with(dictionary=False)
         mock_logger.log_system_info.assert_called_once_with("Получено 2 файлов для миграции")
     
+    @patch('src.db.pooling.MySQLConnectionPool')
+    def test_get_files_to_move_after(self, mock_pool_class, mock_config, mock_logger):
+        """Тест keyset-пагинации файлов для миграции."""
+        mock_pool = Mock()
+        mock_connection = Mock()
+        mock_cursor = Mock()
+        
+        expected_files = [
+            ('file003', datetime(2024, 1, 16))
+        ]
+        mock_cursor.fetchall.return_value = expected_files
+        mock_connection.cursor.return_value = mock_cursor
+        mock_pool.get_connection.return_value = mock_connection
+        mock_pool_class.return_value = mock_pool
+        
+        db = Database(mock_config, mock_logger)
+        last_dt = datetime(2024, 1, 16)
+        result = db.get_files_to_move_after(last_dt, 'file002', 10)
+        
+        assert result == expected_files
+        query, params = mock_cursor.execute.call_args[0]
+        assert "IDFL > %s" in query
+        assert params == (last_dt, last_dt, 'file002', 10)
+    
+    @patch('src.db.pooling.MySQLConnectionPool')
+    def test_get_unmoved_files_by_date_range(self, mock_pool_class, mock_config, mock_logger):
+        """Тест получения не перемещенных файлов в диапазоне дат."""
+        mock_pool = Mock()
+        mock_connection = Mock()
+        mock_cursor = Mock()
+        
+        expected_files = [
+            ('file001', datetime(2024, 1, 15))
+        ]
+        mock_cursor.fetchall.return_value = expected_files
+        mock_connection.cursor.return_value = mock_cursor
+        mock_pool.get_connection.return_value = mock_connection
+        mock_pool_class.return_value = mock_pool
+        
+        db = Database(mock_config, mock_logger)
+        start_date = datetime(2024, 1, 1)
+        end_date = datetime(2024, 1, 31)
+        result = db.get_unmoved_files_by_date_range(start_date, end_date)
+        
+        assert result == expected_files
+        mock_connection.cursor.assert_called_with(dictionary=False)
+        query, params = mock_cursor.execute.call_args[0]
+        assert "ismooved = 0" in query
+        assert params == (start_date, end_date)
+    
+    @patch('src.db.pooling.MySQLConnectionPool')
+    def test_iter_unmoved_files_by_date_range(self, mock_pool_class, mock_config, mock_logger):
+        """Тест выборки файлов диапазона дат батчами с keyset-пагинацией."""
+        mock_pool = Mock()
+        mock_connection = Mock()
+        mock_cursor = Mock()
+        
+        first_batch = [
+            ('file001', datetime(2024, 1, 15)),
+            ('file002', datetime(2024, 1, 16))
+        ]
+        second_batch = [
+            ('file003', datetime(2024, 1, 17))
+        ]
+        mock_cursor.fetchall.side_effect = [first_batch, second_batch]
+        mock_connection.cursor.return_value = mock_cursor
+        mock_pool.get_connection.return_value = mock_connection
+        mock_pool_class.return_value = mock_pool
+        
+        db = Database(mock_config, mock_logger)
+        start_date = datetime(2024, 1, 1)
+        end_date = datetime(2024, 1, 31)
+        batches = list(db.iter_unmoved_files_by_date_range(start_date, end_date, 2))
+        
+        assert batches == [first_batch, second_batch]
+        first_call, second_call = mock_cursor.execute.call_args_list
+        assert first_call[0][1] == (start_date, end_date, 2)
+        assert "IDFL > %s" in second_call[0][0]
+        assert second_call[0][1] == (datetime(2024, 1, 16), datetime(2024, 1, 16), 'file002', end_date, 2)
+    
     @patch('src.db.pooling.MySQLConnectionPool')
     def test_get_total_files_count(self, mock_pool_class, mock_config, mock_logger):
         """Тест получения общего количества файлов."""
@@ -265,7 +497,7 @@ class TestDatabase:
         assert result is True
         mock_cursor.execute.assert_called_once()
         mock_connection.commit.assert_called_once()
-        mock_logger.log_system_info.assert_called_once_with("Файл file001 отмечен как перемещенный")
+        mock_logger.log_debug.assert_called_once_with("Файл %s отмечен как перемещенный", "file001")
     
     @patch('src.db.pooling.MySQLConnectionPool')
     def test_mark_file_moved_with_datetime(self, mock_pool_class, mock_config, mock_logger):
@@ -289,6 +521,123 @@ class TestDatabase:
         assert call_args[1][0] == test_datetime
         assert call_args[1][1] == "file001"
     
+    @patch('src.db.pooling.MySQLConnectionPool')
+    def test_mark_files_moved(self, mock_pool_class, mock_config, mock_logger):
+        """Тест пакетной отметки файлов как перемещенных."""
+        mock_pool = Mock()
+        mock_connection = Mock()
+        mock_cursor = Mock()
+        
+        mock_cursor.rowcount = 2
+        mock_connection.cursor.return_value = mock_cursor
+        mock_pool.get_connection.return_value = mock_connection
+        mock_pool_class.return_value = mock_pool
+        
+        db = Database(mock_config, mock_logger)
+        test_datetime = datetime(2024, 1, 15, 10, 30)
+        rows = [(test_datetime, "file001"), (test_datetime, "file002")]
+        result = db.mark_files_moved(rows)
+        
+        assert result == 2
+        mock_pool.get_connection.assert_called_once()
+        mock_cursor.executemany.assert_called_once()
+        assert mock_cursor.executemany.call_args[0][1] == rows
+        mock_connection.commit.assert_called_once()
+        mock_connection.close.assert_called_once()
+    
+    @patch('src.db.pooling.MySQLConnectionPool')
+    def test_insert_new_files(self, mock_pool_class, mock_config, mock_logger):
+        """Тест пакетного добавления новых файлов."""
+        mock_pool = Mock()
+        mock_connection = Mock()
+        mock_cursor = Mock()
+        
+        mock_cursor.rowcount = 2
+        mock_connection.cursor.return_value = mock_cursor
+        mock_pool.get_connection.return_value = mock_connection
+        mock_pool_class.return_value = mock_pool
+        
+        db = Database(mock_config, mock_logger)
+        test_datetime = datetime(2024, 1, 15, 10, 30)
+        rows = [("file001", test_datetime, "a.txt"), ("file002", test_datetime, "b.txt")]
+        
+        assert db.insert_new_files(rows) == 2
+        query, params = mock_cursor.executemany.call_args[0]
+        assert "ON DUPLICATE KEY UPDATE" in query
+        assert params == rows
+        mock_connection.commit.assert_called_once()
+        assert db.insert_new_files([]) == 0
+    
+    @patch('src.db.pooling.MySQLConnectionPool')
+    def test_mark_files_moved_error(self, mock_pool_class, mock_config, mock_logger):
+        """Тест ошибки пакетной отметки файлов."""
+        mock_pool = Mock()
+        mock_connection = Mock()
+        mock_cursor = Mock()
+        
+        mock_cursor.executemany.side_effect = mysql.connector.Error("Update failed")
+        mock_connection.cursor.return_value = mock_cursor
+        mock_pool.get_connection.return_value = mock_connection
+        mock_pool_class.return_value = mock_pool
+        
+        db = Database(mock_config, mock_logger)
+        
+        with pytest.raises(DatabaseQueryError):
+            db.mark_files_moved([(datetime.now(), "file001")])
+            
+        mock_connection.rollback.assert_called_once()
+        mock_connection.commit.assert_not_called()
+    
+    @patch('src.db.time.sleep')
+    @patch('src.db.pooling.MySQLConnectionPool')
+    def test_mark_files_moved_connection_lost(self, mock_pool_class, mock_sleep, mock_config, mock_logger):
+        """Тест обрыва соединения: ошибки отката не подменяют исходную ошибку."""
+        mock_pool = Mock()
+        lost = mysql.connector.Error("Lost connection to MySQL server", errno=2013)
+        
+        def dead_connection():
+            connection = MagicMock()
+            connection.cursor.return_value.executemany.side_effect = lost
+            connection.rollback.side_effect = mysql.connector.Error("Not connected", errno=2006)
+            type(connection).autocommit = PropertyMock(side_effect=[None, mysql.connector.Error("Not connected", errno=2006)])
+            connection.close.side_effect = mysql.connector.Error("Not connected", errno=2006)
+            return connection
+            
+        connections = [dead_connection(), dead_connection()]
+        mock_pool.get_connection.side_effect = connections
+        mock_pool_class.return_value = mock_pool
+        
+        db = Database(mock_config, mock_logger, max_retries=1, retry_delay=0)
+        
+        with pytest.raises(DatabaseQueryError, match="Lost connection"):
+            db.mark_files_moved([(datetime.now(), "file001")])
+            
+        # Повтор идет на новом соединении из пула, оба возвращены в пул
+        assert mock_pool.get_connection.call_count == 2
+        for connection in connections:
+            connection.close.assert_called_once()
+    
+    @patch('src.db.time.sleep')
+    @patch('src.db.pooling.MySQLConnectionPool')
+    def test_mark_files_moved_in_session_not_retried(self, mock_pool_class, mock_sleep, mock_config, mock_logger):
+        """Тест отсутствия повтора на соединении сессии после обрыва."""
+        mock_pool = Mock()
+        mock_connection = Mock()
+        mock_connection.cursor.return_value.executemany.side_effect = mysql.connector.Error(
+            "Lost connection to MySQL server", errno=2013
+        )
+        mock_pool.get_connection.return_value = mock_connection
+        mock_pool_class.return_value = mock_pool
+        
+        db = Database(mock_config, mock_logger, max_retries=3, retry_delay=0)
+        
+        with db.session() as session:
+            with pytest.raises(DatabaseQueryError):
+                db.mark_files_moved([(datetime.now(), "file001")], session=session)
+                
+        assert mock_connection.cursor.return_value.executemany.call_count == 1
+        mock_sleep.assert_not_called()
+    
     @patch('src.db.pooling.MySQLConnectionPool')
     def test_insert_new_file(self, mock_pool_class, mock_config, mock_logger):
         """Тест добавления нового файла."""
@@ -307,7 +656,7 @@ class TestDatabase:
         assert result is True
         mock_cursor.execute.assert_called_once()
         mock_connection.commit.assert_called_once()
-        mock_logger.log_system_info.assert_called_once_with("Добавлен новый файл: file001 (test.txt)")
+        mock_logger.log_debug.assert_called_once_with("Добавлен новый файл: %s (%s)", "file001", "test.txt")
     
     @patch('src.db.pooling.MySQLConnectionPool')
     def test_get_file_metadata(self, mock_pool_class, mock_config, mock_logger):
@@ -333,7 +682,7 @@ class TestDatabase:
         
         assert result == expected_metadata
         mock_cursor.execute.assert_called_once()
-        mock_logger.log_system_info.assert_called_once_with("Получены метаданные для файла file001")
+        mock_logger.log_debug.assert_called_once_with("Получены метаданные для файла %s", "file001")
     
     @patch('src.db.pooling.MySQLConnectionPool')
     def test_get_file_metadata_not_found(self, mock_pool_class, mock_config, mock_logger):
@@ -405,21 +754,31 @@ class TestDatabase:
         mock_logger.log_system_info.assert_called_once_with("Получена статистика миграции")
     
     @patch('src.db.pooling.MySQLConnectionPool')
-    def test_cleanup_old_connections(self, mock_pool_class, mock_config, mock_logger):
-        """Тест очистки старых соединений."""
+    def test_close_removes_idle_connections(self, mock_pool_class, mock_config, mock_logger):
+        """Тест закрытия простаивающих соединений пула при закрытии базы данных."""
         mock_pool = Mock()
+        mock_pool_class.return_value = mock_pool
+        
+        db = Database(mock_config, mock_logger)
+        db.close()
+        
+        mock_pool._remove_connections.assert_called_once_with()
+        mock_pool.get_connection.assert_not_called()
+        assert db.connection_pool is None
+    
+    @patch('src.db.pooling.MySQLConnectionPool')
+    def test_close_without_remove_connections(self, mock_pool_class, mock_config, mock_logger):
+        """Тест закрытия, если у пула нет _remove_connections: соединения не берутся из пула."""
+        mock_pool = Mock(spec=['pool_size', 'get_connection'])
         mock_pool.pool_size = 3
-        mock_connection = Mock()
-        mock_pool.get_connection.return_value = mock_connection
         mock_pool_class.return_value = mock_pool
         
         db = Database(mock_config, mock_logger)
-        db.cleanup_old_connections()
+        db.close()
         
-        # Проверяем, что get_connection вызван 3 раза (по количеству соединений в пуле)
-        assert mock_pool.get_connection.call_count == 3
-        assert mock_connection.close.call_count == 3
-        mock_logger.log_system_info.assert_called_once_with("Очистка старых соединений выполнена")
+        mock_pool.get_connection.assert_not_called()
+        assert db.connection_pool is None
+        mock_logger.log_database_disconnected.assert_called_once()
     
     @patch('src.db.pooling.MySQLConnectionPool')
     def test_close(self, mock_pool_class, mock_config, mock_logger):
@@ -8,6 +8,7 @@ import shutil
 from pathlib import Path
 from datetime import datetime
 from unittest.mock import Mock, patch, mock_open
+import mmap
 import os
 
 from src.file_ops import FileOps, FileOperationError, FileNotFoundError, create_file_ops
@@ -67,6 +68,15 @@ class TestFileOps:
         expected_path = file_ops.new_base_path / "20240115"
         assert date_dir == expected_path
     
+    def test_get_date_directory_cached(self, file_ops):
+        """Тест переиспользования пути каталога для одной даты."""
+        first = file_ops._get_date_directory(datetime(2024, 1, 15, 10, 30))
+        second = file_ops._get_date_directory(datetime(2024, 1, 15, 23, 59))
+        other = file_ops._get_date_directory(datetime(2024, 1, 16))
+        
+        assert first is second
+        assert other == file_ops.new_base_path / "20240116"
+    
     def test_ensure_date_directory_exists(self, file_ops):
         """Тест создания каталога по дате."""
         test_date = datetime(2024, 1, 15, 10, 30)
@@ -75,6 +85,27 @@ class TestFileOps:
         assert date_dir.exists()
         assert date_dir == file_ops.new_base_path / "20240115"
     
+    def test_ensure_date_directory_cached(self, file_ops):
+        """Тест однократного создания каталога по дате за время работы."""
+        test_date = datetime(2024, 1, 15, 10, 30)
+        
+        with patch('src.file_ops.os.makedirs') as mock_makedirs:
+            first = file_ops._ensure_date_directory_exists(test_date)
+            second = file_ops._ensure_date_directory_exists(datetime(2024, 1, 15, 18, 0))
+            
+        assert first == second
+        mock_makedirs.assert_called_once_with(first, exist_ok=True)
+    
+    def test_ensure_date_directory_recreated_after_cleanup(self, file_ops):
+        """Тест повторного создания каталога после удаления пустых каталогов."""
+        test_date = datetime(2024, 1, 15, 10, 30)
+        date_dir = file_ops._ensure_date_directory_exists(test_date)
+        
+        assert file_ops.cleanup_empty_directories() == 1
+        assert not date_dir.exists()
+        
+        assert file_ops._ensure_date_directory_exists(test_date).exists()
+    
     def test_move_file_success(self, file_ops, temp_dir):
         """Тест успешного перемещения файла."""
         # Создаем тестовый файл
@@ -96,6 +127,306 @@ class TestFileOps:
         file_ops.logger.log_file_moved.assert_called_once()
         file_ops.logger.log_file_operation.assert_called_once()
     
+    def test_move_file_same_fs_uses_rename(self, file_ops, temp_dir):
+        """Тест перемещения в пределах одной ФС одним вызовом os.replace."""
+        test_file = file_ops.base_path / "test_file.txt"
+        test_file.write_text("test content")
+        
+        assert file_ops._same_fs is True
+        
+        with patch('src.file_ops.shutil.move') as mock_move:
+            result_path = file_ops.move_file("test_file.txt", datetime(2024, 1, 15))
+            
+        mock_move.assert_not_called()
+        assert result_path.read_text() == "test content"
+        assert not test_file.exists()
+    
+    def test_move_file_cross_fs_copies(self, file_ops, temp_dir):
+        """Тест перемещения между разными ФС копированием без попытки rename."""
+        test_file = file_ops.base_path / "test_file.txt"
+        test_file.write_text("test content")
+        file_ops._same_fs = False
+        
+        with patch('src.file_ops.shutil.move') as mock_move, \
+             patch('src.file_ops.os.fdatasync', wraps=os.fdatasync) as mock_sync:
+            result_path = file_ops.move_file("test_file.txt", datetime(2024, 1, 15))
+            
+        mock_move.assert_not_called()
+        mock_sync.assert_called_once()
+        assert result_path.read_text() == "test content"
+        assert not test_file.exists()
+    
+    def test_move_file_cross_fs_without_kernel_copy(self, file_ops, temp_dir):
+        """Тест копирования между ФС, если copy_file_range и sendfile недоступны."""
+        import errno
+        
+        test_content = os.urandom(3 * 1024 * 1024 + 5)
+        test_file = file_ops.base_path / "test_file.bin"
+        test_file.write_bytes(test_content)
+        file_ops._same_fs = False
+        unsupported = OSError(errno.ENOSYS, "not supported")
+        
+        with patch('src.file_ops.os.copy_file_range', side_effect=unsupported, create=True), \
+             patch('src.file_ops.os.sendfile', side_effect=unsupported, create=True):
+            result_path = file_ops.move_file("test_file.bin", datetime(2024, 1, 15))
+            
+        assert result_path.read_bytes() == test_content
+        assert not test_file.exists()
+    
+    def test_move_file_cross_fs_not_found(self, file_ops):
+        """Тест перемещения между ФС отсутствующего файла: пустая копия удаляется."""
+        file_ops._same_fs = False
+        
+        with pytest.raises(FileNotFoundError):
+            file_ops.move_file("nonexistent.txt", datetime(2024, 1, 15))
+            
+        assert list((file_ops.new_base_path / "20240115").iterdir()) == []
+    
+    def test_move_file_with_hash(self, file_ops, temp_dir):
+        """Тест перемещения с хешированием в пределах одной ФС."""
+        import hashlib
+        
+        test_content = os.urandom(2 * 1024 * 1024 + 3)
+        (file_ops.base_path / "test_file.bin").write_bytes(test_content)
+        
+        result_path, file_hash = file_ops.move_file_with_hash("test_file.bin", datetime(2024, 1, 15), "md5")
+        
+        assert file_hash == hashlib.md5(test_content).hexdigest()
+        assert result_path == file_ops.new_base_path / "20240115" / "test_file.bin"
+        assert result_path.read_bytes() == test_content
+        assert not (file_ops.base_path / "test_file.bin").exists()
+    
+    def test_move_file_with_hash_rename_without_hash(self, file_ops, temp_dir):
+        """Тест перемещения переименованием без чтения данных."""
+        (file_ops.base_path / "test_file.bin").write_bytes(b"payload")
+        
+        with patch.object(FileOps, '_digest_file') as mock_digest:
+            result_path, file_hash = file_ops.move_file_with_hash(
+                "test_file.bin", datetime(2024, 1, 15), "md5", hash_renamed=False
+            )
+            
+        mock_digest.assert_not_called()
+        assert file_hash is None
+        assert result_path.read_bytes() == b"payload"
+        assert not (file_ops.base_path / "test_file.bin").exists()
+    
+    def test_move_file_with_hash_cross_fs(self, file_ops, temp_dir):
+        """Тест копирования с хешированием за один проход между разными ФС."""
+        import hashlib
+        
+        test_content = os.urandom(2 * 1024 * 1024 + 3)
+        source_file = file_ops.base_path / "test_file.bin"
+        source_file.write_bytes(test_content)
+        file_ops._same_fs = False
+        
+        with patch('src.file_ops.shutil.move') as mock_move:
+            result_path, file_hash = file_ops.move_file_with_hash("test_file.bin", datetime(2024, 1, 15), "sha256")
+            
+        mock_move.assert_not_called()
+        assert file_hash == hashlib.sha256(test_content).hexdigest()
+        assert result_path.read_bytes() == test_content
+        assert not source_file.exists()
+    
+    def test_move_file_with_hash_cross_fs_existing_target(self, file_ops, temp_dir):
+        """Тест копирования между ФС, когда целевое имя уже занято."""
+        source_file = file_ops.base_path / "test_file.bin"
+        source_file.write_bytes(b"new content")
+        test_date = datetime(2024, 1, 15)
+        existing_file = file_ops._ensure_date_directory_exists(test_date) / "test_file.bin"
+        existing_file.write_bytes(b"existing content")
+        file_ops._same_fs = False
+        
+        result_path, _ = file_ops.move_file_with_hash("test_file.bin", test_date, "md5")
+        
+        assert result_path == existing_file.parent / "test_file_1.bin"
+        assert result_path.read_bytes() == b"new content"
+        assert existing_file.read_bytes() == b"existing content"
+        assert not source_file.exists()
+    
+    def test_move_file_with_hash_deferred_sync(self, file_ops, temp_dir):
+        """Тест отложенного сброса: исходный файл удаляется после finish_deferred_moves."""
+        source_file = file_ops.base_path / "test_file.bin"
+        source_file.write_bytes(b"payload")
+        file_ops._same_fs = False
+        
+        with patch('src.file_ops.os.fsync') as mock_fsync, \
+             patch('src.file_ops._sync_filesystem') as mock_sync:
+            result_path, _ = file_ops.move_file_with_hash(
+                "test_file.bin", datetime(2024, 1, 15), "md5", defer_sync=True
+            )
+            assert source_file.exists()
+            assert result_path.read_bytes() == b"payload"
+            
+            assert file_ops.finish_deferred_moves() == {}
+            
+        mock_fsync.assert_not_called()
+        mock_sync.assert_called_once_with(str(file_ops.new_base_path))
+        assert not source_file.exists()
+        assert file_ops.finish_deferred_moves() == {}
+    
+    def test_finish_deferred_moves_sync_error(self, file_ops, temp_dir):
+        """Тест ошибки сброса: копии удаляются, исходные файлы остаются на месте."""
+        source_file = file_ops.base_path / "test_file.bin"
+        source_file.write_bytes(b"payload")
+        file_ops._same_fs = False
+        target_path, _ = file_ops.move_file_with_hash(
+            "test_file.bin", datetime(2024, 1, 15), "md5", defer_sync=True
+        )
+        
+        with patch('src.file_ops._sync_filesystem', side_effect=OSError(5, "I/O error")):
+            failed = file_ops.finish_deferred_moves()
+            
+        assert list(failed) == ["test_file.bin"]
+        assert source_file.exists()
+        assert not target_path.exists()
+        file_ops.logger.log_warning.assert_called()
+        file_ops.logger.log_database_error.assert_not_called()
+    
+    def test_finish_deferred_moves_unlink_error(self, file_ops, temp_dir):
+        """Тест ошибки удаления исходного файла: перемещение отменяется."""
+        for name in ("ok.bin", "locked.bin"):
+            (file_ops.base_path / name).write_bytes(b"payload")
+        file_ops._same_fs = False
+        ok_path, _ = file_ops.move_file_with_hash("ok.bin", datetime(2024, 1, 15), "md5", defer_sync=True)
+        locked_path, _ = file_ops.move_file_with_hash("locked.bin", datetime(2024, 1, 15), "md5", defer_sync=True)
+        
+        locked_source = os.path.join(file_ops._base_str, "locked.bin")
+        original_unlink = os.unlink
+        
+        def unlink(path):
+            if path == locked_source:
+                raise PermissionError(13, "Permission denied")
+            original_unlink(path)
+            
+        with patch('src.file_ops._sync_filesystem'), \
+             patch('src.file_ops.os.unlink', side_effect=unlink):
+            failed = file_ops.finish_deferred_moves()
+            
+        assert list(failed) == ["locked.bin"]
+        assert ok_path.exists()
+        assert not (file_ops.base_path / "ok.bin").exists()
+        assert not locked_path.exists()
+        assert (file_ops.base_path / "locked.bin").exists()
+        file_ops.logger.log_file_error.assert_called_once()
+    
+    def test_move_file_with_hash_copy_mismatch(self, file_ops, temp_dir):
+        """Тест несовпадения хеша копии: копия удаляется, исходный файл остается."""
+        source_file = file_ops.base_path / "test_file.bin"
+        source_file.write_bytes(b"payload")
+        file_ops._same_fs = False
+        
+        with patch.object(FileOps, '_digest_file', return_value="corrupted"):
+            with pytest.raises(FileOperationError):
+                file_ops.move_file_with_hash("test_file.bin", datetime(2024, 1, 15), "md5")
+                
+        assert source_file.read_bytes() == b"payload"
+        assert list(file_ops.new_base_path.rglob("*.bin")) == []
+    
+    def test_finish_deferred_moves_copy_mismatch(self, file_ops, temp_dir):
+        """Тест сверки отложенных копий: поврежденная копия удаляется, исходный файл остается."""
+        for name in ("ok.bin", "bad.bin"):
+            (file_ops.base_path / name).write_bytes(b"payload")
+        file_ops._same_fs = False
+        ok_path, _ = file_ops.move_file_with_hash("ok.bin", datetime(2024, 1, 15), "md5", defer_sync=True)
+        bad_path, _ = file_ops.move_file_with_hash("bad.bin", datetime(2024, 1, 15), "md5", defer_sync=True)
+        bad_path.write_bytes(b"garbage")
+        
+        with patch('src.file_ops._sync_filesystem'):
+            failed = file_ops.finish_deferred_moves()
+            
+        assert list(failed) == ["bad.bin"]
+        assert isinstance(failed["bad.bin"], FileOperationError)
+        assert ok_path.exists()
+        assert not (file_ops.base_path / "ok.bin").exists()
+        assert not bad_path.exists()
+        assert (file_ops.base_path / "bad.bin").read_bytes() == b"payload"
+    
+    def test_finish_deferred_moves_source_already_removed(self, file_ops, temp_dir):
+        """Тест отложенного перемещения, исходный файл которого уже удален: копия остается."""
+        source_file = file_ops.base_path / "test_file.bin"
+        source_file.write_bytes(b"payload")
+        file_ops._same_fs = False
+        target_path, _ = file_ops.move_file_with_hash(
+            "test_file.bin", datetime(2024, 1, 15), "md5", defer_sync=True
+        )
+        source_file.unlink()
+        
+        with patch('src.file_ops._sync_filesystem'):
+            assert file_ops.finish_deferred_moves() == {}
+            
+        assert target_path.read_bytes() == b"payload"
+        file_ops.logger.log_file_error.assert_not_called()
+    
+    def test_move_file_cross_fs_source_already_removed(self, file_ops, temp_dir):
+        """Тест перемещения между ФС, если исходный файл удален после копирования."""
+        import errno
+        
+        source_file = file_ops.base_path / "test_file.bin"
+        source_file.write_bytes(b"payload")
+        file_ops._same_fs = False
+        
+        with patch('src.file_ops.os.unlink', side_effect=OSError(errno.ENOENT, "No such file")):
+            result_path = file_ops.move_file("test_file.bin", datetime(2024, 1, 15))
+            
+        assert result_path.read_bytes() == b"payload"
+    
+    def test_move_file_cross_fs_unlink_error(self, file_ops, temp_dir):
+        """Тест ошибки удаления исходного файла при перемещении между ФС: копия удаляется."""
+        source_file = file_ops.base_path / "test_file.bin"
+        source_file.write_bytes(b"payload")
+        file_ops._same_fs = False
+        original_unlink = os.unlink
+        
+        def unlink(path):
+            if path == str(source_file):
+                raise PermissionError(13, "Permission denied")
+            original_unlink(path)
+            
+        with patch('src.file_ops.os.unlink', side_effect=unlink):
+            with pytest.raises(FileOperationError):
+                file_ops.move_file("test_file.bin", datetime(2024, 1, 15))
+                
+        assert source_file.exists()
+        assert list(file_ops.new_base_path.rglob("*.bin")) == []
+    
+    def test_move_file_with_hash_drops_page_cache(self, file_ops, temp_dir):
+        """Тест вытеснения скопированного файла из страничного кеша."""
+        (file_ops.base_path / "test_file.bin").write_bytes(b"payload")
+        file_ops._same_fs = False
+        file_ops.drop_page_cache = True
+        
+        with patch('src.file_ops._fadvise') as mock_fadvise:
+            result_path, _ = file_ops.move_file_with_hash("test_file.bin", datetime(2024, 1, 15), "md5")
+            
+        advice = [c.args[1] for c in mock_fadvise.call_args_list]
+        assert advice == ['POSIX_FADV_SEQUENTIAL'] + ['POSIX_FADV_DONTNEED'] * 3
+        assert result_path.read_bytes() == b"payload"
+    
+    def test_move_file_with_hash_deferred_drops_page_cache_after_sync(self, file_ops, temp_dir):
+        """Тест отложенного сброса: грязные страницы копии не вытесняются до сброса на диск."""
+        (file_ops.base_path / "test_file.bin").write_bytes(b"payload")
+        file_ops._same_fs = False
+        file_ops.drop_page_cache = True
+        events = []
+        
+        with patch('src.file_ops._fadvise', side_effect=lambda fd, advice: events.append(advice)), \
+             patch('src.file_ops._sync_filesystem', side_effect=lambda path: events.append('sync')):
+            file_ops.move_file_with_hash("test_file.bin", datetime(2024, 1, 15), "md5", defer_sync=True)
+            assert events == ['POSIX_FADV_SEQUENTIAL', 'POSIX_FADV_DONTNEED']
+            
+            assert file_ops.finish_deferred_moves() == {}
+            
+        assert events[2:] == ['sync', 'POSIX_FADV_DONTNEED', 'POSIX_FADV_DONTNEED']
+    
+    def test_move_file_with_hash_not_found(self, file_ops):
+        """Тест перемещения с хешированием несуществующего файла."""
+        file_ops._same_fs = False
+        
+        with pytest.raises(FileNotFoundError):
+            file_ops.move_file_with_hash("nonexistent.txt", datetime(2024, 1, 15))
+            
+        assert list((file_ops.new_base_path / "20240115").iterdir()) == []
+    
     def test_move_file_not_found(self, file_ops):
         """Тест перемещения несуществующего файла."""
         test_date = datetime(2024, 1, 15, 10, 30)
@@ -105,6 +436,19 @@ class TestFileOps:
         
         file_ops.logger.log_file_error.assert_called_once()
     
+    def test_move_file_not_found_cross_fs(self, file_ops):
+        """Тест перемещения несуществующего файла между ФС без предварительной проверки."""
+        file_ops._same_fs = False
+        
+        with patch('src.file_ops.os.path.exists', wraps=os.path.exists) as mock_exists:
+            with pytest.raises(FileNotFoundError):
+                file_ops.move_file("nonexistent.txt", datetime(2024, 1, 15))
+                
+        # Проверка источника выполняется только после ошибки перемещения
+        checked = [os.fspath(c.args[0]) for c in mock_exists.call_args_list]
+        assert checked.count(os.path.join(str(file_ops.base_path), "nonexistent.txt")) == 1
+        file_ops.logger.log_file_error.assert_called_once()
+    
     def test_move_file_with_existing_target(self, file_ops, temp_dir):
         """Тест перемещения файла когда целевой файл уже существует."""
         # Создаем исходный файл
@@ -126,6 +470,65 @@ class TestFileOps:
         assert result_path.read_text() == "original content"
         assert existing_file.read_text() == "existing content"
     
+    def test_move_file_without_renameat2(self, file_ops, temp_dir):
+        """Тест перемещения через link + unlink, если renameat2 недоступен."""
+        source_file = file_ops.base_path / "test_file.txt"
+        source_file.write_text("original content")
+        
+        test_date = datetime(2024, 1, 15, 10, 30)
+        date_dir = file_ops._ensure_date_directory_exists(test_date)
+        existing_file = date_dir / "test_file.txt"
+        existing_file.write_text("existing content")
+        
+        with patch('src.file_ops._renameat2', None):
+            result_path = file_ops.move_file("test_file.txt", test_date)
+            
+        assert result_path == date_dir / "test_file_1.txt"
+        assert result_path.read_text() == "original content"
+        assert existing_file.read_text() == "existing content"
+        assert not source_file.exists()
+    
+    def test_move_file_without_renameat2_and_hard_links(self, file_ops, temp_dir):
+        """Тест перемещения через rename, если ФС не поддерживает жесткие ссылки."""
+        import errno
+        
+        source_file = file_ops.base_path / "test_file.txt"
+        source_file.write_text("original content")
+        
+        test_date = datetime(2024, 1, 15, 10, 30)
+        date_dir = file_ops._ensure_date_directory_exists(test_date)
+        existing_file = date_dir / "test_file.txt"
+        existing_file.write_text("existing content")
+        
+        with patch('src.file_ops._renameat2', None), \
+             patch('src.file_ops.os.link', side_effect=OSError(errno.EPERM, "Operation not permitted")):
+            result_path = file_ops.move_file("test_file.txt", test_date)
+            
+        assert result_path == date_dir / "test_file_1.txt"
+        assert result_path.read_text() == "original content"
+        assert existing_file.read_text() == "existing content"
+        assert not source_file.exists()
+    
+    def test_move_file_without_renameat2_unlink_error(self, file_ops, temp_dir):
+        """Тест ошибки удаления исходного имени после link: новая ссылка удаляется."""
+        source_file = file_ops.base_path / "test_file.txt"
+        source_file.write_text("original content")
+        test_date = datetime(2024, 1, 15, 10, 30)
+        original_unlink = os.unlink
+        
+        def unlink(path):
+            if str(path) == str(source_file):
+                raise PermissionError(13, "Permission denied")
+            original_unlink(path)
+            
+        with patch('src.file_ops._renameat2', None), \
+             patch('src.file_ops.os.unlink', side_effect=unlink):
+            with pytest.raises(FileOperationError):
+                file_ops.move_file("test_file.txt", test_date)
+                
+        assert source_file.read_text() == "original content"
+        assert list(file_ops.new_base_path.rglob("*.txt")) == []
+    
     def test_read_file_old_scheme(self, file_ops, temp_dir):
         """Тест чтения файла по старой схеме."""
         # Создаем тестовый файл
@@ -154,6 +557,18 @@ class TestFileOps:
         assert result == test_content
         file_ops.logger.log_file_operation.assert_called_once()
     
+    def test_read_file_grown_after_fstat(self, file_ops):
+        """Тест чтения файла, выросшего после fstat."""
+        test_file = file_ops.base_path / "test_file.txt"
+        test_content = b"test content"
+        test_file.write_bytes(test_content)
+        
+        # fstat видит старый, меньший размер файла
+        with patch('src.file_ops.os.fstat', return_value=Mock(st_size=4)):
+            result = file_ops.read_file("test_file.txt", False, datetime.now())
+            
+        assert result == test_content
+    
     def test_read_file_not_found(self, file_ops):
         """Тест чтения несуществующего файла."""
         with pytest.raises(FileNotFoundError):
@@ -194,6 +609,27 @@ class TestFileOps:
         assert result_path.read_bytes() == test_content
         assert existing_file.read_text() == "existing content"
     
+    def test_write_files(self, file_ops, temp_dir):
+        """Тест параллельной записи набора файлов."""
+        test_date = datetime(2024, 1, 15, 10, 30)
+        items = [(f"file{i}.bin", f"file{i}.bin", f"content {i}".encode(), test_date) for i in range(5)]
+        items.append(("bad.bin", "bad.bin", b"data", test_date))
+        
+        original_write_file = file_ops.write_file
+        
+        def write_file(idfl, filename, data, dt):
+            if idfl == "bad.bin":
+                raise FileOperationError("Ошибка записи файла bad.bin")
+            return original_write_file(idfl, filename, data, dt)
+            
+        with patch.object(file_ops, 'write_file', side_effect=write_file):
+            result = file_ops.write_files(items, max_workers=3)
+            
+        for idfl, _, data, _ in items[:-1]:
+            assert result[idfl] == file_ops.new_base_path / "20240115" / idfl
+            assert result[idfl].read_bytes() == data
+        assert result["bad.bin"] is None
+    
     def test_file_exists_old_scheme(self, file_ops, temp_dir):
         """Тест проверки существования файла по старой схеме."""
         # Файл не существует
@@ -232,13 +668,25 @@ class TestFileOps:
         size = file_ops.get_file_size("test_file.txt", False, datetime.now())
         
         assert size == len(test_content.encode('utf-8'))
-        file_ops.logger.log_system_info.assert_called()
+        file_ops.logger.log_debug.assert_called_once()
     
     def test_get_file_size_not_found(self, file_ops):
         """Тест получения размера несуществующего файла."""
         size = file_ops.get_file_size("nonexistent.txt", False, datetime.now())
         assert size is None
     
+    def test_file_queries_skip_exists_probe(self, file_ops, temp_dir):
+        """Тест отсутствия лишних проверок exists() перед обращением к файлам."""
+        (file_ops.base_path / "test_file.txt").write_text("test content")
+        
+        with patch.object(Path, 'exists') as mock_exists:
+            assert file_ops.get_file_size("test_file.txt", False, datetime.now()) == 12
+            assert file_ops.get_file_hash("missing.txt", False, datetime.now()) is None
+            assert len(file_ops.list_unmoved_files()) == 1
+            assert file_ops.get_storage_statistics()['unmoved_files_count'] == 1
+            
+        mock_exists.assert_not_called()
+    
     def test_get_file_hash(self, file_ops, temp_dir):
         """Тест получения хеша файла."""
         # Создаем тестовый файл
@@ -251,13 +699,155 @@ class TestFileOps:
         
         assert file_hash is not None
         assert len(file_hash) == 32  # MD5 хеш имеет длину 32 символа
-        file_ops.logger.log_system_info.assert_called()
+        file_ops.logger.log_debug.assert_called_once()
+    
+    def test_get_file_hash_matches_hashlib(self, file_ops, temp_dir):
+        """Тест совпадения хеша с эталонным значением hashlib для разных алгоритмов."""
+        import hashlib
+        
+        test_content = os.urandom(3 * 1024 * 1024 + 17)
+        (file_ops.base_path / "big_file.bin").write_bytes(test_content)
+        
+        for algorithm in ('md5', 'sha1', 'sha256'):
+            expected = hashlib.new(algorithm, test_content).hexdigest()
+            assert file_ops.get_file_hash("big_file.bin", False, datetime.now(), algorithm) == expected
+            
+        assert file_ops.get_file_hash("big_file.bin", False, datetime.now(), "crc32") is None
+    
+    def test_get_file_hash_fast_algorithms(self, file_ops, temp_dir):
+        """Тест быстрых алгоритмов хеширования xxh3 и blake3."""
+        xxhash = pytest.importorskip("xxhash")
+        blake3 = pytest.importorskip("blake3")
+        
+        test_content = os.urandom(2 * 1024 * 1024 + 5)
+        (file_ops.base_path / "big_file.bin").write_bytes(test_content)
+        
+        assert file_ops.get_file_hash("big_file.bin", False, datetime.now(), "xxh3") == \
+            xxhash.xxh3_128(test_content).hexdigest()
+        assert file_ops.get_file_hash("big_file.bin", False, datetime.now(), "blake3") == \
+            blake3.blake3(test_content).hexdigest()
+    
+    def test_get_file_hash_blake3_parallel(self, file_ops, temp_dir):
+        """Тест многопоточного blake3 для больших файлов: хеш не меняется."""
+        blake3 = pytest.importorskip("blake3")
+        
+        test_content = os.urandom(3 * 1024 * 1024 + 7)
+        (file_ops.base_path / "big_file.bin").write_bytes(test_content)
+        
+        with patch('src.file_ops.PARALLEL_HASH_MIN_SIZE', 1024 * 1024), \
+             patch('src.file_ops.mmap.mmap', wraps=mmap.mmap) as mock_mmap:
+            file_hash = file_ops.get_file_hash("big_file.bin", False, datetime.now(), "blake3")
+            
+        mock_mmap.assert_called_once()
+        assert file_hash == blake3.blake3(test_content).hexdigest()
+    
+    def test_get_file_hash_large_file_without_mmap(self, file_ops, temp_dir):
+        """Тест хеширования большого файла через file_digest, без отображения в память."""
+        import hashlib
+        
+        if not hasattr(hashlib, 'file_digest'):
+            pytest.skip("hashlib.file_digest недоступен")
+            
+        test_content = os.urandom(2 * 1024 * 1024 + 3)
+        (file_ops.base_path / "big_file.bin").write_bytes(test_content)
+        
+        with patch('src.file_ops.mmap.mmap', wraps=mmap.mmap) as mock_mmap:
+            big_hash = file_ops.get_file_hash("big_file.bin", False, datetime.now(), "sha256")
+            
+        # Усечение отображенного файла другим процессом привело бы к SIGBUS
+        mock_mmap.assert_not_called()
+        assert big_hash == hashlib.sha256(test_content).hexdigest()
+    
+    def test_get_file_hash_without_file_digest(self, file_ops, temp_dir, monkeypatch):
+        """Тест хеширования через mmap на интерпретаторах без hashlib.file_digest."""
+        import hashlib
+        
+        monkeypatch.delattr(hashlib, 'file_digest', raising=False)
+        test_content = os.urandom(2 * 1024 * 1024 + 5)
+        (file_ops.base_path / "big_file.bin").write_bytes(test_content)
+        (file_ops.base_path / "empty.bin").write_bytes(b"")
+        
+        assert file_ops.get_file_hash("big_file.bin", False, datetime.now(), "sha256") == \
+            hashlib.sha256(test_content).hexdigest()
+        assert file_ops.get_file_hash("empty.bin", False, datetime.now(), "md5") == \
+            hashlib.md5(b"").hexdigest()
+    
+    def test_get_file_hash_fast_algorithm_unavailable(self, file_ops, temp_dir):
+        """Тест отказа от xxh3, если пакет xxhash не установлен."""
+        import hashlib
+        
+        (file_ops.base_path / "test.bin").write_bytes(b"data")
+        
+        hash_factories = {'md5': hashlib.md5, 'sha1': hashlib.sha1, 'sha256': hashlib.sha256}
+        with patch.dict('src.file_ops._HASH_FACTORIES', hash_factories, clear=True):
+            assert file_ops.get_file_hash("test.bin", False, datetime.now(), "xxh3") is None
     
     def test_get_file_hash_not_found(self, file_ops):
         """Тест получения хеша несуществующего файла."""
         file_hash = file_ops.get_file_hash("nonexistent.txt", False, datetime.now(), "md5")
         assert file_hash is None
     
+    def test_get_file_hashes(self, file_ops, temp_dir):
+        """Тест получения хешей набора файлов в нескольких потоках."""
+        import hashlib
+        
+        contents = {f"file{i}.bin": os.urandom(1024 + i) for i in range(5)}
+        for name, content in contents.items():
+            (file_ops.base_path / name).write_bytes(content)
+        files = [(name, False, datetime.now()) for name in contents]
+        files.append(("nonexistent.bin", False, datetime.now()))
+        
+        result = file_ops.get_file_hashes(files, "sha256", max_workers=3)
+        
+        for name, content in contents.items():
+            assert result[name] == hashlib.sha256(content).hexdigest()
+        assert result["nonexistent.bin"] is None
+    
+    def test_ensure_date_directories(self, file_ops, temp_dir):
+        """Тест предварительного создания каталогов: один mkdir на дату."""
+        dates = [datetime(2024, 1, 15, 10), datetime(2024, 1, 15, 11), datetime(2024, 1, 16)]
+        
+        with patch('src.file_ops.os.makedirs', side_effect=os.makedirs) as mock_makedirs:
+            file_ops.ensure_date_directories(dates)
+            file_ops.ensure_date_directories(dates)
+            
+        assert mock_makedirs.call_count == 2
+        assert (file_ops.new_base_path / "20240115").is_dir()
+        assert (file_ops.new_base_path / "20240116").is_dir()
+    
+    def test_get_moved_file_sizes(self, file_ops, temp_dir):
+        """Тест получения размеров перемещенных файлов одним проходом по каталогу."""
+        date_dir = file_ops._ensure_date_directory_exists(datetime(2024, 1, 15))
+        (date_dir / "file001").write_bytes(b"12345")
+        (date_dir / "file002").write_bytes(b"")
+        
+        with patch('src.file_ops.os.scandir', wraps=os.scandir) as mock_scandir:
+            sizes = file_ops.get_moved_file_sizes([
+                ("file001", datetime(2024, 1, 15, 10)),
+                ("file002", datetime(2024, 1, 15, 11)),
+                ("file003", datetime(2024, 1, 15, 12)),
+                ("file004", datetime(2024, 2, 1))
+            ])
+            
+        assert sizes == {"file001": 5, "file002": 0, "file003": None, "file004": None}
+        assert mock_scandir.call_count == 2
+    
+    def test_get_moved_file_sizes_many_date_directories(self, file_ops, temp_dir):
+        """Тест размеров файлов из многих каталогов по датам: размер только запрошенных."""
+        files = []
+        for day in range(1, 11):
+            dt = datetime(2024, 3, day)
+            date_dir = file_ops._ensure_date_directory_exists(dt)
+            (date_dir / f"file{day:03d}").write_bytes(b"x" * day)
+            (date_dir / "other").write_bytes(b"other")
+            files.append((f"file{day:03d}", dt))
+            
+        with patch('src.file_ops.os.scandir', wraps=os.scandir) as mock_scandir:
+            sizes = file_ops.get_moved_file_sizes(files)
+            
+        assert sizes == {f"file{day:03d}": day for day in range(1, 11)}
+        assert mock_scandir.call_count == 10
+    
     def test_list_files_in_date_directory(self, file_ops, temp_dir):
         """Тест получения списка файлов в каталоге по дате."""
         test_date = datetime(2024, 1, 15, 10, 30)
@@ -301,6 +891,20 @@ class TestFileOps:
         assert not date_dir.exists()
         file_ops.logger.log_system_info.assert_called()
     
+    def test_cleanup_keeps_non_empty_directories(self, file_ops, temp_dir):
+        """Тест очистки: непустые каталоги и файлы в корне не затрагиваются."""
+        empty_dir = file_ops._ensure_date_directory_exists(datetime(2024, 1, 15))
+        full_dir = file_ops._ensure_date_directory_exists(datetime(2024, 1, 16))
+        (full_dir / "file1.txt").write_text("content1")
+        (file_ops.new_base_path / "stray.txt").write_text("stray")
+        
+        removed_count = file_ops.cleanup_empty_directories()
+        
+        assert removed_count == 1
+        assert not empty_dir.exists()
+        assert (full_dir / "file1.txt").exists()
+        assert (file_ops.new_base_path / "stray.txt").exists()
+    
     def test_get_storage_statistics(self, file_ops, temp_dir):
         """Тест получения статистики хранилища."""
         # Создаем тестовые файлы
@@ -322,6 +926,32 @@ class TestFileOps:
         
         file_ops.logger.log_system_info.assert_called()
     
+    def test_get_storage_statistics_nested_directories(self, file_ops, temp_dir):
+        """Тест учета файлов во вложенных подкаталогах новой структуры."""
+        date_dir = file_ops._ensure_date_directory_exists(datetime(2024, 1, 15))
+        (date_dir / "moved_file.txt").write_text("12345")
+        (date_dir / "nested").mkdir()
+        (date_dir / "nested" / "inner.txt").write_text("123")
+        
+        stats = file_ops.get_storage_statistics()
+        
+        assert stats['date_directories_count'] == 1
+        assert stats['moved_files_count'] == 2
+        assert stats['moved_files_size'] == 8
+    
+    def test_get_storage_statistics_many_date_directories(self, file_ops, temp_dir):
+        """Тест суммирования статистики каталогов, просмотренных в нескольких потоках."""
+        for day in range(1, 6):
+            date_dir = file_ops._ensure_date_directory_exists(datetime(2024, 1, day))
+            for i in range(day):
+                (date_dir / f"file{i}.txt").write_text("x" * day)
+        
+        stats = file_ops.get_storage_statistics()
+        
+        assert stats['date_directories_count'] == 5
+        assert stats['moved_files_count'] == 15
+        assert stats['moved_files_size'] == sum(day * day for day in range(1, 6))
+    
     def test_get_unique_filename(self, file_ops, temp_dir):
         """Тест получения уникального имени файла."""
         test_date = datetime(2024, 1, 15, 10, 30)
@@ -352,6 +982,22 @@ class TestFileOps:
         assert unique_path != existing_file
         assert unique_path.name == "test_1.txt"
         assert unique_path.suffix == ".txt"
+    
+    def test_get_unique_filename_lists_directory_once(self, file_ops, temp_dir):
+        """Тест подбора имени по одному чтению каталога."""
+        test_date = datetime(2024, 1, 15, 10, 30)
+        date_dir = file_ops._ensure_date_directory_exists(test_date)
+        
+        for name in ("test.txt", "test_1.txt", "test_2.txt"):
+            (date_dir / name).write_text("existing")
+            
+        with patch('src.file_ops.os.listdir', wraps=os.listdir) as mock_listdir, \
+             patch.object(Path, 'exists') as mock_exists:
+            unique_path = file_ops._get_unique_filename(date_dir, "test.txt")
+            
+        assert unique_path.name == "test_3.txt"
+        mock_listdir.assert_called_once_with(date_dir)
+        mock_exists.assert_not_called()
 
 
 class TestCreateFileOps:
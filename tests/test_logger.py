@@ -4,8 +4,10 @@
 
 import pytest
 import tempfile
+import time
 import os
 import logging
+import logging.handlers
 from pathlib import Path
 from unittest.mock import patch, MagicMock
 
@@ -13,9 +15,12 @@ from src.logger import (
     FileMigratorLogger, 
     setup_logger, 
     get_logger,
-    ColoredFormatter
+    ColoredFormatter,
+    CachedTimeFormatter,
+    AppendRotatingFileHandler
 )
 from src.config_loader import LoggingConfig
+import src.logger
 
 
 class TestColoredFormatter:
@@ -48,6 +53,109 @@ class TestColoredFormatter:
         assert 'INFO' in formatted  # Уровень логирования должен быть в выводе
 
 
+class TestCachedTimeFormatter:
+    """Тесты для CachedTimeFormatter."""
+    
+    def test_time_formatted_once_per_second(self):
+        """Тест повторного использования времени для записей одной секунды."""
+        formatter = CachedTimeFormatter(fmt='%(asctime)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+        records = [
+            logging.LogRecord('test', logging.INFO, '', 0, 'message', (), None)
+            for _ in range(3)
+        ]
+        records[0].created = 1700000000.1
+        records[1].created = 1700000000.9
+        records[2].created = 1700000001.2
+        
+        with patch.object(formatter, 'converter', wraps=time.localtime) as mock_localtime:
+            first, second, third = (formatter.format(record) for record in records)
+            
+        assert mock_localtime.call_count == 2
+        assert first == second
+        assert first != third
+
+
+class TestAppendRotatingFileHandler:
+    """Тесты для AppendRotatingFileHandler."""
+    
+    def make_record(self, message):
+        """Создает запись лога с заданным сообщением."""
+        return logging.LogRecord('test', logging.INFO, '', 0, message, (), None)
+    
+    def test_write_without_stat(self):
+        """Тест записи без stat на каждую запись."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_file = os.path.join(temp_dir, 'test.log')
+            handler = AppendRotatingFileHandler(log_file, max_bytes=1024, backup_count=2)
+            
+            with patch('src.logger.os.fstat') as mock_fstat, \
+                 patch('src.logger.os.stat') as mock_stat:
+                handler.emit(self.make_record("первое"))
+                handler.emit(self.make_record("второе"))
+            handler.close()
+            
+            mock_fstat.assert_not_called()
+            mock_stat.assert_not_called()
+            assert Path(log_file).read_text(encoding='utf-8') == "первое\nвторое\n"
+            assert handler.bytes_written == len("первое\nвторое\n".encode('utf-8'))
+    
+    def test_rollover(self):
+        """Тест ротации файла по счетчику записанных байт."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_file = os.path.join(temp_dir, 'test.log')
+            Path(log_file).write_text("x" * 15 + "\n")
+            handler = AppendRotatingFileHandler(log_file, max_bytes=20, backup_count=2)
+            
+            for message in ("a" * 9, "b" * 9, "c" * 9):
+                handler.emit(self.make_record(message))
+            handler.close()
+            
+            assert Path(log_file).read_text() == "c" * 9 + "\n"
+            assert Path(log_file + ".1").read_text() == "a" * 9 + "\n" + "b" * 9 + "\n"
+            assert Path(log_file + ".2").read_text() == "x" * 15 + "\n"
+            assert not os.path.exists(log_file + ".3")
+    
+    def test_rollover_failure_keeps_logging(self):
+        """Тест ошибки ротации: записи продолжают попадать в файл."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_file = os.path.join(temp_dir, 'test.log')
+            handler = AppendRotatingFileHandler(log_file, max_bytes=20, backup_count=2)
+            handler.emit(self.make_record("a" * 15))
+            
+            with patch('src.logger.os.replace', side_effect=PermissionError(13, "Permission denied")), \
+                 patch.object(handler, 'handleError') as mock_handle_error:
+                handler.emit(self.make_record("b" * 15))
+                
+            mock_handle_error.assert_called_once()
+            assert handler.fd is not None
+            
+            handler.emit(self.make_record("c" * 3))
+            handler.close()
+            
+            assert Path(log_file + ".1").read_text() == "a" * 15 + "\n" + "b" * 15 + "\n"
+            assert Path(log_file).read_text() == "c" * 3 + "\n"
+    
+    def test_reopen_after_failed_open(self):
+        """Тест повторного открытия файла, если ротация не смогла его открыть."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_file = os.path.join(temp_dir, 'test.log')
+            handler = AppendRotatingFileHandler(log_file, max_bytes=20, backup_count=2)
+            handler.emit(self.make_record("a" * 15))
+            
+            with patch('src.logger.os.open', side_effect=OSError(28, "No space left on device")), \
+                 patch.object(handler, 'handleError') as mock_handle_error:
+                handler.emit(self.make_record("b" * 15))
+                
+            mock_handle_error.assert_called_once()
+            assert handler.fd is None
+            
+            handler.emit(self.make_record("c" * 3))
+            handler.close()
+            
+            assert Path(log_file + ".1").read_text() == "a" * 15 + "\n"
+            assert Path(log_file).read_text() == "c" * 3 + "\n"
+
+
 class TestFileMigratorLogger:
     """Тесты для FileMigratorLogger."""
     
@@ -90,14 +198,24 @@ class TestFileMigratorLogger:
         logger = FileMigratorLogger(temp_log_config)
         handlers = logger.logger.handlers
         
-        # Должно быть 2 обработчика: файловый и консольный
-        assert len(handlers) == 2
+        # Логгер пишет в очередь, файловый и консольный обработчики - у фонового потока
+        assert len(handlers) == 1
+        assert isinstance(handlers[0], logging.handlers.QueueHandler)
         
         # Проверяем типы обработчиков
-        handler_types = [type(h).__name__ for h in handlers]
-        assert 'RotatingFileHandler' in handler_types
+        handler_types = [type(h).__name__ for h in src.logger._listener.handlers]
+        assert 'AppendRotatingFileHandler' in handler_types
         assert 'StreamHandler' in handler_types
     
+    def test_records_written_after_stop(self, temp_log_config):
+        """Тест записи накопленных сообщений в файл при остановке логгера."""
+        logger = FileMigratorLogger(temp_log_config)
+        
+        logger.log_system_info("Сообщение через очередь")
+        logger.stop()
+        
+        assert "Сообщение через очередь" in Path(temp_log_config.log_file).read_text(encoding='utf-8')
+    
     def test_log_migration_start(self, temp_log_config):
         """Тест логирования начала миграции."""
         logger = FileMigratorLogger(temp_log_config)
@@ -327,6 +445,47 @@ class TestFileMigratorLogger:
         
         assert returned_logger is logger.logger
         assert returned_logger.name == 'file_migrator'
+    
+    def test_log_debug(self, temp_log_config):
+        """Тест логирования отладочного сообщения."""
+        logger = FileMigratorLogger(temp_log_config)
+        
+        with patch.object(logger.logger, 'debug') as mock_debug:
+            logger.log_debug("Размер файла file001: 100 байт")
+            
+            mock_debug.assert_called_once()
+            call_args = mock_debug.call_args[0][0]
+            assert "🔍 Размер файла file001: 100 байт" in call_args
+    
+    def test_log_debug_lazy_arguments(self, temp_log_config):
+        """Тест отложенной подстановки аргументов отладочного сообщения."""
+        logger = FileMigratorLogger(temp_log_config)
+        
+        logger.log_debug("Размер файла %s: %d байт", "file001", 100)
+        logger.stop()
+        
+        assert "Размер файла file001: 100 байт" in Path(temp_log_config.log_file).read_text(encoding='utf-8')
+        
+        # При выключенном DEBUG до форматирования дело не доходит
+        temp_log_config.level = 'INFO'
+        logger = FileMigratorLogger(temp_log_config)
+        
+        with patch.object(logger.logger, 'debug') as mock_debug:
+            logger.log_debug("Размер файла %s: %d байт", "file001", 100)
+            
+            mock_debug.assert_not_called()
+    
+    def test_per_file_logging_skipped_above_info(self, temp_log_config):
+        """Тест пропуска построения сообщений, если уровень INFO отключен."""
+        temp_log_config.level = 'WARNING'
+        logger = FileMigratorLogger(temp_log_config)
+        
+        with patch.object(logger.logger, 'info') as mock_info:
+            logger.log_system_info("info")
+            logger.log_file_operation("read", Path("test/file.txt"))
+            logger.log_file_moved("file001", Path("old"), Path("new"))
+            
+            mock_info.assert_not_called()
 
 
 class TestSetupLogger:
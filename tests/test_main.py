@@ -54,9 +54,9 @@ class TestFileMigratorCLI:
         """Создает мок мигратора."""
         return Mock()
     
-    @patch('src.main.load_config')
-    @patch('src.main.FileMigratorLogger')
-    @patch('src.main.create_migrator')
+    @patch('src.config_loader.load_config')
+    @patch('src.logger.FileMigratorLogger')
+    @patch('src.migrator.create_migrator')
     def test_setup_success(self, mock_create_migrator, mock_logger_class, mock_load_config, mock_config):
         """Тест успешной инициализации CLI."""
         mock_load_config.return_value = mock_config
@@ -77,7 +77,7 @@ class TestFileMigratorCLI:
         mock_logger_class.assert_called_once_with(mock_config.logging)
         mock_create_migrator.assert_called_once_with(mock_config, mock_logger_instance)
     
-    @patch('src.main.load_config')
+    @patch('src.config_loader.load_config')
     def test_setup_failure(self, mock_load_config):
         """Тест неудачной инициализации CLI."""
         mock_load_config.side_effect = Exception("Config error")
@@ -90,7 +90,7 @@ class TestFileMigratorCLI:
         assert cli.logger is None
         assert cli.migrator is None
     
-    @patch('src.main.Database')
+    @patch('src.db.Database')
     def test_cmd_test_connection_success(self, mock_db_class, mock_config, mock_logger):
         """Тест успешного тестирования подключения к БД."""
         mock_db_instance = Mock()
@@ -114,7 +114,7 @@ class TestFileMigratorCLI:
         mock_db_instance.get_migration_statistics.assert_called_once()
         mock_db_instance.close.assert_called_once()
     
-    @patch('src.main.Database')
+    @patch('src.db.Database')
     def test_cmd_test_connection_failure(self, mock_db_class, mock_config, mock_logger):
         """Тест неудачного тестирования подключения к БД."""
         mock_db_instance = Mock()
@@ -161,6 +161,7 @@ class TestFileMigratorCLI:
         
         assert result == 0
         mock_migrator.initialize.assert_called_once()
+        mock_migrator.get_migration_status.assert_called_once_with(use_initial=True)
         mock_migrator.migrate_all.assert_called_once()
         mock_migrator.cleanup.assert_called_once()
     
@@ -402,10 +403,10 @@ class TestFileMigratorCLI:
         mock_migrator.initialize.return_value = True
         
         # Мокаем подключение к БД
-        with patch('src.main.Database') as mock_db_class:
+        with patch('src.db.Database') as mock_db_class:
             mock_db_instance = Mock()
             mock_db_class.return_value = mock_db_instance
-            mock_db_instance.get_files_to_move.return_value = [
+            mock_db_instance.get_moved_files.return_value = [
                 {'IDFL': 'file1', 'filename': 'test1.txt', 'dt': datetime(2024, 1, 1), 'ismooved': True},
                 {'IDFL': 'file2', 'filename': 'test2.txt', 'dt': datetime(2024, 1, 2), 'ismooved': True}
             ]
@@ -423,11 +424,18 @@ class TestFileMigratorCLI:
             args.type = 'moved'
             args.limit = 10
             
-            result = cli.cmd_list_files(args)
+            with patch('builtins.print') as mock_print:
+                result = cli.cmd_list_files(args)
             
             assert result == 0
             mock_migrator.initialize.assert_called_once()
             mock_migrator.cleanup.assert_called_once()
+            
+            # Заголовок и строки списка выводятся одним вызовом
+            mock_print.assert_called_once()
+            output = mock_print.call_args[0][0]
+            assert "file1 - test1.txt" in output
+            assert "file2 - test2.txt" in output
 
 
 class TestCreateParser:
@@ -2,14 +2,19 @@
 Тесты для модуля migrator.py
 """
 
+import threading
+
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime
+from pathlib import Path
 from typing import Dict, List
 
 from src.migrator import Migrator, MigrationStats, MigrationError, create_migrator
 from src.config_loader import Config, MigratorConfig, DatabaseConfig, PathsConfig, LoggingConfig
 from src.logger import FileMigratorLogger
+from src.file_ops import INTEGRITY_HASH_ALGORITHM, FileOperationError
+from src.file_ops import FileNotFoundError as FileOpsNotFoundError
 
 
 class TestMigrationStats:
@@ -205,15 +210,16 @@ class TestMigrator:
     @patch('src.migrator.FileOps')
     def test_migrate_batch_success(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
         """Тест успешной миграции батча."""
-        mock_db_instance = Mock()
+        mock_db_instance = MagicMock()
         mock_file_ops_instance = Mock()
         mock_db_class.return_value = mock_db_instance
         mock_file_ops_class.return_value = mock_file_ops_instance
+        mock_file_ops_instance.finish_deferred_moves.return_value = {}
         
         # Настраиваем моки
         test_files = [
-            {'IDFL': 'file001', 'dt': datetime(2024, 1, 15), 'filename': 'test1.txt', 'ismooved': False},
-            {'IDFL': 'file002', 'dt': datetime(2024, 1, 16), 'filename': 'test2.txt', 'ismooved': False}
+            ('file001', datetime(2024, 1, 15)),
+            ('file002', datetime(2024, 1, 16))
         ]
         mock_db_instance.get_files_to_move.return_value = test_files
         
@@ -233,11 +239,180 @@ class TestMigrator:
             mock_logger.log_batch_start.assert_called_once_with(1, 2)
             mock_logger.log_batch_end.assert_called_once_with(1, 2, 2, 0)
     
+    @patch('src.migrator.Database')
+    @patch('src.migrator.FileOps')
+    def test_migrate_batch_moves_files_in_parallel(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
+        """Тест параллельного перемещения файлов батча."""
+        mock_db_instance = MagicMock()
+        mock_db_class.return_value = mock_db_instance
+        mock_file_ops_class.return_value = Mock()
+        mock_file_ops_class.return_value.finish_deferred_moves.return_value = {}
+        
+        test_files = [
+            ('file001', datetime(2024, 1, 15)),
+            ('file002', datetime(2024, 1, 16))
+        ]
+        mock_db_instance.get_files_to_move.return_value = test_files
+        mock_config.migrator.max_workers = 2
+        
+        migrator = Migrator(mock_config, mock_logger)
+        
+        # Оба файла должны обрабатываться одновременно, иначе барьер не пройдет
+        barrier = threading.Barrier(2, timeout=5)
+        
+        def migrate(idfl, dt, pending_marks, moved_at):
+            barrier.wait()
+            return True
+            
+        with patch.object(migrator, '_migrate_single_file', side_effect=migrate):
+            processed, successful, failed = migrator.migrate_batch(2)
+            
+        assert (processed, successful, failed) == (2, 2, 0)
+    
+    @patch('src.migrator.Database')
+    @patch('src.migrator.FileOps')
+    def test_migrate_batch_continues_after_last_key(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
+        """Тест продолжения выборки с последнего файла предыдущего батча."""
+        mock_db_instance = MagicMock()
+        mock_db_class.return_value = mock_db_instance
+        mock_file_ops_class.return_value = Mock()
+        mock_file_ops_class.return_value.finish_deferred_moves.return_value = {}
+        
+        first_batch = [
+            ('file001', datetime(2024, 1, 15)),
+            ('file002', datetime(2024, 1, 16))
+        ]
+        mock_db_instance.get_files_to_move.return_value = first_batch
+        mock_db_instance.get_files_to_move_after.return_value = []
+        
+        migrator = Migrator(mock_config, mock_logger)
+        
+        with patch.object(migrator, '_migrate_single_file', return_value=False):
+            migrator.migrate_batch(2)
+            processed, _, _ = migrator.migrate_batch(2)
+            
+        assert processed == 0
+        mock_db_instance.get_files_to_move.assert_called_once()
+        args = mock_db_instance.get_files_to_move_after.call_args[0]
+        assert args == (datetime(2024, 1, 16), 'file002', 2)
+    
+    @patch('src.migrator.Database')
+    @patch('src.migrator.FileOps')
+    def test_migrate_batch_marks_files_in_one_update(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
+        """Тест пакетной отметки перемещенных файлов в конце батча."""
+        mock_db_instance = MagicMock()
+        mock_file_ops_instance = Mock()
+        mock_db_class.return_value = mock_db_instance
+        mock_file_ops_class.return_value = mock_file_ops_instance
+        mock_file_ops_instance.finish_deferred_moves.return_value = {}
+        
+        test_files = [
+            ('file001', datetime(2024, 1, 15)),
+            ('file002', datetime(2024, 1, 16))
+        ]
+        mock_db_instance.get_files_to_move.return_value = test_files
+        mock_file_ops_instance.move_file_with_hash.return_value = (Path("new_path"), "test_hash")
+        mock_file_ops_instance.base_path = Path("test_path")
+        
+        migrator = Migrator(mock_config, mock_logger)
+        processed, successful, failed = migrator.migrate_batch(2)
+        
+        assert (processed, successful, failed) == (2, 2, 0)
+        mock_db_instance.mark_file_moved.assert_not_called()
+        mock_db_instance.mark_files_moved.assert_called_once()
+        rows = mock_db_instance.mark_files_moved.call_args[0][0]
+        assert [idfl for _, idfl in rows] == ['file001', 'file002']
+        assert len({moved_at for moved_at, _ in rows}) == 1
+        mock_file_ops_instance.finish_deferred_moves.assert_called_once()
+    
+    @patch('src.migrator.Database')
+    @patch('src.migrator.FileOps')
+    def test_migrate_batch_deferred_move_failure(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
+        """Тест отмененного отложенного перемещения: файл не отмечается в БД."""
+        mock_db_instance = MagicMock()
+        mock_file_ops_instance = Mock()
+        mock_db_class.return_value = mock_db_instance
+        mock_file_ops_class.return_value = mock_file_ops_instance
+        mock_file_ops_instance.finish_deferred_moves.return_value = {
+            'file002': OSError(13, "Permission denied")
+        }
+        
+        mock_db_instance.get_files_to_move.return_value = [
+            ('file001', datetime(2024, 1, 15)),
+            ('file002', datetime(2024, 1, 16))
+        ]
+        mock_file_ops_instance.move_file_with_hash.return_value = (Path("new_path"), "test_hash")
+        mock_file_ops_instance.base_path = Path("test_path")
+        
+        migrator = Migrator(mock_config, mock_logger)
+        processed, successful, failed = migrator.migrate_batch(2)
+        
+        assert (processed, successful, failed) == (2, 1, 1)
+        rows = mock_db_instance.mark_files_moved.call_args[0][0]
+        assert [idfl for _, idfl in rows] == ['file001']
+        assert [error['file_id'] for error in migrator.stats.errors] == ['file002']
+    
+    @patch('src.migrator.Database')
+    @patch('src.migrator.FileOps')
+    def test_migrate_batch_mark_failure(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
+        """Тест ошибки пакетной и поштучной отметки: файл считается неуспешным."""
+        mock_db_instance = MagicMock()
+        mock_file_ops_instance = Mock()
+        mock_db_class.return_value = mock_db_instance
+        mock_file_ops_class.return_value = mock_file_ops_instance
+        mock_file_ops_instance.finish_deferred_moves.return_value = {}
+        
+        test_files = [
+            ('file001', datetime(2024, 1, 15))
+        ]
+        mock_db_instance.get_files_to_move.return_value = test_files
+        mock_db_instance.mark_files_moved.side_effect = Exception("DB down")
+        mock_db_instance.mark_file_moved.return_value = False
+        mock_file_ops_instance.move_file_with_hash.return_value = (Path("new_path"), "test_hash")
+        mock_file_ops_instance.base_path = Path("test_path")
+        
+        migrator = Migrator(mock_config, mock_logger)
+        processed, successful, failed = migrator.migrate_batch(1)
+        
+        assert (processed, successful, failed) == (1, 0, 1)
+        assert migrator.stats.errors[0]['file_id'] == 'file001'
+    
+    @patch('src.migrator.Database')
+    @patch('src.migrator.FileOps')
+    def test_migrate_batch_mark_failure_falls_back_per_file(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
+        """Тест поштучной отметки после ошибки пакетного UPDATE."""
+        mock_db_instance = MagicMock()
+        mock_file_ops_instance = Mock()
+        mock_db_class.return_value = mock_db_instance
+        mock_file_ops_class.return_value = mock_file_ops_instance
+        mock_file_ops_instance.finish_deferred_moves.return_value = {}
+        
+        test_files = [
+            ('file001', datetime(2024, 1, 15)),
+            ('file002', datetime(2024, 1, 16))
+        ]
+        mock_db_instance.get_files_to_move.return_value = test_files
+        mock_db_instance.mark_files_moved.side_effect = Exception("Bad row")
+        mock_db_instance.mark_file_moved.side_effect = lambda idfl, dtmoove, session=None: idfl != 'file002'
+        mock_file_ops_instance.move_file_with_hash.return_value = (Path("new_path"), "test_hash")
+        mock_file_ops_instance.base_path = Path("test_path")
+        
+        migrator = Migrator(mock_config, mock_logger)
+        processed, successful, failed = migrator.migrate_batch(2)
+        
+        assert (processed, successful, failed) == (2, 1, 1)
+        assert mock_db_instance.mark_file_moved.call_count == 2
+        assert [error['file_id'] for error in migrator.stats.errors] == ['file002']
+        
+        # Поштучная отметка не использует соединение сессии батча
+        for call in mock_db_instance.mark_file_moved.call_args_list:
+            assert 'session' not in call.kwargs
+    
     @patch('src.migrator.Database')
     @patch('src.migrator.FileOps')
     def test_migrate_batch_no_files(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
         """Тест миграции батча без файлов."""
-        mock_db_instance = Mock()
+        mock_db_instance = MagicMock()
         mock_file_ops_instance = Mock()
         mock_db_class.return_value = mock_db_instance
         mock_file_ops_class.return_value = mock_file_ops_instance
@@ -263,30 +438,44 @@ class TestMigrator:
         mock_file_ops_class.return_value = mock_file_ops_instance
         
         # Настраиваем моки
-        mock_file_ops_instance.file_exists.return_value = True
-        mock_file_ops_instance.get_file_hash.return_value = "test_hash"  # Возвращаем валидный хеш
-        mock_file_ops_instance.move_file.return_value = "new_path"
-        from pathlib import Path
+        mock_file_ops_instance.move_file_with_hash.return_value = (Path("new_path"), "test_hash")
         mock_file_ops_instance.base_path = Path("test_path")  # Мокаем base_path как Path объект
         mock_db_instance.mark_file_moved.return_value = True  # mark_file_moved возвращает True при успехе
         
         migrator = Migrator(mock_config, mock_logger)
         
-        file_info = {
-            'IDFL': 'file001',
-            'dt': datetime(2024, 1, 15),
-            'filename': 'test.txt',
-            'ismooved': False
-        }
-        
-        result = migrator._migrate_single_file(file_info)
+        result = migrator._migrate_single_file('file001', datetime(2024, 1, 15))
         
         assert result is True
-        mock_file_ops_instance.file_exists.assert_called_once_with('file001', ismooved=False, dt=file_info['dt'])
-        mock_file_ops_instance.move_file.assert_called_once_with('file001', file_info['dt'])
+        mock_file_ops_instance.move_file_with_hash.assert_called_once_with(
+            'file001', datetime(2024, 1, 15), INTEGRITY_HASH_ALGORITHM, defer_sync=False, hash_renamed=False
+        )
+        mock_file_ops_instance.get_file_hash.assert_not_called()
         mock_db_instance.mark_file_moved.assert_called_once()
         mock_logger.log_file_moved.assert_called_once()
     
+    @patch('src.migrator.Database')
+    @patch('src.migrator.FileOps')
+    def test_migrate_single_file_deferred_mark(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
+        """Тест отложенной отметки: сброс копии на диск откладывается до конца батча."""
+        mock_db_instance = Mock()
+        mock_file_ops_instance = Mock()
+        mock_db_class.return_value = mock_db_instance
+        mock_file_ops_class.return_value = mock_file_ops_instance
+        mock_file_ops_instance.move_file_with_hash.return_value = (Path("new_path"), "test_hash")
+        mock_file_ops_instance.base_path = Path("test_path")
+        moved_at = datetime(2024, 2, 1)
+        pending_marks = []
+        
+        migrator = Migrator(mock_config, mock_logger)
+        
+        assert migrator._migrate_single_file('file001', datetime(2024, 1, 15), pending_marks, moved_at) is True
+        mock_file_ops_instance.move_file_with_hash.assert_called_once_with(
+            'file001', datetime(2024, 1, 15), INTEGRITY_HASH_ALGORITHM, defer_sync=True, hash_renamed=False
+        )
+        assert pending_marks == [(moved_at, 'file001')]
+        mock_db_instance.mark_file_moved.assert_not_called()
+    
     @patch('src.migrator.Database')
     @patch('src.migrator.FileOps')
     def test_migrate_single_file_not_found(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
@@ -297,58 +486,45 @@ class TestMigrator:
         mock_file_ops_class.return_value = mock_file_ops_instance
         
         # Настраиваем моки
-        mock_file_ops_instance.file_exists.return_value = False
+        mock_file_ops_instance.move_file_with_hash.side_effect = FileOpsNotFoundError("Исходный файл не найден")
         
         migrator = Migrator(mock_config, mock_logger)
         
-        file_info = {
-            'IDFL': 'file001',
-            'dt': datetime(2024, 1, 15),
-            'filename': 'test.txt',
-            'ismooved': False
-        }
-        
-        result = migrator._migrate_single_file(file_info)
+        result = migrator._migrate_single_file('file001', datetime(2024, 1, 15))
         
         assert result is False
         mock_logger.log_file_error.assert_called_once()
+        assert migrator.stats.errors[0]['file_id'] == 'file001'
     
     @patch('src.migrator.Database')
     @patch('src.migrator.FileOps')
-    def test_migrate_single_file_integrity_error(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
-        """Тест миграции файла с ошибкой целостности."""
+    def test_migrate_single_file_move_error(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
+        """Тест миграции файла с ошибкой перемещения."""
         mock_db_instance = Mock()
         mock_file_ops_instance = Mock()
         mock_db_class.return_value = mock_db_instance
         mock_file_ops_class.return_value = mock_file_ops_instance
         
         # Настраиваем моки
-        mock_file_ops_instance.file_exists.return_value = True
-        mock_file_ops_instance.get_file_hash.side_effect = ["old_hash", "new_hash"]  # Разные хеши
-        mock_file_ops_instance.move_file.return_value = "new_path"
+        mock_file_ops_instance.move_file_with_hash.side_effect = FileOperationError("Ошибка копирования")
         
         migrator = Migrator(mock_config, mock_logger)
         
-        file_info = {
-            'IDFL': 'file001',
-            'dt': datetime(2024, 1, 15),
-            'filename': 'test.txt',
-            'ismooved': False
-        }
-        
-        result = migrator._migrate_single_file(file_info)
+        result = migrator._migrate_single_file('file001', datetime(2024, 1, 15))
         
         assert result is False
+        mock_db_instance.mark_file_moved.assert_not_called()
         mock_logger.log_file_error.assert_called_once()
     
     @patch('src.migrator.Database')
     @patch('src.migrator.FileOps')
     def test_migrate_all_success(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
         """Тест успешной миграции всех файлов."""
-        mock_db_instance = Mock()
+        mock_db_instance = MagicMock()
         mock_file_ops_instance = Mock()
         mock_db_class.return_value = mock_db_instance
         mock_file_ops_class.return_value = mock_file_ops_instance
+        mock_file_ops_instance.finish_deferred_moves.return_value = {}
         
         # Настраиваем моки для инициализации
         mock_db_instance.test_connection.return_value = True
@@ -362,7 +538,7 @@ class TestMigrator:
         
         # Настраиваем моки для миграции
         test_files = [
-            {'IDFL': 'file001', 'dt': datetime(2024, 1, 15), 'filename': 'test1.txt', 'ismooved': False}
+            ('file001', datetime(2024, 1, 15))
         ]
         mock_db_instance.get_files_to_move.return_value = test_files
         
@@ -382,6 +558,98 @@ class TestMigrator:
                 mock_logger.log_migration_start.assert_called_once()
                 mock_logger.log_migration_end.assert_called_once()
     
+    @patch('src.migrator.Database')
+    @patch('src.migrator.FileOps')
+    def test_migrate_all_prefetches_next_batch(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
+        """Тест выборки следующего батча во время перемещения текущего."""
+        mock_db_instance = MagicMock()
+        mock_db_class.return_value = mock_db_instance
+        mock_file_ops_class.return_value = Mock()
+        
+        mock_db_instance.test_connection.return_value = True
+        mock_db_instance.get_migration_statistics.return_value = {'unmoved_files': 3}
+        mock_db_instance.get_files_to_move.return_value = [('file001', datetime(2024, 1, 15))]
+        next_batches = iter([[('file002', datetime(2024, 1, 16))], []])
+        prefetched = threading.Event()
+        
+        def get_files_to_move_after(last_dt, last_idfl, batch_size, session=None):
+            prefetched.set()
+            return next(next_batches)
+            
+        mock_db_instance.get_files_to_move_after.side_effect = get_files_to_move_after
+        mock_config.migrator.batch_size = 1
+        mock_config.migrator.retry_delay = 0
+        
+        migrator = Migrator(mock_config, mock_logger)
+        
+        # Следующий батч запрашивается, пока текущий еще перемещается
+        def migrate_files(files, session=None):
+            if files[0][0] == 'file001':
+                assert prefetched.wait(timeout=5)
+            return len(files), len(files), 0
+            
+        with patch.object(migrator, '_migrate_files', side_effect=migrate_files):
+            stats = migrator.migrate_all()
+            
+        assert stats.processed_files == 2
+        assert mock_db_instance.get_files_to_move_after.call_args_list[0].args[:3] == \
+            (datetime(2024, 1, 15), 'file001', 1)
+        assert mock_db_instance.get_files_to_move.call_count == 1
+    
+    @patch('src.migrator.Database')
+    @patch('src.migrator.FileOps')
+    def test_migrate_all_sleeps_only_after_failed_batch(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
+        """Тест паузы между батчами только после ошибок."""
+        mock_db_instance = MagicMock()
+        mock_db_class.return_value = mock_db_instance
+        mock_file_ops_class.return_value = Mock()
+        
+        mock_db_instance.test_connection.return_value = True
+        mock_db_instance.get_migration_statistics.return_value = {'unmoved_files': 3}
+        
+        migrator = Migrator(mock_config, mock_logger)
+        batches = iter([[('file001', datetime(2024, 1, 15))]] * 3 + [[]])
+        results = iter([(1, 1, 0), (1, 0, 1), (1, 1, 0)])
+        
+        def migrate_batch(batch_size, files):
+            return next(results) if files else (0, 0, 0)
+            
+        with patch.object(migrator, '_fetch_files', side_effect=lambda batch_size: next(batches)), \
+             patch.object(migrator, 'migrate_batch', side_effect=migrate_batch), \
+             patch('src.migrator.time.sleep') as mock_sleep:
+            migrator.migrate_all()
+            
+        mock_sleep.assert_called_once_with(mock_config.migrator.retry_delay)
+    
+    @patch('src.migrator.Database')
+    @patch('src.migrator.FileOps')
+    def test_migrate_all_logs_progress_once_per_percent(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
+        """Тест логирования прогресса только при смене целого процента."""
+        mock_db_instance = MagicMock()
+        mock_db_class.return_value = mock_db_instance
+        mock_file_ops_class.return_value = Mock()
+        
+        mock_db_instance.test_connection.return_value = True
+        mock_db_instance.get_migration_statistics.return_value = {'unmoved_files': 1000}
+        mock_config.migrator.retry_delay = 0
+        
+        migrator = Migrator(mock_config, mock_logger)
+        
+        # 30 батчей по одному файлу из 1000: прогресс от 0% до 3%
+        batches = iter([[('file001', datetime(2024, 1, 15))]] * 30 + [[]])
+        
+        def migrate_batch(batch_size, files):
+            if not files:
+                return 0, 0, 0
+            migrator.stats.processed_files += 1
+            return 1, 1, 0
+            
+        with patch.object(migrator, '_fetch_files', side_effect=lambda batch_size: next(batches)), \
+             patch.object(migrator, 'migrate_batch', side_effect=migrate_batch):
+            migrator.migrate_all()
+            
+        assert [c.args[2] for c in mock_logger.log_progress.call_args_list] == [0, 1, 2, 3]
+    
     @patch('src.migrator.Database')
     @patch('src.migrator.FileOps')
     def test_migrate_by_date_range(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
@@ -390,6 +658,7 @@ class TestMigrator:
         mock_file_ops_instance = Mock()
         mock_db_class.return_value = mock_db_instance
         mock_file_ops_class.return_value = mock_file_ops_instance
+        mock_file_ops_instance.finish_deferred_moves.return_value = {}
         
         # Настраиваем моки для инициализации
         mock_db_instance.test_connection.return_value = True
@@ -403,9 +672,9 @@ class TestMigrator:
         
         # Настраиваем моки для миграции по датам
         test_files = [
-            {'IDFL': 'file001', 'dt': datetime(2024, 1, 15), 'filename': 'test1.txt', 'ismooved': False}
+            ('file001', datetime(2024, 1, 15))
         ]
-        mock_db_instance.get_files_by_date_range.return_value = test_files
+        mock_db_instance.iter_unmoved_files_by_date_range.return_value = iter([test_files])
         
         migrator = Migrator(mock_config, mock_logger)
         
@@ -419,9 +688,72 @@ class TestMigrator:
             assert stats.successful_files == 1
             assert stats.failed_files == 0
             
-            mock_db_instance.get_files_by_date_range.assert_called_once_with(start_date, end_date)
+            mock_db_instance.iter_unmoved_files_by_date_range.assert_called_once_with(start_date, end_date, 100)
             mock_logger.log_migration_end.assert_called_once()
     
+    @patch('src.migrator.Database')
+    @patch('src.migrator.FileOps')
+    def test_migrate_by_date_range_counts_only_range_files(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
+        """Тест подсчета только файлов диапазона, а не всех не перемещенных в БД."""
+        mock_db_instance = Mock()
+        mock_file_ops_instance = Mock()
+        mock_db_class.return_value = mock_db_instance
+        mock_file_ops_class.return_value = mock_file_ops_instance
+        mock_file_ops_instance.finish_deferred_moves.return_value = {}
+        
+        mock_db_instance.test_connection.return_value = True
+        mock_db_instance.get_migration_statistics.return_value = {'total_files': 800, 'unmoved_files': 500}
+        mock_file_ops_instance.get_storage_statistics.return_value = {'unmoved_files_count': 500}
+        
+        migrator = Migrator(mock_config, mock_logger)
+        
+        # Пустой диапазон
+        mock_db_instance.iter_unmoved_files_by_date_range.return_value = iter([])
+        stats = migrator.migrate_by_date_range(datetime(2024, 1, 1), datetime(2024, 1, 31))
+        
+        assert stats.total_files == 0
+        mock_logger.log_system_info.assert_any_call("Нет файлов для миграции в указанном диапазоне")
+        mock_logger.log_migration_end.assert_not_called()
+        
+        # Два батча по три и два файла
+        mock_db_instance.iter_unmoved_files_by_date_range.return_value = iter([
+            [(f'file00{i}', datetime(2024, 1, 15)) for i in range(3)],
+            [(f'file01{i}', datetime(2024, 1, 16)) for i in range(2)]
+        ])
+        with patch.object(migrator, '_migrate_single_file', return_value=True):
+            stats = migrator.migrate_by_date_range(datetime(2024, 1, 1), datetime(2024, 1, 31))
+            
+        assert stats.total_files == 5
+        mock_logger.log_system_info.assert_any_call("Не перемещенных файлов в диапазоне: 5")
+    
+    @patch('src.migrator.Database')
+    @patch('src.migrator.FileOps')
+    def test_migrate_by_date_range_marks_files_in_one_update(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
+        """Тест пакетной отметки файлов при миграции по диапазону дат."""
+        mock_db_instance = Mock()
+        mock_file_ops_instance = Mock()
+        mock_db_class.return_value = mock_db_instance
+        mock_file_ops_class.return_value = mock_file_ops_instance
+        mock_file_ops_instance.finish_deferred_moves.return_value = {}
+        
+        mock_db_instance.test_connection.return_value = True
+        mock_db_instance.get_migration_statistics.return_value = {'total_files': 2, 'unmoved_files': 2}
+        mock_file_ops_instance.get_storage_statistics.return_value = {'unmoved_files_count': 2}
+        mock_db_instance.iter_unmoved_files_by_date_range.return_value = iter([[
+            ('file001', datetime(2024, 1, 15)),
+            ('file002', datetime(2024, 1, 16))
+        ]])
+        mock_file_ops_instance.move_file_with_hash.return_value = (Path("new_path"), "test_hash")
+        mock_file_ops_instance.base_path = "test_path"
+        
+        migrator = Migrator(mock_config, mock_logger)
+        stats = migrator.migrate_by_date_range(datetime(2024, 1, 1), datetime(2024, 1, 31))
+        
+        assert stats.successful_files == 2
+        mock_db_instance.mark_file_moved.assert_not_called()
+        rows = mock_db_instance.mark_files_moved.call_args[0][0]
+        assert sorted(idfl for _, idfl in rows) == ['file001', 'file002']
+    
     @patch('src.migrator.Database')
     @patch('src.migrator.FileOps')
     def test_verify_migration(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
@@ -435,9 +767,8 @@ class TestMigrator:
         test_files = [
             {'IDFL': 'file001', 'dt': datetime(2024, 1, 15), 'filename': 'test1.txt', 'ismooved': True}
         ]
-        mock_db_instance.get_files_to_move.return_value = test_files
-        mock_file_ops_instance.file_exists.return_value = True
-        mock_file_ops_instance.get_file_size.return_value = 100
+        mock_db_instance.get_moved_files.return_value = test_files
+        mock_file_ops_instance.get_moved_file_sizes.return_value = {'file001': 100}
         
         migrator = Migrator(mock_config, mock_logger)
         
@@ -450,6 +781,32 @@ class TestMigrator:
         
         mock_logger.log_system_info.assert_called()
     
+    @patch('src.migrator.Database')
+    @patch('src.migrator.FileOps')
+    def test_verify_migration_missing_and_empty_files(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
+        """Тест проверки миграции с отсутствующим и пустым файлами."""
+        mock_db_instance = Mock()
+        mock_file_ops_instance = Mock()
+        mock_db_class.return_value = mock_db_instance
+        mock_file_ops_class.return_value = mock_file_ops_instance
+        
+        mock_db_instance.get_moved_files.return_value = [
+            {'IDFL': 'file001', 'dt': datetime(2024, 1, 15)},
+            {'IDFL': 'file002', 'dt': datetime(2024, 1, 15)},
+            {'IDFL': 'file003', 'dt': datetime(2024, 1, 16)}
+        ]
+        mock_file_ops_instance.get_moved_file_sizes.return_value = {
+            'file001': 100, 'file002': None, 'file003': 0
+        }
+        
+        migrator = Migrator(mock_config, mock_logger)
+        
+        result = migrator.verify_migration(sample_size=3)
+        
+        assert (result['verified'], result['errors'], result['total_checked']) == (1, 2, 3)
+        mock_file_ops_instance.get_moved_file_sizes.assert_called_once()
+        mock_file_ops_instance.file_exists.assert_not_called()
+    
     @patch('src.migrator.Database')
     @patch('src.migrator.FileOps')
     def test_get_migration_status(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
@@ -476,6 +833,34 @@ class TestMigrator:
         assert status['database'] == db_stats
         assert status['filesystem'] == fs_stats
     
+    @patch('src.migrator.Database')
+    @patch('src.migrator.FileOps')
+    def test_initial_statistics_reused(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):
+        """Тест повторного использования статистики, собранной при инициализации."""
+        mock_db_instance = MagicMock()
+        mock_file_ops_instance = Mock()
+        mock_db_class.return_value = mock_db_instance
+        mock_file_ops_class.return_value = mock_file_ops_instance
+        
+        db_stats = {'total_files': 100, 'unmoved_files': 0}
+        fs_stats = {'unmoved_files_count': 0}
+        mock_db_instance.test_connection.return_value = True
+        mock_db_instance.get_migration_statistics.return_value = db_stats
+        mock_db_instance.get_files_to_move.return_value = []
+        mock_file_ops_instance.get_storage_statistics.return_value = fs_stats
+        
+        migrator = Migrator(mock_config, mock_logger)
+        assert migrator.initialize() is True
+        
+        status = migrator.get_migration_status(use_initial=True)
+        migrator.migrate_all()
+        
+        assert status['database'] == db_stats
+        assert status['filesystem'] == fs_stats
+        mock_db_instance.get_migration_statistics.assert_called_once()
+        mock_file_ops_instance.get_storage_statistics.assert_called_once()
+        mock_db_instance.test_connection.assert_called_once()
+    
     @patch('src.migrator.Database')
     @patch('src.migrator.FileOps')
     def test_cleanup(self, mock_file_ops_class, mock_db_class, mock_config, mock_logger):